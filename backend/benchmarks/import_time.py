@@ -0,0 +1,129 @@
+"""
+Import-time benchmark — what a cold start pays before the first request.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters, takes the
+median over the runs, and prints the modules with the largest cumulative and
+self import cost, plus whether each known heavy dependency (pandas, NumPy,
+matplotlib, ReportLab, boto3, google-genai) stayed off the startup path. Those
+should only load when the endpoint that needs them is first hit.
+
+Usage (from backend/, with DATABASE_URL set as for the API):
+    python benchmarks/import_time.py --module main --runs 5 --top 20
+    python benchmarks/import_time.py --json > import_time.json
+    python benchmarks/import_time.py --check   # exit 1 if a heavy module is imported eagerly
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "numpy", "matplotlib", "reportlab", "boto3", "openpyxl", "google.genai")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _project_modules() -> set[str]:
+    names = set()
+    for entry in os.listdir(BACKEND_DIR):
+        if entry.endswith(".py"):
+            names.add(entry[:-3])
+        elif os.path.isfile(os.path.join(BACKEND_DIR, entry, "__init__.py")) or entry in ("routers", "services", "models"):
+            names.add(entry)
+    return names
+
+
+def _run_once(module: str) -> tuple[float, dict[str, tuple[int, int, int]]]:
+    """One fresh interpreter. Returns (wall seconds, {module: (self_us, cumulative_us, depth)})."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            # Indentation is two spaces per nesting level below the top-level import.
+            modules[m[4]] = (int(m[1]), int(m[2]), (len(m[3]) - 1) // 2)
+    return wall, modules
+
+
+def measure(module: str, runs: int) -> dict:
+    walls, samples = [], []
+    for _ in range(runs):
+        wall, modules = _run_once(module)
+        walls.append(wall)
+        samples.append(modules)
+
+    names = set().union(*samples)
+    merged = {}
+    for name in names:
+        seen = [s[name] for s in samples if name in s]
+        merged[name] = {
+            "self_ms": statistics.median(v[0] for v in seen) / 1000,
+            "cumulative_ms": statistics.median(v[1] for v in seen) / 1000,
+            "depth": seen[0][2],
+        }
+    project = _project_modules()
+    return {
+        "module": module,
+        "runs": runs,
+        "interpreter_wall_ms": statistics.median(walls) * 1000,
+        "import_ms": merged.get(module, {}).get("cumulative_ms", 0.0),
+        "modules": merged,
+        "project": {
+            name: stats for name, stats in merged.items() if name.split(".")[0] in project
+        },
+        "heavy": {name: name in merged for name in HEAVY_MODULES},
+    }
+
+
+def _print_table(title: str, rows: list[tuple[str, dict]]) -> None:
+    print(f"\n{title}")
+    print(f"  {'module':<48}{'cumulative ms':>14}{'self ms':>10}")
+    for name, stats in rows:
+        print(f"  {name:<48}{stats['cumulative_ms']:>14.1f}{stats['self_ms']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print the full result as JSON")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a heavy module is imported at startup")
+    args = parser.parse_args()
+
+    result = measure(args.module, args.runs)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import {args.module}: {result['import_ms']:.1f} ms "
+              f"(interpreter total {result['interpreter_wall_ms']:.1f} ms, median of {args.runs})")
+        by_cumulative = sorted(
+            ((n, s) for n, s in result["modules"].items() if s["depth"] <= 2 and n != args.module),
+            key=lambda kv: kv[1]["cumulative_ms"], reverse=True,
+        )
+        _print_table("Largest cumulative cost (top-level and direct imports)", by_cumulative[:args.top])
+        _print_table(
+            "Project modules",
+            sorted(result["project"].items(), key=lambda kv: kv[1]["cumulative_ms"], reverse=True)[:args.top],
+        )
+        print("\nHeavy dependencies")
+        for name, loaded in result["heavy"].items():
+            print(f"  {name:<20}{'imported at startup' if loaded else 'deferred'}")
+
+    if args.check and any(result["heavy"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Load benchmark — measures request latency percentiles as concurrency rises.
+
+Point it at a running API (uvicorn main:app) and it fires a fixed number of
+requests at each concurrency level, then prints p50/p95/p99 per level. With DB
+work running in the threadpool, p99 should stay roughly flat until the pool
+(DB_POOL_SIZE + DB_MAX_OVERFLOW) is saturated.
+
+Usage:
+    python benchmarks/load_latency.py --url http://localhost:8000 \\
+        --path /api/analytics/summary --levels 1,8,32,64 --requests 400
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def _run_level(client: httpx.AsyncClient, path: str, concurrency: int, total: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                resp = await client.get(path)
+                if resp.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / wall, 1) if wall else 0.0,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+    }
+
+
+async def main(url: str, path: str, levels: list[int], total: int) -> list[dict]:
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        await client.get(path)  # warm up connections, caches and the DB pool
+        return [await _run_level(client, path, c, total) for c in levels]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/analytics/summary")
+    parser.add_argument("--levels", default="1,8,32,64", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=400, help="requests per level")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args.url, args.path, [int(x) for x in args.levels.split(",")], args.requests))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'conc':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for r in results:
+            print(f"{r['concurrency']:>6} {r['rps']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
@@ -0,0 +1,139 @@
+"""
+Serialization micro-benchmark — what a /api/esg list page costs per row.
+
+For each ledger the /api/esg endpoints page through, fetches one page of --rows rows
+from a seeded benchmark schema (see suite.py) and times the two response paths:
+
+  legacy  NUMERIC parsed to Decimal by psycopg2, RowMapping → rows_to_list (dict +
+          per-cell Decimal cleaning), then FastAPI's jsonable_encoder + json.dumps
+  fast    NUMERIC parsed to float by psycopg2 (services.db.numeric_as_float),
+          result_dicts (dict(zip(keys, row))), then orjson.dumps
+
+"build" covers execute + fetch + building the dicts, "encode" the JSON bytes. Both
+paths must produce the same JSON document, which is checked before timing.
+
+Usage (from backend/):
+    python benchmarks/serialization.py --database-url postgresql+psycopg2://localhost/esg_bench \\
+        --size 100k --rows 500 --repeat 50
+    python benchmarks/serialization.py --json > serialization.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suite import make_engine, parse_size, seed  # noqa: E402  (benchmarks/ is the script dir)
+
+
+def _legacy(conn, sql, params):
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy import text
+
+    from services.db import rows_to_list
+
+    def build():
+        return rows_to_list(conn.execute(text(sql), params).mappings().all())
+
+    def encode(data):
+        # What FastAPI does for a returned dict: jsonable_encoder, then JSONResponse.render.
+        return json.dumps(
+            jsonable_encoder({"data": data, "count": len(data)}),
+            ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+        ).encode("utf-8")
+
+    return build, encode
+
+
+def _fast(conn, sql, params):
+    import orjson
+    from sqlalchemy import text
+
+    from services.db import result_dicts
+
+    def build():
+        return result_dicts(conn.execute(text(sql), params))
+
+    def encode(data):
+        return orjson.dumps({"data": data, "count": len(data)}, option=orjson.OPT_NON_STR_KEYS)
+
+    return build, encode
+
+
+def _time(build, encode, repeat: int) -> dict:
+    build_s, encode_s = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = build()
+        built = time.perf_counter()
+        encode(data)
+        build_s.append(built - start)
+        encode_s.append(time.perf_counter() - built)
+    return {"build_ms": statistics.median(build_s) * 1000, "encode_ms": statistics.median(encode_s) * 1000}
+
+
+def run(args) -> dict:
+    from services.db import numeric_as_float
+    from services.pagination import TABLE_COLUMNS
+
+    schema = seed(args.database_url, parse_size(args.size))
+    legacy_engine = make_engine(args.database_url, schema)
+    fast_engine = make_engine(args.database_url, schema)
+    numeric_as_float(fast_engine)
+
+    results = {}
+    with legacy_engine.connect() as legacy_conn, fast_engine.connect() as fast_conn:
+        for table, columns in TABLE_COLUMNS.items():
+            sql = f"SELECT {', '.join(columns)} FROM {table} ORDER BY id LIMIT :n"
+            params = {"n": args.rows}
+            paths = {"legacy": _legacy(legacy_conn, sql, params), "fast": _fast(fast_conn, sql, params)}
+
+            documents = {name: json.loads(encode(build())) for name, (build, encode) in paths.items()}
+            if documents["legacy"] != documents["fast"]:
+                sys.exit(f"{table}: fast path output differs from legacy")
+            rows = documents["fast"]["count"]
+            if not rows:
+                continue
+
+            timings = {}
+            for name, (build, encode) in paths.items():
+                build()  # warm up
+                t = _time(build, encode, args.repeat)
+                t["total_ms"] = t["build_ms"] + t["encode_ms"]
+                t["us_per_row"] = t["total_ms"] * 1000 / rows
+                timings[name] = t
+            timings["speedup"] = timings["legacy"]["total_ms"] / timings["fast"]["total_ms"]
+            results[table] = {"rows": rows, **timings}
+    return {"size": args.size, "page_rows": args.rows, "repeat": args.repeat, "tables": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", ""))
+    parser.add_argument("--size", default="100k", help="benchmark dataset to read (seeded if missing)")
+    parser.add_argument("--rows", type=int, default=500, help="rows per page (the list endpoints' maximum)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="print the full result as JSON")
+    args = parser.parse_args()
+    if not args.database_url:
+        sys.exit("--database-url (or BENCH_DATABASE_URL) is required")
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{args.rows}-row pages from bench_{args.size}, median of {args.repeat}")
+    print(f"  {'table':<26}{'rows':>6}{'legacy µs/row':>15}{'fast µs/row':>13}"
+          f"{'legacy build/encode ms':>25}{'fast build/encode ms':>23}{'speedup':>9}")
+    for table, r in result["tables"].items():
+        legacy, fast = r["legacy"], r["fast"]
+        print(f"  {table:<26}{r['rows']:>6}{legacy['us_per_row']:>15.2f}{fast['us_per_row']:>13.2f}"
+              f"{legacy['build_ms']:>14.2f} / {legacy['encode_ms']:<8.2f}"
+              f"{fast['build_ms']:>12.2f} / {fast['encode_ms']:<8.2f}{r['speedup']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""
+Benchmark suite — analytics, carbon engine, PDF generation and legacy Excel parsing.
+
+`run` seeds synthetic ESG ledgers into a local PostgreSQL (one schema per size,
+`bench_1k`, `bench_100k`, ...; the rest of the database is never touched), then
+times the service functions against it and writes machine-readable JSON.
+The data follows the shape of generate-esg-data.js / seed-boa-db.js: ten companies,
+scope 1-3 carbon entries over 60 monthly periods, energy (renewable / grid), waste
+(recycled / landfill / certified disposal), water, suppliers, targets and the
+employee-engagement metrics the social score reads. Seeding is deterministic
+(`setseed`) and skipped when the schema already holds the same size and seed.
+
+`compare` diffs two result files and exits 1 if any case's median got slower
+than the threshold allows, so it can gate a commit against its parent.
+
+Usage (from backend/):
+    python benchmarks/suite.py run --database-url postgresql+psycopg2://localhost/esg_bench \\
+        --sizes 1k,100k,1m --out bench-$(git rev-parse --short HEAD).json
+    python benchmarks/suite.py compare bench-base.json bench-head.json --threshold 0.15
+
+PostgreSQL only: the analytics queries use FILTER, uuid[] and ON CONFLICT, which
+SQLite can't run. Legacy Excel parsing needs no database.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SEED = 0.42
+COMPANIES = 10
+PERIODS = 60
+CASES = ("analytics_summary", "carbon_trend", "calculate_carbon", "generate_pdf", "legacy_excel_parse")
+DEFAULT_SIZES = "1k,100k,1m"
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+
+def size_label(rows: int) -> str:
+    if rows >= 1_000_000 and rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}m"
+    if rows >= 1_000 and rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+
+def company_ids() -> list[str]:
+    return [str(hashlib.md5(f"bench-company-{i}".encode()).hexdigest()) for i in range(COMPANIES)]
+
+
+# ── Seeding ───────────────────────────────────────────────────────────────────
+
+_SEED_SQL = [
+    ("companies", """
+        INSERT INTO companies (id, name, industry, size, headquarters_location)
+        SELECT CAST(c AS uuid), 'Benchmark Company ' || i, 'Banking & Financial Services',
+               'Large (100,000+ employees)', 'Charlotte, North Carolina, USA'
+        FROM unnest(CAST(:cids AS text[])) WITH ORDINALITY AS t(c, i)
+    """),
+    ("carbon_footprint_details", """
+        INSERT INTO carbon_footprint_details
+            (company_id, scope, category, source_description, emissions_co2_tons, calculation_method,
+             emission_factor, activity_data, unit, reporting_period, verified)
+        SELECT CAST((CAST(:cids AS text[]))[g % :companies + 1] AS uuid),
+               g % 3 + 1,
+               (ARRAY['Direct Emissions', 'Indirect — Purchased Electricity', 'Business Travel'])[g % 3 + 1],
+               (ARRAY['Company vehicles, on-site fuel', 'Grid electricity, market-based', 'Air travel, hotels'])[g % 3 + 1],
+               round(CAST(random() * 500 AS numeric), 2),
+               'GHG Protocol', round(CAST(random() * 3 AS numeric), 4), round(CAST(random() * 10000 AS numeric), 2),
+               'MT CO2e',
+               CAST(DATE '2020-01-01' + (g / :companies % :periods) * INTERVAL '1 month' AS date),
+               random() < 0.7
+        FROM generate_series(0, :rows - 1) AS g
+    """),
+    ("energy_consumption", """
+        INSERT INTO energy_consumption (company_id, facility_name, energy_type, source, consumption_kwh, cost, reporting_period)
+        SELECT CAST((CAST(:cids AS text[]))[g % :companies + 1] AS uuid),
+               (ARRAY['Global Operations', 'Data Centers', 'Branches'])[g % 3 + 1],
+               CASE WHEN random() < 0.6 THEN 'renewable' ELSE 'grid' END,
+               'synthetic', round(CAST(random() * 100000 AS numeric), 2), round(CAST(random() * 8000 AS numeric), 2),
+               CAST(DATE '2020-01-01' + (g / :companies % :periods) * INTERVAL '1 month' AS date)
+        FROM generate_series(0, :side_rows - 1) AS g
+    """),
+    ("waste_management_data", """
+        INSERT INTO waste_management_data (company_id, facility_name, waste_type, waste_category, amount_kg, disposal_method, cost, reporting_period)
+        SELECT CAST((CAST(:cids AS text[]))[g % :companies + 1] AS uuid),
+               'Global Operations',
+               (ARRAY['paper/office', 'electronic', 'mixed'])[g % 3 + 1],
+               (ARRAY['recyclable', 'recyclable', 'non-recyclable'])[g % 3 + 1],
+               round(CAST(random() * 10000 AS numeric), 2),
+               (ARRAY['recycled', 'certified_disposal', 'landfill'])[g % 3 + 1],
+               round(CAST(random() * 1000 AS numeric), 2),
+               CAST(DATE '2020-01-01' + (g / :companies % :periods) * INTERVAL '1 month' AS date)
+        FROM generate_series(0, :side_rows - 1) AS g
+    """),
+    ("water_usage_details", """
+        INSERT INTO water_usage_details (company_id, facility_name, usage_type, source, consumption_liters, cost, reporting_period)
+        SELECT CAST((CAST(:cids AS text[]))[g % :companies + 1] AS uuid),
+               'Global Operations', 'operational', 'municipal',
+               round(CAST(random() * 1000000 AS numeric), 2), round(CAST(random() * 2000 AS numeric), 2),
+               CAST(DATE '2020-01-01' + (g / :companies % :periods) * INTERVAL '1 month' AS date)
+        FROM generate_series(0, :side_rows / 4 - 1) AS g
+    """),
+    ("employee_engagement", """
+        INSERT INTO employee_engagement (company_id, metric_name, category, value, unit, department, reporting_period, target_value)
+        SELECT CAST(c AS uuid), m.name, m.category, m.value, m.unit, 'Global', DATE '2024-01-01', m.target
+        FROM unnest(CAST(:cids AS text[])) AS c
+        CROSS JOIN (VALUES
+            ('Employee Satisfaction Score', 'satisfaction', 85, 'score / 100', 90),
+            ('Female Representation', 'diversity', 52, 'percentage', 50),
+            ('Safety Incidents', 'safety', 3, 'count', 0),
+            ('Avg Training Hours / Employee', 'training', 59, 'hours per year', 60)
+        ) AS m(name, category, value, unit, target)
+    """),
+    ("esg_targets", """
+        INSERT INTO esg_targets (company_id, category, metric_name, target_value, current_value, unit, target_date, is_active)
+        SELECT CAST(c AS uuid), t.category, t.name, t.target, t.current_value, t.unit, CAST(t.target_date AS date), true
+        FROM unnest(CAST(:cids AS text[])) AS c
+        CROSS JOIN (VALUES
+            ('environmental', 'Net Zero — Operations & Financed Emissions', 0, 61800, 'MT CO2e', '2050-12-31'),
+            ('environmental', 'Zero Waste to Landfill', 0, 8700, 'metric tons', '2030-12-31'),
+            ('social', 'Women in Senior Leadership', 40, 37, 'percentage', '2030-12-31'),
+            ('governance', 'Board Independence', 92, 92, 'percentage', '2025-12-31')
+        ) AS t(category, name, target, current_value, unit, target_date)
+    """),
+    ("supply_chain_metrics", """
+        INSERT INTO supply_chain_metrics (company_id, supplier_name, supplier_category, esg_score, environmental_score,
+                                          social_score, governance_score, certification_status)
+        SELECT CAST((CAST(:cids AS text[]))[g % :companies + 1] AS uuid),
+               'Supplier ' || g, (ARRAY['IT Services', 'Facilities', 'Logistics'])[g % 3 + 1],
+               40 + g % 60, 40 + (g * 7) % 60, 40 + (g * 11) % 60, 40 + (g * 13) % 60, 'ISO 14001'
+        FROM generate_series(0, :companies * 20 - 1) AS g
+    """),
+]
+
+
+def _schema_hash() -> str:
+    with open(os.path.join(BACKEND_DIR, "neon_schema.sql"), "rb") as f:
+        schema = f.read()
+    return hashlib.sha256(schema + json.dumps([s for _, s in _SEED_SQL]).encode()).hexdigest()[:16]
+
+
+def make_engine(url: str, schema: str):
+    from sqlalchemy import create_engine
+
+    return create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+
+
+def seed(url: str, rows: int, reseed: bool = False) -> str:
+    """Create and fill `bench_<size>` unless it already holds this exact dataset. Returns the schema."""
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+
+    from services.carbon_rollup import rebuild_rollup
+
+    schema = f"bench_{size_label(rows)}"
+    fingerprint = f"{rows}:{SEED}:{_schema_hash()}"
+    engine = make_engine(url, schema)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+            conn.execute(text("CREATE TABLE IF NOT EXISTS bench_meta (fingerprint TEXT PRIMARY KEY, seeded_at TIMESTAMPTZ)"))
+            if not reseed and conn.execute(text("SELECT 1 FROM bench_meta WHERE fingerprint = :f"), {"f": fingerprint}).first():
+                print(f"  {schema}: already seeded", file=sys.stderr)
+                return schema
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+            with open(os.path.join(BACKEND_DIR, "neon_schema.sql"), encoding="utf-8") as f:
+                conn.exec_driver_sql(f.read())
+            conn.execute(text("SELECT setseed(:s)"), {"s": SEED})
+            params = {
+                "cids": company_ids(), "companies": COMPANIES, "periods": PERIODS,
+                "rows": rows, "side_rows": max(COMPANIES * 4, rows // 4),
+            }
+            for table, sql in _SEED_SQL:
+                conn.execute(text(sql), params)
+        with Session(engine) as db:
+            rebuild_rollup(db)
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE IF NOT EXISTS bench_meta (fingerprint TEXT PRIMARY KEY, seeded_at TIMESTAMPTZ)"))
+            conn.execute(text("INSERT INTO bench_meta VALUES (:f, NOW())"), {"f": fingerprint})
+        print(f"  {schema}: seeded {rows:,} ledger rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        return schema
+    finally:
+        engine.dispose()
+
+
+# ── Cases ─────────────────────────────────────────────────────────────────────
+
+def _esg_workbook(rows: int) -> bytes:
+    """An "ESG Metrics" sheet with the columns the legacy /uploadfile and /report endpoints read."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("ESG Metrics")
+    ws.append([
+        "Year", "Carbon Emissions (tons CO2e)", "Water Usage (m3)", "Energy Renewable (%)",
+        "Energy Non-Renewable (%)", "Waste Recycled (tons)", "Waste Unrecycled (tons)", "Employee Safety (accidents)",
+    ])
+    for i in range(rows):
+        renewable = 40 + i % 60
+        ws.append([2000 + i, 60000 - i % 5000, 2_100_000 + i * 13 % 9000, renewable, 100 - renewable,
+                   24800 + i % 700, 8700 - i % 500, i % 17])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _calculator_input():
+    from models.schemas import CarbonCalculatorInput
+
+    return CarbonCalculatorInput(
+        natural_gas_kwh=120000, diesel_liters=3400, petrol_liters=2100, electricity_kwh=850000,
+        country_grid="US", flights_short_haul_km=42000, flights_long_haul_km=180000,
+        hotel_nights=320, waste_kg=15000, water_m3=5400,
+    )
+
+
+def build_cases(rows: int, session_factory) -> dict:
+    """name → (callable, calls per sample). Each callable runs one sample."""
+    from routers.legacy import _read_esg_sheet
+    from services.carbon_engine import calculate_carbon
+    from services.esg_analytics import compute_analytics_summary, compute_carbon_trend
+    from services.report_generator import generate_pdf
+
+    cid = company_ids()[0]
+    inputs = _calculator_input()
+    # Excel tops out at ~1M rows and pandas needs minutes for that; scale the sheet down.
+    workbook = _esg_workbook(max(10, rows // 100))
+
+    def with_session(fn):
+        def run():
+            with session_factory() as db:
+                fn(db)
+        return run
+
+    return {
+        "analytics_summary": (with_session(lambda db: compute_analytics_summary(cid, db)), 1),
+        "carbon_trend": (with_session(lambda db: compute_carbon_trend(cid, db, 12)), 1),
+        "calculate_carbon": (lambda: [calculate_carbon(inputs) for _ in range(1000)], 1000),
+        "generate_pdf": (with_session(lambda db: generate_pdf(cid, db, "full", "")), 1),
+        "legacy_excel_parse": (lambda: _read_esg_sheet(io.BytesIO(workbook)), 1),
+    }
+
+
+def time_case(fn, calls: int, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000 / calls)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "calls_per_run": calls,
+        "min_ms": samples[0],
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, round(0.95 * (len(samples) - 1)))],
+        "mean_ms": statistics.fmean(samples),
+    }
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(args) -> dict:
+    url = args.database_url
+    if not url:
+        sys.exit("Set --database-url (or BENCH_DATABASE_URL) to a local PostgreSQL database.")
+    # services.db builds its engine at import; point it at the benchmark database too.
+    os.environ["DATABASE_URL"] = url
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
+
+    from services.emission_factors import get_registry
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    cases = args.cases.split(",") if args.cases else list(CASES)
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        sys.exit(f"Unknown case(s): {', '.join(sorted(unknown))}. Available: {', '.join(CASES)}")
+
+    results = []
+    server_version = ""
+    for rows in sizes:
+        print(f"[{size_label(rows)}]", file=sys.stderr)
+        schema = seed(url, rows, args.reseed)
+        engine = make_engine(url, schema)
+        try:
+            with engine.connect() as conn:
+                server_version = conn.execute(text("SHOW server_version")).scalar()
+            factory = sessionmaker(bind=engine)
+            available = build_cases(rows, factory)
+            for name in cases:
+                # The calculator doesn't read the database; time it once, not per size.
+                if name == "calculate_carbon" and any(r["case"] == name for r in results):
+                    continue
+                fn, calls = available[name]
+                repeat = args.pdf_repeat if name == "generate_pdf" else args.repeat
+                stats = time_case(fn, calls, repeat)
+                size = None if name == "calculate_carbon" else size_label(rows)
+                results.append({"case": name, "size": size, **stats})
+                print(f"  {name:<22} median {stats['median_ms']:10.3f} ms   p95 {stats['p95_ms']:10.3f} ms", file=sys.stderr)
+        finally:
+            engine.dispose()
+
+    return {
+        "meta": {
+            "commit": _git("rev-parse", "--short", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "postgres": server_version,
+            "factor_version": get_registry().version,
+            "seed": SEED,
+        },
+        "results": results,
+    }
+
+
+# ── Compare ───────────────────────────────────────────────────────────────────
+
+def compare(base: dict, head: dict, threshold: float, min_delta_ms: float) -> list[dict]:
+    """Per (case, size) median change. A regression is slower by more than both thresholds."""
+    before = {(r["case"], r["size"]): r for r in base["results"]}
+    rows = []
+    for r in head["results"]:
+        key = (r["case"], r["size"])
+        if key not in before:
+            continue
+        old, new = before[key]["median_ms"], r["median_ms"]
+        change = (new - old) / old if old else 0.0
+        rows.append({
+            "case": r["case"], "size": r["size"], "base_ms": old, "head_ms": new, "change": change,
+            "regression": change > threshold and new - old > min_delta_ms,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="seed (if needed) and time every case")
+    p_run.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", ""))
+    p_run.add_argument("--sizes", default=DEFAULT_SIZES, help=f"ledger rows per dataset (default: {DEFAULT_SIZES})")
+    p_run.add_argument("--cases", default="", help=f"comma-separated subset of: {', '.join(CASES)}")
+    p_run.add_argument("--repeat", type=int, default=7)
+    p_run.add_argument("--pdf-repeat", type=int, default=3)
+    p_run.add_argument("--reseed", action="store_true", help="drop and re-seed the benchmark schemas")
+    p_run.add_argument("--out", default="", help="write JSON results here (default: stdout)")
+
+    p_cmp = sub.add_parser("compare", help="flag regressions between two result files")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("head")
+    p_cmp.add_argument("--threshold", type=float, default=0.15, help="relative slowdown to flag (default: 0.15)")
+    p_cmp.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore smaller absolute slowdowns")
+    p_cmp.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        result = run(args)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"Wrote {args.out}", file=sys.stderr)
+        else:
+            print(json.dumps(result, indent=2))
+        return
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+    rows = compare(base, head, args.threshold, args.min_delta_ms)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"base {base['meta'].get('commit') or '?'}  →  head {head['meta'].get('commit') or '?'}")
+        print(f"  {'case':<22}{'size':>6}{'base ms':>12}{'head ms':>12}{'change':>9}")
+        for r in rows:
+            flag = "  REGRESSION" if r["regression"] else ""
+            print(f"  {r['case']:<22}{r['size'] or '-':>6}{r['base_ms']:>12.3f}{r['head_ms']:>12.3f}{r['change']:>+9.1%}{flag}")
+    if any(r["regression"] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
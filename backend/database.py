@@ -1,44 +1,138 @@
 import sqlite3
 from sqlite3 import Connection
 import os
+import queue
+import secrets
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 import io
 
 # Use persistent data directory on Render
 DATA_DIR = os.environ.get("RENDER_DISK_MOUNT_PATH", "")
 if DATA_DIR:
-    print(f"Using Render persistent disk at {DATA_DIR}")
     DB_DIR = os.path.join(DATA_DIR, "db")
     REPORTS_DIR = os.path.join(DATA_DIR, "reports")
 else:
-    print("Using local directories")
     DB_DIR = "db"
     REPORTS_DIR = "reports"
 
-# Create database directory if it doesn't exist
-os.makedirs(DB_DIR, exist_ok=True)
-os.makedirs(REPORTS_DIR, exist_ok=True)
-
 DB_PATH = os.path.join(DB_DIR, "reports.db")
 
-def get_db_connection() -> Connection:
-    """Create a connection to the SQLite database"""
-    conn = sqlite3.connect(DB_PATH)
+# Connection pool and pragma tuning (WAL lets readers run alongside the single writer)
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(16 * 1024)))
+
+# INSERT ... RETURNING needs SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _configure(conn: Connection) -> Connection:
     conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    # NORMAL is durable across application crashes in WAL mode; only an OS crash can lose the last commits
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
     return conn
 
+
+def get_db_connection() -> Connection:
+    """Create a new, tuned connection to the SQLite database (prefer `db_connection()`)"""
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    return _configure(conn)
+
+
+class _ConnectionPool:
+    """Keeps up to `size` idle connections for reuse across threads"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.pid = os.getpid()
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)
+
+    def acquire(self) -> Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return get_db_connection()
+
+    def release(self, conn: Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Don't hand a broken connection to the next caller
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool: _ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> _ConnectionPool:
+    global _pool
+    with _pool_lock:
+        # Connections must not cross a fork, so a worker process starts its own pool
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = _ConnectionPool(SQLITE_POOL_SIZE)
+        return _pool
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection; it is returned to the pool (rolled back if left open) on exit"""
+    pool = _get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def close_pool() -> None:
+    """Close idle pooled connections (e.g. on application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
 def init_db():
-    """Initialize the database with required tables"""
+    """Initialize the database with required tables and indices.
+
+    Called once from the FastAPI lifespan hook; importing this module touches nothing on disk.
+    """
+    print(f"Using Render persistent disk at {DATA_DIR}" if DATA_DIR else "Using local directories")
+    # Create database and reports directories if they don't exist
+    os.makedirs(DB_DIR, exist_ok=True)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
     conn = get_db_connection()
     try:
+        # WAL is persistent in the database file, so setting it once here covers every connection
+        conn.execute("PRAGMA journal_mode = WAL")
+
         # Check if the reports table exists
         table_exists = conn.execute(
             "SELECT name FROM sqlite_master WHERE type='table' AND name='reports'"
         ).fetchone()
         
-        # Create reports directory if it doesn't exist
-        os.makedirs(REPORTS_DIR, exist_ok=True)
-        
         if not table_exists:
             # Create the table with file_path instead of binary data
             conn.execute('''
@@ -134,13 +228,14 @@ def init_db():
                 # Rename the new table
                 conn.execute("ALTER TABLE reports_new RENAME TO reports")
                 
-                # Add indices for performance
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_id ON reports(id)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_user_id ON reports(user_id)")
-                
                 conn.execute("PRAGMA foreign_keys=on")
                 conn.commit()
                 print("Database schema updated successfully - report_data is now nullable")
+
+        # Indices for the listing queries (user filter + newest first); id is the rowid already
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_user_created ON reports(user_id, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at)")
+        conn.commit()
     except Exception as e:
         print(f"Database initialization error: {e}")
     finally:
@@ -157,45 +252,40 @@ def save_report(report_data: bytes, filename: str, user_id: str) -> int:
     Returns:
         The ID of the saved report
     """
-    conn = get_db_connection()
+    # Create user directory if it doesn't exist
+    safe_user_id = user_id.replace("/", "_").replace("\\", "_")  # Sanitize user_id for file path
+    user_dir = os.path.join(REPORTS_DIR, safe_user_id)
+    os.makedirs(user_dir, exist_ok=True)
+    
+    # Write the file before touching the database, so the write lock is held only for the
+    # INSERT and no row ever points at a missing file. A random token avoids collisions.
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    sanitized_filename = os.path.basename(filename).replace(" ", "_")
+    file_path = os.path.join(user_dir, f"{timestamp}_{secrets.token_hex(4)}_{sanitized_filename}")
+    with open(file_path, 'wb') as f:
+        f.write(report_data)
+    
+    params = (filename, file_path, datetime.now().isoformat(), len(report_data), user_id)
     try:
-        cursor = conn.cursor()
-        # First insert the record to get an ID
-        cursor.execute(
-            "INSERT INTO reports (filename, file_path, created_at, file_size, user_id) VALUES (?, ?, ?, ?, ?)",
-            (filename, "", datetime.now().isoformat(), len(report_data), user_id)
-        )
-        conn.commit()
-        report_id = cursor.lastrowid
-        
-        # Create user directory if it doesn't exist
-        safe_user_id = user_id.replace("/", "_").replace("\\", "_")  # Sanitize user_id for file path
-        user_dir = os.path.join(REPORTS_DIR, safe_user_id)
-        os.makedirs(user_dir, exist_ok=True)
-        
-        # Create file path with timestamp to avoid collisions
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        sanitized_filename = os.path.basename(filename).replace(" ", "_")
-        file_path = os.path.join(user_dir, f"{report_id}_{timestamp}_{sanitized_filename}")
-        
-        # Save the file
-        with open(file_path, 'wb') as f:
-            f.write(report_data)
-        
-        # Update the database with the file path
-        cursor.execute(
-            "UPDATE reports SET file_path = ? WHERE id = ?",
-            (file_path, report_id)
-        )
-        conn.commit()
-        
-        print(f"Report saved to file: {file_path}")
-        return report_id
+        with db_connection() as conn, conn:
+            if _HAS_RETURNING:
+                report_id = conn.execute(
+                    "INSERT INTO reports (filename, file_path, created_at, file_size, user_id) "
+                    "VALUES (?, ?, ?, ?, ?) RETURNING id",
+                    params
+                ).fetchone()[0]
+            else:
+                report_id = conn.execute(
+                    "INSERT INTO reports (filename, file_path, created_at, file_size, user_id) VALUES (?, ?, ?, ?, ?)",
+                    params
+                ).lastrowid
     except Exception as e:
         print(f"Error saving report: {e}")
+        os.remove(file_path)
         raise
-    finally:
-        conn.close()
+    
+    print(f"Report saved to file: {file_path}")
+    return report_id
 
 def get_report(report_id: int, user_id: str = None) -> tuple[bytes, str]:
     """Retrieve a report from the filesystem by ID
@@ -207,63 +297,55 @@ def get_report(report_id: int, user_id: str = None) -> tuple[bytes, str]:
     Returns:
         Tuple of (report_data, filename) or (None, None) if not found/not authorized
     """
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        
-        # Add index to improve query performance if it doesn't exist
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_reports_id ON reports(id);
-        """)
-        conn.commit()
-        
-        # Check if report exists and get metadata first (for quick checking)
-        query_params = [report_id]
-        query = "SELECT id, filename, file_path FROM reports WHERE id = ?"
-        
-        if user_id:
-            query += " AND user_id = ?"
-            query_params.append(user_id)
+        with db_connection() as conn:
+            # Check if report exists and get metadata first (for quick checking)
+            query_params = [report_id]
+            query = "SELECT id, filename, file_path FROM reports WHERE id = ?"
+            
+            if user_id:
+                query += " AND user_id = ?"
+                query_params.append(user_id)
+            
+            result = conn.execute(query, query_params).fetchone()
+            
+            if result is None:
+                print(f"Report {report_id} not found or not authorized")
+                return None, None
+            
+            # Check if we have a file path (migrated storage) or report_data (legacy)
+            if not result['file_path']:
+                # Try to get legacy BLOB data
+                columns = {col['name'] for col in conn.execute("PRAGMA table_info(reports)")}
+                legacy_result = conn.execute(
+                    "SELECT report_data, filename FROM reports WHERE id = ?", 
+                    (report_id,)
+                ).fetchone() if 'report_data' in columns else None
+                
+                if legacy_result is None or legacy_result['report_data'] is None:
+                    print(f"No file path or BLOB data found for report ID {report_id}")
+                    return None, None
+                    
+                print(f"Retrieved legacy BLOB report: {legacy_result['filename']}")
+                return legacy_result["report_data"], legacy_result["filename"]
         
-        result = cursor.execute(query, query_params).fetchone()
+        # The connection is back in the pool before the file is read
+        file_path = result['file_path']
         
-        if result is None:
-            print(f"Report {report_id} not found or not authorized")
+        # Check if file exists
+        if not os.path.isfile(file_path):
+            print(f"Report file not found: {file_path}")
             return None, None
-        
-        # Check if we have a file path (migrated storage) or report_data (legacy)
-        if 'file_path' in result and result['file_path']:
-            file_path = result['file_path']
             
-            # Check if file exists
-            if not os.path.isfile(file_path):
-                print(f"Report file not found: {file_path}")
-                return None, None
-                
-            # Read file contents
-            with open(file_path, 'rb') as f:
-                report_data = f.read()
-                
-            print(f"Successfully retrieved report from filesystem: {result['filename']} ({len(report_data)} bytes)")
-            return report_data, result['filename']
-        else:
-            # Try to get legacy BLOB data
-            legacy_result = cursor.execute(
-                "SELECT report_data, filename FROM reports WHERE id = ?", 
-                (report_id,)
-            ).fetchone()
+        # Read file contents
+        with open(file_path, 'rb') as f:
+            report_data = f.read()
             
-            if legacy_result is None or 'report_data' not in legacy_result:
-                print(f"No file path or BLOB data found for report ID {report_id}")
-                return None, None
-                
-            print(f"Retrieved legacy BLOB report: {legacy_result['filename']}")
-            return legacy_result["report_data"], legacy_result["filename"]
+        print(f"Successfully retrieved report from filesystem: {result['filename']} ({len(report_data)} bytes)")
+        return report_data, result['filename']
     except Exception as e:
         print(f"Error retrieving report: {e}")
         return None, None
-    finally:
-        conn.close()
 
 def get_all_reports(user_id: str = None, limit: int = 50):
     """Get a list of reports (without the actual file data)
@@ -275,35 +357,9 @@ def get_all_reports(user_id: str = None, limit: int = 50):
     Returns:
         List of report metadata dictionaries
     """
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        
-        # Add index to improve query performance if it doesn't exist
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_reports_user_id ON reports(user_id);
-        """)
-        conn.commit()
-        
-        if user_id:
-            # Use LIMIT for better performance with large datasets
-            reports = cursor.execute(
-                """SELECT id, filename, file_path, created_at, file_size, user_id,
-                   (CASE WHEN LENGTH(filename) > 50 THEN substr(filename, 1, 50) || '...' ELSE filename END) as display_name,
-                   (CASE WHEN file_path != '' AND file_path IS NOT NULL THEN 1 ELSE 0 END) as is_file_stored
-                   FROM reports WHERE user_id = ? ORDER BY created_at DESC LIMIT ?""",
-                (user_id, limit)
-            ).fetchall()
-            print(f"Found {len(reports)} reports for user {user_id}")
-        else:
-            reports = cursor.execute(
-                """SELECT id, filename, file_path, created_at, file_size, user_id,
-                   (CASE WHEN LENGTH(filename) > 50 THEN substr(filename, 1, 50) || '...' ELSE filename END) as display_name,
-                   (CASE WHEN file_path != '' AND file_path IS NOT NULL THEN 1 ELSE 0 END) as is_file_stored
-                   FROM reports ORDER BY created_at DESC LIMIT ?""",
-                (limit,)
-            ).fetchall()
-            print(f"Found {len(reports)} total reports (limited to {limit})")
+        with db_connection() as conn:
+            reports = _list_reports(conn, user_id, limit)
         
         # Convert rows to dictionaries and check file existence
         result = []
@@ -326,37 +382,55 @@ def get_all_reports(user_id: str = None, limit: int = 50):
     except Exception as e:
         print(f"Error in get_all_reports: {e}")
         return []
-    finally:
-        conn.close()
+
+
+def _list_reports(conn: Connection, user_id: str = None, limit: int = 50) -> list:
+    cursor = conn.cursor()
+
+    if user_id:
+        # Use LIMIT for better performance with large datasets
+        reports = cursor.execute(
+            """SELECT id, filename, file_path, created_at, file_size, user_id,
+               (CASE WHEN LENGTH(filename) > 50 THEN substr(filename, 1, 50) || '...' ELSE filename END) as display_name,
+               (CASE WHEN file_path != '' AND file_path IS NOT NULL THEN 1 ELSE 0 END) as is_file_stored
+               FROM reports WHERE user_id = ? ORDER BY created_at DESC LIMIT ?""",
+            (user_id, limit)
+        ).fetchall()
+        print(f"Found {len(reports)} reports for user {user_id}")
+    else:
+        reports = cursor.execute(
+            """SELECT id, filename, file_path, created_at, file_size, user_id,
+               (CASE WHEN LENGTH(filename) > 50 THEN substr(filename, 1, 50) || '...' ELSE filename END) as display_name,
+               (CASE WHEN file_path != '' AND file_path IS NOT NULL THEN 1 ELSE 0 END) as is_file_stored
+               FROM reports ORDER BY created_at DESC LIMIT ?""",
+            (limit,)
+        ).fetchall()
+        print(f"Found {len(reports)} total reports (limited to {limit})")
+    return reports
+
 
 def debug_db():
     """Debug function to print database info"""
-    conn = get_db_connection()
     try:
-        # Check if the reports table exists
-        table_info = conn.execute("PRAGMA table_info(reports)").fetchall()
-        print("Table schema:", [dict(col) for col in table_info])
-        
-        # Check reports count
-        report_count = conn.execute("SELECT COUNT(*) as count FROM reports").fetchone()
-        print(f"Total reports in database: {report_count['count']}")
-        
-        # Check reports by user
-        reports_by_user = conn.execute(
-            "SELECT user_id, COUNT(*) as count FROM reports GROUP BY user_id"
-        ).fetchall()
-        print("Reports by user:", [dict(r) for r in reports_by_user])
-        
-        # List all reports
-        all_reports = conn.execute(
-            "SELECT id, filename, created_at, user_id FROM reports"
-        ).fetchall()
-        print("All reports:", [dict(r) for r in all_reports])
+        with db_connection() as conn:
+            # Check if the reports table exists
+            table_info = conn.execute("PRAGMA table_info(reports)").fetchall()
+            print("Table schema:", [dict(col) for col in table_info])
+            
+            # Check reports count
+            report_count = conn.execute("SELECT COUNT(*) as count FROM reports").fetchone()
+            print(f"Total reports in database: {report_count['count']}")
+            
+            # Check reports by user
+            reports_by_user = conn.execute(
+                "SELECT user_id, COUNT(*) as count FROM reports GROUP BY user_id"
+            ).fetchall()
+            print("Reports by user:", [dict(r) for r in reports_by_user])
+            
+            # List all reports
+            all_reports = conn.execute(
+                "SELECT id, filename, created_at, user_id FROM reports"
+            ).fetchall()
+            print("All reports:", [dict(r) for r in all_reports])
     except Exception as e:
         print(f"Error debugging database: {e}")
-    finally:
-        conn.close()
-
-# Initialize the database when this module is imported
-init_db()
-debug_db()
\ No newline at end of file
@@ -3,18 +3,48 @@ BestByte ESG Vision — Backend API
 FastAPI application with modular router structure.
 """
 import os
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from database import init_db
-from routers import health, esg, analytics, carbon, reports
+from database import close_pool as close_sqlite_pool, init_db
+from services import metrics
+from services.data_versions import ConditionalGetMiddleware
+from services.db import DB_THREADPOOL_SIZE, engine
+from services.emission_factors import get_registry
+from services.charts import shutdown_executor as shutdown_chart_pool
+from services.dashboard import shutdown_executor as shutdown_dashboard_pool
+from services.report_jobs import resume_pending_jobs, shutdown_executor
+from routers import health, esg, analytics, carbon, reports, dashboard
 
 # Legacy endpoints (uploadfile, /report) kept for backwards compatibility
 from routers.legacy import legacy_router
 
 load_dotenv()
-init_db()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync DB handlers share this limiter; keep it in step with the connection pool.
+    to_thread.current_default_thread_limiter().total_tokens = DB_THREADPOOL_SIZE
+    init_db()  # legacy report store: schema, indices, WAL — once per process, not per import
+    get_registry()  # parse the emission-factor table once, before the first request
+    try:
+        resumed = resume_pending_jobs()
+        if resumed:
+            print(f"Resumed {resumed} queued report job(s)")
+    except Exception as e:
+        print(f"Could not resume report jobs: {e}")
+    yield
+    shutdown_executor()
+    shutdown_chart_pool()
+    shutdown_dashboard_pool()
+    close_sqlite_pool()
+
 
 app = FastAPI(
     title="BestByte ESG Vision API",
@@ -22,8 +52,18 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# ── Metrics ───────────────────────────────────────────────────────────────────
+# Per-route latency, SQL count/time per request (Server-Timing header), R2 and PDF timings.
+metrics.instrument_engine(engine)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# ── Conditional GET ───────────────────────────────────────────────────────────
+# ETag / Last-Modified from the per-company data version (services/data_versions.py).
+app.add_middleware(ConditionalGetMiddleware)
+
 # ── CORS ───────────────────────────────────────────────────────────────────────
 ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -50,9 +90,15 @@ app.include_router(esg.router)
 app.include_router(analytics.router)
 app.include_router(carbon.router)
 app.include_router(reports.router)
+app.include_router(dashboard.router)
 app.include_router(legacy_router)
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     return {
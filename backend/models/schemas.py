@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Annotated, Literal, Optional, List
 from datetime import date, datetime
+from uuid import UUID
 from enum import Enum
 
 
@@ -30,7 +31,7 @@ class DisposalMethod(str, Enum):
 class CarbonEntry(BaseModel):
     id: Optional[str] = None
     company_id: str
-    scope: int = Field(..., ge=1, le=3)
+    scope: Optional[int] = Field(..., ge=1, le=3)   # null: a reported total not split by scope
     category: Optional[str] = None
     source_description: Optional[str] = None
     emissions_co2_tons: float
@@ -44,7 +45,7 @@ class CarbonEntry(BaseModel):
 
 class CarbonCreate(BaseModel):
     company_id: str
-    scope: int = Field(..., ge=1, le=3)
+    scope: Optional[int] = Field(..., ge=1, le=3)   # null: a reported total not split by scope
     category: Optional[str] = None
     source_description: Optional[str] = None
     emissions_co2_tons: float
@@ -230,6 +231,8 @@ class CarbonCalculatorInput(BaseModel):
     hotel_nights: float = 0.0
     waste_kg: float = 0.0
     water_m3: float = 0.0
+    # Factor vintage; latest published when omitted
+    factor_year: Optional[int] = None
     # Company context
     company_id: Optional[str] = None
 
@@ -248,6 +251,50 @@ class CarbonCalculatorResponse(BaseModel):
     methodology: str = "GHG Protocol Corporate Standard"
 
 
+class CarbonBatchInput(BaseModel):
+    inputs: List[CarbonCalculatorInput] = Field(..., min_length=1, max_length=100_000)
+
+
+class CarbonBatchResponse(BaseModel):
+    count: int
+    results: List[ScopeBreakdown]
+    totals: ScopeBreakdown
+    methodology: str = "GHG Protocol Corporate Standard"
+
+
+class ScenarioLever(BaseModel):
+    # Calculator field to act on (e.g. "diesel_liters"), or "country_grid" to switch grids
+    activity: str
+    name: Optional[str] = None
+    # Grid points / discrete choices: fractions of the baseline activity removed
+    # (0.2 = cut by 20%, negative = growth), or grid codes for "country_grid"
+    values: Optional[List[float | str]] = None
+    weights: Optional[List[float]] = None          # sampling weights for `values`
+    # Continuous range, sampled (monte_carlo) or split into `steps` points (grid)
+    distribution: Literal["uniform", "normal", "triangular"] = "uniform"
+    low: Optional[float] = None
+    high: Optional[float] = None
+    mode: Optional[float] = None
+    mean: Optional[float] = None
+    sd: Optional[float] = None
+    steps: int = Field(5, ge=2, le=1000)
+    # Fuel switching: removed activity reappears as shift_ratio units of shift_to
+    shift_to: Optional[str] = None
+    shift_ratio: float = 1.0
+    # Cost of applying the lever at 1.0 (full removal); enables $/tCO2e ranking
+    cost_per_unit: Optional[float] = None
+
+
+class ScenarioRequest(BaseModel):
+    baseline: CarbonCalculatorInput
+    levers: List[ScenarioLever] = Field(..., min_length=1, max_length=32)
+    method: Literal["grid", "monte_carlo"] = "grid"
+    samples: int = Field(10_000, ge=1)
+    seed: Optional[int] = None
+    percentiles: List[Annotated[float, Field(ge=0, le=100)]] = Field([5, 25, 50, 75, 95], min_length=1, max_length=32)
+    top: int = Field(10, ge=0, le=1000)
+
+
 # ── Analytics ──────────────────────────────────────────────────────────────────
 
 class ESGScore(BaseModel):
@@ -273,3 +320,32 @@ class AnalyticsSummary(BaseModel):
     carbon_trend: List[TrendPoint]
     targets_on_track: int
     targets_total: int
+
+
+class PortfolioRequest(BaseModel):
+    # Omit to score every company in the database
+    company_ids: Optional[List[UUID]] = Field(None, min_length=1, max_length=5000)
+    months: int = Field(12, ge=1, le=36)
+    sort_by: Literal["overall", "environmental", "social", "governance", "total_carbon"] = "overall"
+    # Reporting-period scope, as for the GET /api/analytics/* query params
+    date_from: Optional[date] = Field(None, alias="from")
+    date_to: Optional[date] = Field(None, alias="to")
+    period: Optional[str] = None
+
+    model_config = {"populate_by_name": True}
+
+
+class PortfolioHolding(AnalyticsSummary):
+    rank: int = 0
+    name: str
+    industry: Optional[str] = None
+
+
+class PortfolioResponse(BaseModel):
+    count: int
+    sort_by: str
+    average_score: Optional[ESGScore]
+    total_carbon_tco2e: float
+    grade_distribution: dict
+    holdings: List[PortfolioHolding]
+    missing: List[str] = []
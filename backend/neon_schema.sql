@@ -65,6 +65,32 @@ CREATE TABLE IF NOT EXISTS sustainability_reports (
   updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Background PDF generation queue (see services/report_jobs.py)
+CREATE TABLE IF NOT EXISTS report_jobs (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  company_id UUID REFERENCES companies(id) ON DELETE CASCADE,
+  created_by TEXT NOT NULL,
+  report_type TEXT NOT NULL,
+  period TEXT,
+  status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  report_id UUID REFERENCES sustainability_reports(id) ON DELETE SET NULL,
+  file_url TEXT,
+  filename TEXT,
+  file_size INTEGER,
+  fingerprint TEXT,
+  cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
+  error TEXT,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_report_jobs_pending ON report_jobs (created_at) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_report_jobs_created_by ON report_jobs (created_by, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_report_jobs_fingerprint ON report_jobs (fingerprint, finished_at DESC) WHERE status = 'done';
+
 CREATE TABLE IF NOT EXISTS carbon_footprint_details (
   id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
   company_id UUID REFERENCES companies(id) ON DELETE CASCADE,
@@ -81,6 +107,39 @@ CREATE TABLE IF NOT EXISTS carbon_footprint_details (
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Per-company, per-period, per-scope carbon totals, maintained incrementally by
+-- every API write into carbon_footprint_details (see services/carbon_rollup.py).
+-- Scope 0 holds ledger rows without a scope.
+CREATE TABLE IF NOT EXISTS carbon_monthly_rollup (
+  company_id UUID REFERENCES companies(id) ON DELETE CASCADE,
+  reporting_period DATE NOT NULL,
+  scope INTEGER NOT NULL,
+  total_tco2e DECIMAL(16,2) NOT NULL DEFAULT 0,
+  entry_count INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (company_id, reporting_period, scope)
+);
+
+-- Backfill for existing ledgers; a no-op for periods the rollup already has.
+INSERT INTO carbon_monthly_rollup (company_id, reporting_period, scope, total_tco2e, entry_count)
+SELECT company_id, reporting_period, COALESCE(scope, 0), SUM(emissions_co2_tons), COUNT(*)
+FROM carbon_footprint_details
+WHERE company_id IS NOT NULL AND reporting_period IS NOT NULL AND emissions_co2_tons IS NOT NULL
+GROUP BY company_id, reporting_period, COALESCE(scope, 0)
+ON CONFLICT (company_id, reporting_period, scope) DO NOTHING;
+
+-- Per-company data version, bumped in the same transaction as every API write to
+-- the company's ledgers (see services/data_versions.py); drives ETag / Last-Modified.
+CREATE TABLE IF NOT EXISTS company_data_versions (
+  company_id UUID PRIMARY KEY REFERENCES companies(id) ON DELETE CASCADE,
+  version BIGINT NOT NULL DEFAULT 1,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO company_data_versions (company_id)
+SELECT id FROM companies
+ON CONFLICT (company_id) DO NOTHING;
+
 CREATE TABLE IF NOT EXISTS energy_consumption (
   id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
   company_id UUID REFERENCES companies(id) ON DELETE CASCADE,
@@ -245,6 +304,16 @@ CREATE TABLE IF NOT EXISTS dashboard_configurations (
   updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Keyset pagination indexes: (company_id, sort key, id) match the ORDER BY of
+-- the /api/esg list endpoints, so every page is an index range scan.
+CREATE INDEX IF NOT EXISTS idx_carbon_company_period ON carbon_footprint_details (company_id, reporting_period DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_energy_company_period ON energy_consumption (company_id, reporting_period DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_waste_company_period ON waste_management_data (company_id, reporting_period DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_water_company_period ON water_usage_details (company_id, reporting_period DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_employee_company_period ON employee_engagement (company_id, reporting_period DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_suppliers_company_score ON supply_chain_metrics (company_id, esg_score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_targets_company_date ON esg_targets (company_id, target_date, id);
+
 -- updated_at trigger
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
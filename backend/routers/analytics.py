@@ -1,52 +1,85 @@
 from fastapi import APIRouter, Query, Depends
 from sqlalchemy.orm import Session
-from services.db import get_db
+from services.db import DEFAULT_COMPANY_ID, get_db
+from services.analytics_cache import analytics_cache
+from services.data_versions import conditional_get
+from services.periods import PeriodRange, query_period, reporting_period
+from models.schemas import PortfolioRequest
 from services.esg_analytics import (
     compute_analytics_summary,
     compute_esg_score,
     compute_carbon_trend,
-    compute_environmental_score,
-    compute_social_score,
-    compute_governance_score,
+    compute_portfolio,
+    breakdown_from,
 )
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
-DEFAULT_COMPANY = "8479cb95-2057-490d-813c-825e83d71890"
+DEFAULT_COMPANY = DEFAULT_COMPANY_ID
 
 
 @router.get("/summary")
-async def analytics_summary(company_id: str = Query(DEFAULT_COMPANY), db: Session = Depends(get_db)):
-    return compute_analytics_summary(company_id, db)
+def analytics_summary(
+    company_id: str = Query(DEFAULT_COMPANY),
+    period: PeriodRange = Depends(reporting_period),
+    version: int = Depends(conditional_get),
+    db: Session = Depends(get_db),
+):
+    return analytics_cache.get_or_compute(
+        company_id, ("summary", period.key, version), lambda: compute_analytics_summary(company_id, db, period)
+    )
 
 
 @router.get("/score")
-async def esg_score(company_id: str = Query(DEFAULT_COMPANY), db: Session = Depends(get_db)):
-    return compute_esg_score(company_id, db)
+def esg_score(
+    company_id: str = Query(DEFAULT_COMPANY),
+    period: PeriodRange = Depends(reporting_period),
+    version: int = Depends(conditional_get),
+    db: Session = Depends(get_db),
+):
+    return analytics_cache.get_or_compute(
+        company_id, ("score", period.key, version), lambda: compute_esg_score(company_id, db, period)
+    )
 
 
 @router.get("/carbon-trend")
-async def carbon_trend(
+def carbon_trend(
     company_id: str = Query(DEFAULT_COMPANY),
     months: int = Query(12, ge=1, le=36),
+    period: PeriodRange = Depends(reporting_period),
+    version: int = Depends(conditional_get),
     db: Session = Depends(get_db),
 ):
-    return {"trend": compute_carbon_trend(company_id, db, months)}
+    trend = analytics_cache.get_or_compute(
+        company_id, ("carbon-trend", months, period.key, version), lambda: compute_carbon_trend(company_id, db, months, period)
+    )
+    return {"trend": trend}
 
 
 @router.get("/scores/breakdown")
-async def score_breakdown(company_id: str = Query(DEFAULT_COMPANY), db: Session = Depends(get_db)):
-    return {
-        "environmental": {
-            "score": compute_environmental_score(company_id, db),
-            "methodology": "40% renewable energy share + 30% recycling rate + 30% env target progress",
-        },
-        "social": {
-            "score": compute_social_score(company_id, db),
-            "methodology": "35% employee satisfaction + 30% gender diversity + 35% safety record",
-        },
-        "governance": {
-            "score": compute_governance_score(company_id, db),
-            "methodology": "Average progress across all active governance targets",
-        },
-    }
+def score_breakdown(
+    company_id: str = Query(DEFAULT_COMPANY),
+    period: PeriodRange = Depends(reporting_period),
+    version: int = Depends(conditional_get),
+    db: Session = Depends(get_db),
+):
+    score = analytics_cache.get_or_compute(
+        company_id, ("score", period.key, version), lambda: compute_esg_score(company_id, db, period)
+    )
+    return breakdown_from(score)
+
+
+@router.post("/portfolio")
+def portfolio(req: PortfolioRequest, db: Session = Depends(get_db)):
+    """
+    Score and rank a portfolio of companies (or all of them) in one query.
+    Each holding carries the same fields as /summary plus its rank.
+    """
+    company_ids = [str(c) for c in req.company_ids] if req.company_ids else None
+    period = query_period(req.date_from, req.date_to, req.period)
+    return compute_portfolio(company_ids, db, req.months, req.sort_by, period)
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return analytics_cache.stats()
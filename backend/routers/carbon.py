@@ -1,6 +1,12 @@
-from fastapi import APIRouter
-from models.schemas import CarbonCalculatorInput, CarbonCalculatorResponse
-from services.carbon_engine import calculate_carbon, get_emission_factors
+import json
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from models.schemas import (
+    CarbonCalculatorInput, CarbonCalculatorResponse, CarbonBatchInput, CarbonBatchResponse, ScenarioRequest,
+)
+from services.carbon_engine import calculate_carbon, calculate_carbon_batch, get_emission_factors
+from services.emission_factors import get_registry
 
 router = APIRouter(prefix="/api/carbon", tags=["carbon-calculator"])
 
@@ -15,6 +21,37 @@ async def calculate_emissions(inputs: CarbonCalculatorInput):
     return CarbonCalculatorResponse(input=inputs, result=result)
 
 
+@router.post("/calculate/batch", response_model=CarbonBatchResponse)
+def calculate_emissions_batch(batch: CarbonBatchInput):
+    """
+    Calculate emissions for many sites/scenarios in one vectorized pass.
+    Per-row results are identical to /calculate; totals sum the whole batch.
+    """
+    results, totals = calculate_carbon_batch(batch.inputs)
+    return CarbonBatchResponse(count=len(results), results=results, totals=totals)
+
+
+@router.post("/scenarios")
+def run_scenarios(req: ScenarioRequest, stream: bool = Query(False)):
+    """
+    What-if sweep over the calculator: the full grid of lever values or Monte Carlo
+    samples, summarised as percentile bands and a per-lever abatement ranking.
+    With ?stream=true the response is NDJSON progress events ending in the summary.
+    """
+    from services.scenario_engine import iter_scenarios  # NumPy, loaded on first sweep
+
+    try:
+        events = iter_scenarios(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if stream:
+        return StreamingResponse((json.dumps(e) + "\n" for e in events), media_type="application/x-ndjson")
+    summary = None
+    for summary in events:
+        pass
+    return summary
+
+
 @router.get("/emission-factors")
 async def emission_factors():
     """Return all emission factors used in calculations (for transparency)."""
@@ -26,9 +63,7 @@ async def available_grids():
     """Return supported electricity grid regions."""
     return {
         "grids": [
-            {"code": "US", "label": "United States (EPA eGRID 2023)", "factor_tco2e_per_kwh": 0.000386},
-            {"code": "UK", "label": "United Kingdom (DEFRA 2024)", "factor_tco2e_per_kwh": 0.000207},
-            {"code": "EU", "label": "European Union (EEA 2023)", "factor_tco2e_per_kwh": 0.000275},
-            {"code": "global", "label": "Global Average (IEA 2023)", "factor_tco2e_per_kwh": 0.000490},
+            {"code": f.region, "label": f.label, "factor_tco2e_per_kwh": f.factor, "year": f.year, "source": f.source}
+            for f in get_registry().grids()
         ]
     }
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from services.dashboard import WIDGETS, DashboardQuery, build_dashboard
+from services.data_versions import conditional_get
+from services.db import DEFAULT_COMPANY_ID, get_db, json_response
+from services.periods import PeriodRange, reporting_period
+
+router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
+
+DEFAULT_WIDGETS = "summary,breakdown,carbon_trend,carbon,energy,waste,water,targets"
+
+
+@router.get("")
+def dashboard(
+    company_id: str = Query(DEFAULT_COMPANY_ID),
+    widgets: str = Query(DEFAULT_WIDGETS, description=f"Comma-separated, any of: {', '.join(WIDGETS)}"),
+    months: int = Query(12, ge=1, le=36, description="carbon_trend length"),
+    limit: int = Query(10, ge=1, le=500, description="Rows per ledger widget"),
+    period: PeriodRange = Depends(reporting_period),
+    version: int = Depends(conditional_get),
+    db: Session = Depends(get_db),
+):
+    """
+    Every widget a dashboard page needs in one round trip. Each widget holds what
+    its standalone endpoint (/api/analytics/*, /api/esg/*) would return; with a
+    period, ledger widgets list only rows inside it.
+    """
+    requested = list(dict.fromkeys(w.strip() for w in widgets.split(",") if w.strip()))
+    unknown = [w for w in requested if w not in WIDGETS]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown widget(s): {', '.join(unknown) or '(none given)'}. Available: {', '.join(WIDGETS)}",
+        )
+    query = DashboardQuery(company_id, months, limit, period, version)
+    return json_response(build_dashboard(db, requested, query))
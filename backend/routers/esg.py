@@ -1,41 +1,51 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+import json, os, shutil, tempfile
+from fastapi import APIRouter, Query, HTTPException, Depends, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import Optional
+from typing import Literal, Optional
 from models.schemas import (
     CarbonCreate, EnergyCreate, WasteCreate, WaterCreate,
     EmployeeCreate, SupplierCreate, EsgTargetCreate,
 )
-from services.db import get_db, rows_to_list
+from services.db import DEFAULT_COMPANY_ID, get_db, SessionLocal
+from services.pagination import fetch_page
+from services.analytics_cache import analytics_cache
+from services.bulk_ingest import BULK_MAX_ROWS, validate_rows, bulk_write
+from services.carbon_rollup import apply_carbon_rows
+from services.data_versions import bump_version, conditional_get
+from services.file_ingest import INGEST_MAX_BYTES, SHEET_NAME, ingest_file
+from services.ledger_export import EXPORT_FORMATS, EXPORT_LEDGERS, export_ledger, has_period, parquet_available
+from services.pagination import parse_fields
+from services.periods import PeriodRange, reporting_period
 
 router = APIRouter(prefix="/api/esg", tags=["esg-data"])
 
-DEFAULT_COMPANY = "8479cb95-2057-490d-813c-825e83d71890"
+DEFAULT_COMPANY = DEFAULT_COMPANY_ID
 
 
 # ── Carbon Footprint ───────────────────────────────────────────────────────────
 
-@router.get("/carbon")
-async def get_carbon(
+@router.get("/carbon", dependencies=[Depends(conditional_get)])
+def get_carbon(
     company_id: str = Query(DEFAULT_COMPANY),
     scope: Optional[int] = Query(None, ge=1, le=3),
-    limit: int = Query(100, le=500),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     db: Session = Depends(get_db),
 ):
-    sql = "SELECT * FROM carbon_footprint_details WHERE company_id = :company_id"
-    params = {"company_id": company_id}
+    where, params = ["company_id = :company_id"], {"company_id": company_id}
     if scope:
-        sql += " AND scope = :scope"
+        where.append("scope = :scope")
         params["scope"] = scope
-    sql += " ORDER BY reporting_period DESC LIMIT :limit"
-    params["limit"] = limit
-    rows = db.execute(text(sql), params).mappings().all()
-    data = rows_to_list(rows)
-    return {"data": data, "count": len(data)}
-
+    return fetch_page(db, "carbon_footprint_details", where, params, "reporting_period",
+                      limit=limit, cursor=cursor, fields=fields)
 
 @router.post("/carbon", status_code=201)
-async def create_carbon(entry: CarbonCreate, db: Session = Depends(get_db)):
+def create_carbon(entry: CarbonCreate, db: Session = Depends(get_db)):
     sql = """
         INSERT INTO carbon_footprint_details
             (company_id, scope, category, source_description, emissions_co2_tons,
@@ -46,33 +56,33 @@ async def create_carbon(entry: CarbonCreate, db: Session = Depends(get_db)):
         RETURNING *
     """
     row = db.execute(text(sql), entry.model_dump()).mappings().first()
+    apply_carbon_rows(db, [row])
+    bump_version(db, [entry.company_id])
     db.commit()
+    analytics_cache.invalidate(entry.company_id)
     return dict(row)
 
 
 # ── Energy Consumption ─────────────────────────────────────────────────────────
 
-@router.get("/energy")
-async def get_energy(
+@router.get("/energy", dependencies=[Depends(conditional_get)])
+def get_energy(
     company_id: str = Query(DEFAULT_COMPANY),
     energy_type: Optional[str] = Query(None),
-    limit: int = Query(100, le=500),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     db: Session = Depends(get_db),
 ):
-    sql = "SELECT * FROM energy_consumption WHERE company_id = :company_id"
-    params = {"company_id": company_id}
+    where, params = ["company_id = :company_id"], {"company_id": company_id}
     if energy_type:
-        sql += " AND energy_type = :energy_type"
+        where.append("energy_type = :energy_type")
         params["energy_type"] = energy_type
-    sql += " ORDER BY reporting_period DESC LIMIT :limit"
-    params["limit"] = limit
-    rows = db.execute(text(sql), params).mappings().all()
-    data = rows_to_list(rows)
-    return {"data": data, "count": len(data)}
-
+    return fetch_page(db, "energy_consumption", where, params, "reporting_period",
+                      limit=limit, cursor=cursor, fields=fields)
 
 @router.post("/energy", status_code=201)
-async def create_energy(entry: EnergyCreate, db: Session = Depends(get_db)):
+def create_energy(entry: EnergyCreate, db: Session = Depends(get_db)):
     sql = """
         INSERT INTO energy_consumption
             (company_id, facility_name, energy_type, source, consumption_kwh, cost, currency, reporting_period)
@@ -81,33 +91,32 @@ async def create_energy(entry: EnergyCreate, db: Session = Depends(get_db)):
         RETURNING *
     """
     row = db.execute(text(sql), entry.model_dump()).mappings().first()
+    bump_version(db, [entry.company_id])
     db.commit()
+    analytics_cache.invalidate(entry.company_id)
     return dict(row)
 
 
 # ── Waste Management ───────────────────────────────────────────────────────────
 
-@router.get("/waste")
-async def get_waste(
+@router.get("/waste", dependencies=[Depends(conditional_get)])
+def get_waste(
     company_id: str = Query(DEFAULT_COMPANY),
     disposal_method: Optional[str] = Query(None),
-    limit: int = Query(100, le=500),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     db: Session = Depends(get_db),
 ):
-    sql = "SELECT * FROM waste_management_data WHERE company_id = :company_id"
-    params = {"company_id": company_id}
+    where, params = ["company_id = :company_id"], {"company_id": company_id}
     if disposal_method:
-        sql += " AND disposal_method = :disposal_method"
+        where.append("disposal_method = :disposal_method")
         params["disposal_method"] = disposal_method
-    sql += " ORDER BY reporting_period DESC LIMIT :limit"
-    params["limit"] = limit
-    rows = db.execute(text(sql), params).mappings().all()
-    data = rows_to_list(rows)
-    return {"data": data, "count": len(data)}
-
+    return fetch_page(db, "waste_management_data", where, params, "reporting_period",
+                      limit=limit, cursor=cursor, fields=fields)
 
 @router.post("/waste", status_code=201)
-async def create_waste(entry: WasteCreate, db: Session = Depends(get_db)):
+def create_waste(entry: WasteCreate, db: Session = Depends(get_db)):
     sql = """
         INSERT INTO waste_management_data
             (company_id, facility_name, waste_type, waste_category, amount_kg, disposal_method, cost, currency, reporting_period)
@@ -116,26 +125,27 @@ async def create_waste(entry: WasteCreate, db: Session = Depends(get_db)):
         RETURNING *
     """
     row = db.execute(text(sql), entry.model_dump()).mappings().first()
+    bump_version(db, [entry.company_id])
     db.commit()
+    analytics_cache.invalidate(entry.company_id)
     return dict(row)
 
 
 # ── Water Usage ────────────────────────────────────────────────────────────────
 
-@router.get("/water")
-async def get_water(
+@router.get("/water", dependencies=[Depends(conditional_get)])
+def get_water(
     company_id: str = Query(DEFAULT_COMPANY),
-    limit: int = Query(100, le=500),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     db: Session = Depends(get_db),
 ):
-    sql = "SELECT * FROM water_usage_details WHERE company_id = :company_id ORDER BY reporting_period DESC LIMIT :limit"
-    rows = db.execute(text(sql), {"company_id": company_id, "limit": limit}).mappings().all()
-    data = rows_to_list(rows)
-    return {"data": data, "count": len(data)}
-
+    return fetch_page(db, "water_usage_details", ["company_id = :company_id"], {"company_id": company_id},
+                      "reporting_period", limit=limit, cursor=cursor, fields=fields)
 
 @router.post("/water", status_code=201)
-async def create_water(entry: WaterCreate, db: Session = Depends(get_db)):
+def create_water(entry: WaterCreate, db: Session = Depends(get_db)):
     sql = """
         INSERT INTO water_usage_details
             (company_id, facility_name, usage_type, source, consumption_liters, cost, currency, reporting_period)
@@ -144,30 +154,32 @@ async def create_water(entry: WaterCreate, db: Session = Depends(get_db)):
         RETURNING *
     """
     row = db.execute(text(sql), entry.model_dump()).mappings().first()
+    bump_version(db, [entry.company_id])
     db.commit()
+    analytics_cache.invalidate(entry.company_id)
     return dict(row)
 
 
 # ── Employee Engagement ────────────────────────────────────────────────────────
 
-@router.get("/employees")
-async def get_employees(
+@router.get("/employees", dependencies=[Depends(conditional_get)])
+def get_employees(
     company_id: str = Query(DEFAULT_COMPANY),
     category: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit to return every row"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     db: Session = Depends(get_db),
 ):
-    sql = "SELECT * FROM employee_engagement WHERE company_id = :company_id"
-    params = {"company_id": company_id}
+    where, params = ["company_id = :company_id"], {"company_id": company_id}
     if category:
-        sql += " AND category = :category"
+        where.append("category = :category")
         params["category"] = category
-    rows = db.execute(text(sql), params).mappings().all()
-    data = rows_to_list(rows)
-    return {"data": data, "count": len(data)}
-
+    return fetch_page(db, "employee_engagement", where, params, "reporting_period",
+                      limit=limit, cursor=cursor, fields=fields)
 
 @router.post("/employees", status_code=201)
-async def create_employee_metric(entry: EmployeeCreate, db: Session = Depends(get_db)):
+def create_employee_metric(entry: EmployeeCreate, db: Session = Depends(get_db)):
     sql = """
         INSERT INTO employee_engagement
             (company_id, metric_name, category, value, unit, department, reporting_period, target_value)
@@ -176,31 +188,32 @@ async def create_employee_metric(entry: EmployeeCreate, db: Session = Depends(ge
         RETURNING *
     """
     row = db.execute(text(sql), entry.model_dump()).mappings().first()
+    bump_version(db, [entry.company_id])
     db.commit()
+    analytics_cache.invalidate(entry.company_id)
     return dict(row)
 
 
 # ── Supply Chain ───────────────────────────────────────────────────────────────
 
-@router.get("/suppliers")
-async def get_suppliers(
+@router.get("/suppliers", dependencies=[Depends(conditional_get)])
+def get_suppliers(
     company_id: str = Query(DEFAULT_COMPANY),
     min_score: Optional[int] = Query(None, ge=0, le=100),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit to return every row"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     db: Session = Depends(get_db),
 ):
-    sql = "SELECT * FROM supply_chain_metrics WHERE company_id = :company_id"
-    params = {"company_id": company_id}
+    where, params = ["company_id = :company_id"], {"company_id": company_id}
     if min_score is not None:
-        sql += " AND esg_score >= :min_score"
+        where.append("esg_score >= :min_score")
         params["min_score"] = min_score
-    sql += " ORDER BY esg_score DESC"
-    rows = db.execute(text(sql), params).mappings().all()
-    data = rows_to_list(rows)
-    return {"data": data, "count": len(data)}
-
+    return fetch_page(db, "supply_chain_metrics", where, params, "esg_score",
+                      limit=limit, cursor=cursor, fields=fields)
 
 @router.post("/suppliers", status_code=201)
-async def create_supplier(entry: SupplierCreate, db: Session = Depends(get_db)):
+def create_supplier(entry: SupplierCreate, db: Session = Depends(get_db)):
     sql = """
         INSERT INTO supply_chain_metrics
             (company_id, supplier_name, supplier_category, esg_score, environmental_score,
@@ -211,34 +224,35 @@ async def create_supplier(entry: SupplierCreate, db: Session = Depends(get_db)):
         RETURNING *
     """
     row = db.execute(text(sql), entry.model_dump()).mappings().first()
+    bump_version(db, [entry.company_id])
     db.commit()
+    analytics_cache.invalidate(entry.company_id)
     return dict(row)
 
 
 # ── ESG Targets ────────────────────────────────────────────────────────────────
 
-@router.get("/targets")
-async def get_targets(
+@router.get("/targets", dependencies=[Depends(conditional_get)])
+def get_targets(
     company_id: str = Query(DEFAULT_COMPANY),
     category: Optional[str] = Query(None),
     active_only: bool = Query(True),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit to return every row"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     db: Session = Depends(get_db),
 ):
-    sql = "SELECT * FROM esg_targets WHERE company_id = :company_id"
-    params = {"company_id": company_id}
+    where, params = ["company_id = :company_id"], {"company_id": company_id}
     if active_only:
-        sql += " AND is_active = true"
+        where.append("is_active = true")
     if category:
-        sql += " AND category = :category"
+        where.append("category = :category")
         params["category"] = category
-    sql += " ORDER BY target_date"
-    rows = db.execute(text(sql), params).mappings().all()
-    data = rows_to_list(rows)
-    return {"data": data, "count": len(data)}
-
+    return fetch_page(db, "esg_targets", where, params, "target_date", descending=False,
+                      limit=limit, cursor=cursor, fields=fields)
 
 @router.post("/targets", status_code=201)
-async def create_target(entry: EsgTargetCreate, db: Session = Depends(get_db)):
+def create_target(entry: EsgTargetCreate, db: Session = Depends(get_db)):
     sql = """
         INSERT INTO esg_targets
             (company_id, category, metric_name, target_value, current_value, unit, target_date, description, is_active)
@@ -247,15 +261,143 @@ async def create_target(entry: EsgTargetCreate, db: Session = Depends(get_db)):
         RETURNING *
     """
     row = db.execute(text(sql), entry.model_dump()).mappings().first()
+    bump_version(db, [entry.company_id])
     db.commit()
+    analytics_cache.invalidate(entry.company_id)
     return dict(row)
 
 
 @router.patch("/targets/{target_id}/progress")
-async def update_target_progress(target_id: str, current_value: float, db: Session = Depends(get_db)):
+def update_target_progress(target_id: str, current_value: float, db: Session = Depends(get_db)):
     sql = "UPDATE esg_targets SET current_value = :current_value WHERE id = :id RETURNING *"
     row = db.execute(text(sql), {"current_value": current_value, "id": target_id}).mappings().first()
-    db.commit()
     if not row:
         raise HTTPException(status_code=404, detail="Target not found")
+    bump_version(db, [row["company_id"]])
+    db.commit()
+    analytics_cache.invalidate(row["company_id"])
     return dict(row)
+
+
+# ── Bulk ingestion ─────────────────────────────────────────────────────────────
+
+def _parse_bulk_body(body: bytes, content_type: str) -> list:
+    """Accept a JSON array, {"rows": [...]}, or NDJSON (one object per line)."""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(e)
+        return items
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if isinstance(payload, dict):
+        payload = payload.get("rows")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of rows or {\"rows\": [...]}")
+    return payload
+
+
+def _bulk_ingest(ledger: str, body: bytes, content_type: str, all_or_nothing: bool, db: Session) -> dict:
+    items = _parse_bulk_body(body, content_type)
+    if len(items) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+    valid, errors = validate_rows(ledger, items)
+    if errors and all_or_nothing:
+        raise HTTPException(status_code=422, detail={"received": len(items), "inserted": 0, "errors": errors})
+    try:
+        inserted = bulk_write(db, ledger, valid)
+        bump_version(db, (row["company_id"] for row in valid))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Bulk insert failed, no rows written: {e}")
+    for company_id in {row["company_id"] for row in valid}:
+        analytics_cache.invalidate(company_id)
+    return {"ledger": ledger, "received": len(items), "inserted": inserted, "errors": errors}
+
+
+@router.post("/bulk/{ledger}", status_code=201)
+async def bulk_create(
+    ledger: Literal["carbon", "energy", "waste", "water", "employees", "suppliers"],
+    request: Request,
+    all_or_nothing: bool = Query(False, description="Reject the whole batch if any row fails validation"),
+    db: Session = Depends(get_db),
+):
+    # JSON decoding and validation are CPU-bound; keep them off the event loop too.
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    return await run_in_threadpool(_bulk_ingest, ledger, body, content_type, all_or_nothing, db)
+
+
+@router.post("/import")
+def import_file(
+    file: UploadFile = File(...),
+    company_id: str = Query(DEFAULT_COMPANY),
+    sheet: str = Query(SHEET_NAME),
+):
+    """Stream an ESG Metrics workbook (.xlsx) or CSV into the ledgers; responds with NDJSON progress events."""
+    filename = file.filename or ""
+    if not filename.lower().endswith((".xlsx", ".csv")):
+        raise HTTPException(status_code=400, detail="Only .xlsx and .csv files can be imported")
+    if file.size is not None and file.size > INGEST_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds {INGEST_MAX_BYTES} bytes")
+
+    # Detach from the request-scoped upload: the response body outlives it.
+    suffix = os.path.splitext(filename)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp, length=1024 * 1024)
+        tmp_path = tmp.name
+
+    def events():
+        db = SessionLocal()
+        try:
+            with open(tmp_path, "rb") as f:
+                for event in ingest_file(db, f, filename, company_id, sheet):
+                    yield json.dumps(event, default=str) + "\n"
+            analytics_cache.invalidate(company_id)
+        finally:
+            db.close()
+            os.unlink(tmp_path)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+# ── Export ─────────────────────────────────────────────────────────────────────
+
+@router.get("/export/{ledger}", dependencies=[Depends(conditional_get)])
+def export(
+    ledger: Literal["carbon", "energy", "waste", "water", "employees", "suppliers", "targets"],
+    company_id: str = Query(DEFAULT_COMPANY),
+    format: Literal["csv", "ndjson", "parquet"] = Query("csv"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to export"),
+    period: PeriodRange = Depends(reporting_period),
+):
+    """
+    Stream a company's full ledger (no row cap) as CSV, NDJSON or Parquet,
+    read through a server-side cursor in constant memory.
+    """
+    table = EXPORT_LEDGERS[ledger]
+    columns = parse_fields(table, fields)
+    if period.bounded and not has_period(table):
+        raise HTTPException(status_code=400, detail=f"The {ledger} ledger has no reporting period to filter on")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed on the server")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"{ledger}_{company_id}.{extension}"
+    chunks = export_ledger(ledger, company_id, format, period, columns)
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        # On a client disconnect Starlette stops reading but leaves the stream suspended;
+        # close it so its connection and export slot are freed now rather than at GC.
+        background=BackgroundTask(chunks.close),
+    )
@@ -8,7 +8,7 @@ router = APIRouter(prefix="/health", tags=["health"])
 
 
 @router.get("")
-async def health_check(db: Session = Depends(get_db)):
+def health_check(db: Session = Depends(get_db)):
     db_ok = True
     try:
         db.execute(text("SELECT 1"))
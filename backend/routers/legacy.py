@@ -2,17 +2,19 @@
 Legacy endpoints — kept for backwards compatibility with the frontend.
 These are the original /uploadfile/ and /report endpoints from the old main.py.
 """
-import os, io, math, json
+import asyncio, os, io, math, json, threading
+from functools import partial
 from datetime import datetime
 from typing import Optional, Dict, Any
 
-import pandas as pd
 from fastapi import APIRouter, UploadFile, File, HTTPException, Header, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse, JSONResponse
 
 from database import save_report, get_report
-from utils import create_line_chart, create_pie_chart, create_bar_chart
+from utils import create_esg_charts
 from services.clerk_auth import verify_token, get_user_id
+from services.report_llm import SectionTimeout, generate_sections, get_backend
 
 legacy_router = APIRouter(tags=["legacy"])
 
@@ -35,6 +37,13 @@ async def _get_user(token_data: Dict[str, Any] = Depends(_verify_token)) -> str:
     return get_user_id(token_data)
 
 
+def _read_esg_sheet(source):
+    # pandas is only needed by these endpoints; import it on first use (in the worker thread)
+    import pandas as pd
+
+    return pd.read_excel(source, "ESG Metrics")
+
+
 def _pct_change(df, col):
     df = df.copy()
     df["percentage_change"] = df[col].pct_change() * 100
@@ -47,9 +56,8 @@ async def upload_file(file: UploadFile = File(...)):
     if not file.filename.endswith((".xlsx", ".xls")):
         return JSONResponse(status_code=400, content={"message": "Invalid file type. Please upload an Excel file."})
     try:
-        contents = await file.read()
-        xls = pd.ExcelFile(io.BytesIO(contents))
-        df = pd.read_excel(xls, "ESG Metrics")
+        # Parse straight from the spooled upload instead of copying it into memory first.
+        df = await run_in_threadpool(_read_esg_sheet, file.file)
         results = {}
         results["water_usage_change"] = _pct_change(df, "Water Usage (m3)")
         results["water_usage"] = df[["Year", "Water Usage (m3)"]].to_dict(orient="records")
@@ -105,65 +113,81 @@ async def upload_file(file: UploadFile = File(...)):
         return JSONResponse(status_code=500, content={"message": f"Error processing file: {e}"})
 
 
+REPORT_SECTIONS = {
+    "Executive Summary": "Write a compelling executive summary focusing on sustainability strategy and key highlights.",
+    "Environmental": "Summarize environmental strategy, GHG emissions, energy use, and targets.",
+    "Social": "Write about workforce wellbeing, DEI, and community engagement.",
+    "Governance": "Detail governance structure, risk management, and ethics policies.",
+    "Performance Metrics": "Present key ESG performance metrics and targets from the data.",
+}
+
+
 @legacy_router.post("/report")
 async def generate_esg_report(
     excel_file: UploadFile = File(...),
     user_id: str = Depends(_get_user),
 ):
-    if not os.getenv("GEMINI_API_KEY"):
+    backend = get_backend()
+    if not backend.available():
         raise HTTPException(
             status_code=501,
-            detail="AI report generation requires GEMINI_API_KEY. Set it in backend/.env to enable.",
+            detail="AI report generation requires GEMINI_API_KEY. Set it in backend/.env to enable "
+                   "(or LLM_BACKEND=stub for offline runs).",
         )
 
     try:
-        from google import genai
         from reportlab.lib.pagesizes import letter
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
         from reportlab.lib.enums import TA_CENTER
         from reportlab.platypus.flowables import PageBreak
 
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
         file_contents = await excel_file.read()
-        xls = pd.ExcelFile(io.BytesIO(file_contents))
-        df = pd.read_excel(xls, "ESG Metrics")
+        df = await run_in_threadpool(_read_esg_sheet, io.BytesIO(file_contents))
         df_json = df.to_json(orient="records")
         report_text = os.getenv("REPORT_TEXT", "")
+        # Submitted now, so the charts render in the chart pool while the sections are written.
+        charts_cancel = threading.Event()
+        charts_future = asyncio.get_running_loop().run_in_executor(
+            None, partial(create_esg_charts, df, cancel=charts_cancel)
+        )
 
-        sections = {
-            "Executive Summary": "Write a compelling executive summary focusing on sustainability strategy and key highlights.",
-            "Environmental": "Summarize environmental strategy, GHG emissions, energy use, and targets.",
-            "Social": "Write about workforce wellbeing, DEI, and community engagement.",
-            "Governance": "Detail governance structure, risk management, and ethics policies.",
-            "Performance Metrics": "Present key ESG performance metrics and targets from the data.",
-        }
-
-        report_sections = {}
-        for title, prompt in sections.items():
-            full_prompt = (
-                f"Based on this ESG data, write the '{title}' section of a corporate ESG report.\n\n"
-                f"Source text:\n{report_text}\n\nData:\n{df_json}\n\nInstructions:\n{prompt}"
-            )
-            response = client.models.generate_content(model="gemini-2.5-flash", contents=full_prompt)
-            report_sections[title] = response.text
-
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        flowables = [
-            Paragraph("ESG Report", ParagraphStyle("T", parent=styles["Heading1"], alignment=TA_CENTER)),
-            Spacer(1, 48),
-            PageBreak(),
-        ]
-        for title, content in report_sections.items():
-            flowables.append(Paragraph(title, styles["Heading2"]))
-            flowables.append(Spacer(1, 6))
-            for para in content.split("\n"):
-                if para.strip():
-                    flowables.append(Paragraph(para.strip(), styles["Normal"]))
-                    flowables.append(Spacer(1, 6))
-            flowables.append(Spacer(1, 18))
+        try:
+            try:
+                report_sections = await generate_sections(REPORT_SECTIONS, df_json, report_text, backend=backend)
+            except SectionTimeout as e:
+                raise HTTPException(status_code=504, detail=str(e))
+
+            buffer = io.BytesIO()
+            doc = SimpleDocTemplate(buffer, pagesize=letter)
+            styles = getSampleStyleSheet()
+            flowables = [
+                Paragraph("ESG Report", ParagraphStyle("T", parent=styles["Heading1"], alignment=TA_CENTER)),
+                Spacer(1, 48),
+                PageBreak(),
+            ]
+            for title, content in report_sections.items():
+                flowables.append(Paragraph(title, styles["Heading2"]))
+                flowables.append(Spacer(1, 6))
+                for para in content.split("\n"):
+                    if para.strip():
+                        flowables.append(Paragraph(para.strip(), styles["Normal"]))
+                        flowables.append(Spacer(1, 6))
+                flowables.append(Spacer(1, 18))
+
+            charts = await charts_future
+        finally:
+            # A no-op once awaited. If the sections fail or time out, withdraw the charts
+            # the pool hasn't started and stop waiting for the rest.
+            charts_cancel.set()
+            charts_future.cancel()
+
+        if charts:
+            flowables.append(PageBreak())
+            flowables.append(Paragraph("Charts", styles["Heading2"]))
+            for _, img in charts:
+                flowables.append(Image(img, width=432, height=288))  # 6x4 in, the figure size
+                flowables.append(Spacer(1, 12))
 
         doc.build(flowables)
         buffer.seek(0)
@@ -1,19 +1,20 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Header, Query
+from fastapi import Request, Response
 from fastapi.responses import StreamingResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import Optional, Dict, Any
-import io, uuid
-from datetime import datetime
-import pandas as pd
+from datetime import date, datetime
 from services.clerk_auth import verify_token, get_user_id
-from services.db import get_db
-from services.report_generator import generate_pdf
-from services.r2_storage import upload_pdf, download_pdf, get_presigned_url
+from services.db import DEFAULT_COMPANY_ID, get_db
+from services.r2_storage import stream_pdf, get_presigned_url
+from services.report_jobs import submit_report_job, get_job
+from services.file_ingest import iter_sheet_rows
+from services.periods import default_period, parse_period
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
-DEFAULT_COMPANY = "8479cb95-2057-490d-813c-825e83d71890"
+DEFAULT_COMPANY = DEFAULT_COMPANY_ID
 
 
 # ── Auth helpers ───────────────────────────────────────────────────────────────
@@ -38,19 +39,6 @@ async def _get_user(token_data: Dict[str, Any] = Depends(_verify_token)) -> str:
 
 # ── Report metadata stored in Neon ────────────────────────────────────────────
 
-def _save_report_meta(db: Session, user_id: str, filename: str, r2_key: str, file_size: int) -> int:
-    row = db.execute(
-        text("""
-            INSERT INTO sustainability_reports (title, file_url, created_by, status, report_type)
-            VALUES (:title, :file_url, :created_by, 'published', 'generated')
-            RETURNING id
-        """),
-        {"title": filename, "file_url": r2_key, "created_by": user_id},
-    ).mappings().first()
-    db.commit()
-    return str(row["id"])
-
-
 def _get_report_meta(db: Session, report_id: str, user_id: str):
     return db.execute(
         text("SELECT title, file_url FROM sustainability_reports WHERE id = :id AND created_by = :uid"),
@@ -69,12 +57,12 @@ def _list_reports(db: Session, user_id: str):
 # ── Endpoints ──────────────────────────────────────────────────────────────────
 
 @router.get("")
-async def list_reports(user_id: str = Depends(_get_user), db: Session = Depends(get_db)):
+def list_reports(user_id: str = Depends(_get_user), db: Session = Depends(get_db)):
     return {"reports": _list_reports(db, user_id)}
 
 
 @router.get("/{report_id}/url")
-async def get_report_url(report_id: str, user_id: str = Depends(_get_user), db: Session = Depends(get_db)):
+def get_report_url(report_id: str, user_id: str = Depends(_get_user), db: Session = Depends(get_db)):
     meta = _get_report_meta(db, report_id, user_id)
     if not meta:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -83,48 +71,107 @@ async def get_report_url(report_id: str, user_id: str = Depends(_get_user), db:
 
 
 @router.get("/{report_id}")
-async def download_report(report_id: str, user_id: str = Depends(_get_user), db: Session = Depends(get_db)):
+def download_report(
+    report_id: str,
+    request: Request,
+    user_id: str = Depends(_get_user),
+    db: Session = Depends(get_db),
+):
     meta = _get_report_meta(db, report_id, user_id)
     if not meta:
         raise HTTPException(status_code=404, detail="Report not found")
-    pdf_bytes = download_pdf(meta["file_url"])
-    return StreamingResponse(
-        io.BytesIO(pdf_bytes),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={meta['title']}"},
+    status_code, headers, body = stream_pdf(
+        meta["file_url"],
+        range_header=request.headers.get("range"),
+        if_none_match=request.headers.get("if-none-match"),
     )
+    if body is None:
+        return Response(status_code=status_code, headers=headers)
+    headers["Content-Disposition"] = f"attachment; filename={meta['title']}"
+    return StreamingResponse(body, status_code=status_code, media_type="application/pdf", headers=headers)
 
 
-@router.post("/generate")
-async def generate_report(
+@router.post("/generate", status_code=202)
+def generate_report(
+    response: Response,
     user_id: str = Depends(_get_user),
     company_id: str = Query(DEFAULT_COMPANY),
     report_type: str = Query("full", pattern="^(full|monthly|annual|custom)$"),
     period: str = Query(""),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
     db: Session = Depends(get_db),
 ):
+    if date_from or date_to:
+        if period:
+            raise HTTPException(status_code=400, detail="Pass either 'period' or 'from'/'to', not both")
+        period = f"{date_from or ''}..{date_to or ''}"
+    elif not period:
+        # Monthly/annual reports cover the last complete month / fiscal year unless told otherwise
+        period = default_period(report_type)
+    try:
+        parse_period(period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        pdf_bytes, filename = generate_pdf(company_id, db, report_type, period)
-        r2_key = f"reports/{user_id}/{uuid.uuid4()}_{filename}"
-        upload_pdf(pdf_bytes, r2_key)
-        _save_report_meta(db, user_id, filename, r2_key, len(pdf_bytes))
-        return StreamingResponse(
-            io.BytesIO(pdf_bytes),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        job = submit_report_job(db, user_id, company_id, report_type, period)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Report generation failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Could not queue report: {e}")
+    response.headers["X-Report-Cache"] = job["cache"]
+    response.headers["X-Report-Fingerprint"] = job["fingerprint"]
+    if job["cache"] == "hit":
+        response.status_code = 200
+    return {**job, "status_url": f"/api/reports/jobs/{job['job_id']}"}
+
+
+@router.get("/jobs/{job_id}")
+def get_report_job(job_id: str, user_id: str = Depends(_get_user), db: Session = Depends(get_db)):
+    job = get_job(db, job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = {
+        "job_id": str(job["id"]),
+        "status": job["status"],
+        "report_type": job["report_type"],
+        "period": job["period"],
+        "attempts": job["attempts"],
+        "cache_hit": job["cache_hit"],
+        "created_at": str(job["created_at"]),
+        "started_at": str(job["started_at"]) if job["started_at"] else None,
+        "finished_at": str(job["finished_at"]) if job["finished_at"] else None,
+        "error": job["error"],
+    }
+    if job["status"] == "done":
+        result.update({
+            "report_id": str(job["report_id"]),
+            "filename": job["filename"],
+            "file_size": job["file_size"],
+            "r2_key": job["file_url"],
+            "download_url": f"/api/reports/{job['report_id']}",
+            "url": get_presigned_url(job["file_url"]),
+        })
+    return result
 
 
 @router.post("/upload-file")
-async def upload_esg_file(file: UploadFile = File(...)):
+def upload_esg_file(file: UploadFile = File(...)):
     if not file.filename.endswith((".xlsx", ".xls")):
         raise HTTPException(status_code=400, detail="Only .xlsx and .xls files supported")
     try:
-        contents = await file.read()
-        xls = pd.ExcelFile(io.BytesIO(contents))
-        df = pd.read_excel(xls, "ESG Metrics")
-        return {"columns": list(df.columns), "rows": len(df), "preview": df.head(5).to_dict(orient="records"), "message": "File parsed successfully"}
+        if file.filename.endswith(".xls"):
+            # Legacy binary format has no streaming reader; fall back to pandas.
+            import pandas as pd
+
+            df = pd.read_excel(file.file, "ESG Metrics")
+            return {"columns": list(df.columns), "rows": len(df), "preview": df.head(5).to_dict(orient="records"), "message": "File parsed successfully"}
+        preview, total, columns = [], 0, []
+        for row in iter_sheet_rows(file.file, file.filename):
+            if not columns:
+                columns = list(row)
+            if len(preview) < 5:
+                preview.append(row)
+            total += 1
+        return {"columns": columns, "rows": total, "preview": preview, "message": "File parsed successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {e}")
@@ -0,0 +1,107 @@
+"""Analytics Result Cache — bounded LRU + TTL cache keyed by company_id.
+
+Dashboard reads hit /api/analytics/* far more often than data changes, so computed
+results are kept in memory until a write in routers/esg.py invalidates the company.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "1024"))
+
+
+class AnalyticsCache:
+    def __init__(self, maxsize: int = ANALYTICS_CACHE_SIZE, ttl: float = ANALYTICS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+        self._by_company: dict[str, set[tuple]] = {}
+        # Bumped on every invalidation so a computation that started before a
+        # write can't store its (now stale) result afterwards.
+        self._generation: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, full_key: tuple) -> None:
+        self._entries.pop(full_key, None)
+        keys = self._by_company.get(full_key[0])
+        if keys is not None:
+            keys.discard(full_key)
+            if not keys:
+                del self._by_company[full_key[0]]
+
+    def get(self, company_id: str, key: Hashable) -> tuple[bool, Any]:
+        full_key = (str(company_id), key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                self._drop(full_key)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return True, value
+
+    def set(self, company_id: str, key: Hashable, value: Any, generation: int | None = None) -> None:
+        company_id = str(company_id)
+        full_key = (company_id, key)
+        with self._lock:
+            if generation is not None and generation != self._generation.get(company_id, 0):
+                return
+            self._entries[full_key] = (time.monotonic(), value)
+            self._entries.move_to_end(full_key)
+            self._by_company.setdefault(company_id, set()).add(full_key)
+            while len(self._entries) > self.maxsize:
+                oldest, _ = self._entries.popitem(last=False)
+                self._drop(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, company_id: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        found, value = self.get(company_id, key)
+        if found:
+            return value
+        with self._lock:
+            generation = self._generation.get(str(company_id), 0)
+        value = compute()
+        self.set(company_id, key, value, generation)
+        return value
+
+    def invalidate(self, company_id: str) -> None:
+        company_id = str(company_id)
+        with self._lock:
+            for full_key in list(self._by_company.get(company_id, ())):
+                self._drop(full_key)
+            self._generation[company_id] = self._generation.get(company_id, 0) + 1
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_company.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+analytics_cache = AnalyticsCache()
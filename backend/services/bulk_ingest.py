@@ -0,0 +1,142 @@
+"""Bulk Ingestion — validates many ledger rows at once and writes them in one transaction.
+
+Rows are validated against the same `*Create` schemas the single-row POST endpoints
+use, and every failure is reported with its index instead of aborting the batch. Valid
+rows are written in chunks with PostgreSQL COPY (or a multi-row INSERT on other
+databases) inside the caller's transaction.
+"""
+import io
+import os
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Iterable, Iterator
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models.schemas import (
+    CarbonCreate, EnergyCreate, WasteCreate, WaterCreate, EmployeeCreate, SupplierCreate,
+)
+from services.carbon_rollup import apply_carbon_rows
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "100000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "5000"))
+
+# ledger name → (table, Create schema); columns are the schema's fields, in order.
+LEDGERS: dict[str, tuple[str, type[BaseModel]]] = {
+    "carbon": ("carbon_footprint_details", CarbonCreate),
+    "energy": ("energy_consumption", EnergyCreate),
+    "waste": ("waste_management_data", WasteCreate),
+    "water": ("water_usage_details", WaterCreate),
+    "employees": ("employee_engagement", EmployeeCreate),
+    "suppliers": ("supply_chain_metrics", SupplierCreate),
+}
+
+
+def ledger_columns(ledger: str) -> list[str]:
+    return list(LEDGERS[ledger][1].model_fields)
+
+
+# ── Validation ────────────────────────────────────────────────────────────────
+
+def validate_rows(ledger: str, items: Iterable[Any]) -> tuple[list[dict], list[dict]]:
+    """Validate raw items; returns (valid row dicts, [{index, errors}])."""
+    schema = LEDGERS[ledger][1]
+    valid: list[dict] = []
+    errors: list[dict] = []
+    for i, item in enumerate(items):
+        if isinstance(item, Exception):  # unparseable NDJSON line
+            errors.append({"index": i, "errors": [{"msg": str(item), "type": "json_invalid"}]})
+            continue
+        try:
+            valid.append(schema.model_validate(item).model_dump())
+        except ValidationError as e:
+            errors.append({
+                "index": i,
+                "errors": [{"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]} for err in e.errors()],
+            })
+    return valid, errors
+
+
+# ── Writers ───────────────────────────────────────────────────────────────────
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    chunk: list[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_value(v: Any) -> str:
+    # Every non-NULL value is quoted, so the unquoted \N marker can only mean NULL.
+    if v is None:
+        return r"\N"
+    if isinstance(v, Enum):
+        v = v.value
+    elif isinstance(v, (date, datetime)):
+        v = v.isoformat()
+    return '"' + str(v).replace('"', '""') + '"'
+
+
+def _copy_chunk(db: Session, table: str, columns: list[str], chunk: list[dict]) -> None:
+    buf = io.StringIO()
+    for row in chunk:
+        buf.write(",".join(_copy_value(row[c]) for c in columns))
+        buf.write("\n")
+    buf.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buf,
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_chunk(db: Session, table: str, columns: list[str], chunk: list[dict]) -> None:
+    placeholders = []
+    params: dict[str, Any] = {}
+    for i, row in enumerate(chunk):
+        placeholders.append("(" + ", ".join(f":{c}_{i}" for c in columns) + ")")
+        for c in columns:
+            v = row[c]
+            params[f"{c}_{i}"] = v.value if isinstance(v, Enum) else v
+    db.execute(
+        text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join(placeholders)}"),
+        params,
+    )
+
+
+def bulk_write(
+    db: Session,
+    ledger: str,
+    rows: Iterable[dict],
+    method: str | None = None,
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> int:
+    """Write validated rows in chunks. Does not commit; the caller owns the transaction.
+
+    Carbon rows are also added to the per-period rollup in the same transaction.
+    """
+    table, _ = LEDGERS[ledger]
+    columns = ledger_columns(ledger)
+    if method is None:
+        method = "copy" if db.get_bind().dialect.name == "postgresql" else "insert"
+    # Bound parameters per INSERT statement stay well under driver limits.
+    if method == "insert":
+        chunk_size = max(1, min(chunk_size, 30000 // len(columns)))
+    write = _copy_chunk if method == "copy" else _insert_chunk
+
+    written = 0
+    for chunk in _chunks(rows, chunk_size):
+        write(db, table, columns, chunk)
+        if ledger == "carbon":
+            apply_carbon_rows(db, chunk)
+        written += len(chunk)
+    return written
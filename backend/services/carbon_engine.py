@@ -6,68 +6,19 @@ Sources: EPA (2024), DEFRA (2024), IPCC AR6.
 """
 
 from models.schemas import CarbonCalculatorInput, ScopeBreakdown
+from services.emission_factors import ELECTRICITY, get_registry
 
 
-# ── Emission Factors (tCO2e per unit) ─────────────────────────────────────────
-
-SCOPE1_FACTORS = {
-    # Natural gas: kgCO2e/kWh (DEFRA 2024) → convert to tCO2e/kWh
-    "natural_gas_kwh": 0.18316 / 1000,
-    # Diesel: kgCO2e/litre (DEFRA 2024)
-    "diesel_liters": 2.70400 / 1000,
-    # Petrol/gasoline: kgCO2e/litre (DEFRA 2024)
-    "petrol_liters": 2.34600 / 1000,
-    # LPG: kgCO2e/litre (DEFRA 2024)
-    "lpg_liters": 1.55400 / 1000,
-}
-
-# Scope 2: kgCO2e/kWh for purchased electricity by grid
-SCOPE2_GRID_FACTORS = {
-    "US": 0.38600 / 1000,   # EPA eGRID 2023 national average
-    "UK": 0.20700 / 1000,   # DEFRA 2024
-    "EU": 0.27500 / 1000,   # EEA 2023 average
-    "global": 0.49000 / 1000,  # IEA 2023 world average
-}
-
-SCOPE3_FACTORS = {
-    # Air travel: kgCO2e/passenger-km (DEFRA 2024, economy class, RF included)
-    "flights_short_haul_km": 0.25500 / 1000,   # <3700 km
-    "flights_long_haul_km": 0.19500 / 1000,    # >3700 km
-    # Hotel nights: kgCO2e/room-night (DEFRA 2024)
-    "hotel_nights": 31.00 / 1000,
-    # Waste: kgCO2e/tonne of mixed waste to landfill (EPA 2024) → per kg
-    "waste_kg": 0.46700 / 1000,
-    # Water supply & treatment: kgCO2e/m3 (DEFRA 2024)
-    "water_m3": 0.14900 / 1000,
-}
+# ── Emission Factors ──────────────────────────────────────────────────────────
+# Factors live in the registry (services/emission_factors.py), loaded once from
+# factors/emission_factors.csv and resolved by (activity, region, year).
 
 
 # ── Calculation Engine ─────────────────────────────────────────────────────────
 
-def calculate_carbon(inputs: CarbonCalculatorInput) -> ScopeBreakdown:
-    grid_factor = SCOPE2_GRID_FACTORS.get(inputs.country_grid, SCOPE2_GRID_FACTORS["global"])
-
-    # Scope 1
-    s1_natural_gas = inputs.natural_gas_kwh * SCOPE1_FACTORS["natural_gas_kwh"]
-    s1_diesel = inputs.diesel_liters * SCOPE1_FACTORS["diesel_liters"]
-    s1_petrol = inputs.petrol_liters * SCOPE1_FACTORS["petrol_liters"]
-    s1_lpg = inputs.lpg_liters * SCOPE1_FACTORS["lpg_liters"]
-    scope1 = s1_natural_gas + s1_diesel + s1_petrol + s1_lpg
-
-    # Scope 2
-    s2_electricity = inputs.electricity_kwh * grid_factor
-    scope2 = s2_electricity
-
-    # Scope 3
-    s3_flights_short = inputs.flights_short_haul_km * SCOPE3_FACTORS["flights_short_haul_km"]
-    s3_flights_long = inputs.flights_long_haul_km * SCOPE3_FACTORS["flights_long_haul_km"]
-    s3_hotel = inputs.hotel_nights * SCOPE3_FACTORS["hotel_nights"]
-    s3_waste = inputs.waste_kg * SCOPE3_FACTORS["waste_kg"]
-    s3_water = inputs.water_m3 * SCOPE3_FACTORS["water_m3"]
-    scope3 = s3_flights_short + s3_flights_long + s3_hotel + s3_waste + s3_water
-
-    total = scope1 + scope2 + scope3
-
+def _scope_breakdown(c: dict, scope1: float, scope2: float, scope3: float, total: float,
+                     grid: str, grid_factor: float) -> ScopeBreakdown:
+    """Assemble the response shape shared by the scalar and batch calculators."""
     return ScopeBreakdown(
         scope1_tco2e=round(scope1, 4),
         scope2_tco2e=round(scope2, 4),
@@ -75,36 +26,141 @@ def calculate_carbon(inputs: CarbonCalculatorInput) -> ScopeBreakdown:
         total_tco2e=round(total, 4),
         breakdown={
             "scope1": {
-                "natural_gas": round(s1_natural_gas, 4),
-                "diesel": round(s1_diesel, 4),
-                "petrol": round(s1_petrol, 4),
-                "lpg": round(s1_lpg, 4),
+                "natural_gas": round(c["natural_gas"], 4),
+                "diesel": round(c["diesel"], 4),
+                "petrol": round(c["petrol"], 4),
+                "lpg": round(c["lpg"], 4),
                 "subtotal": round(scope1, 4),
             },
             "scope2": {
-                "electricity": round(s2_electricity, 4),
-                "grid_used": inputs.country_grid,
+                "electricity": round(c["electricity"], 4),
+                "grid_used": grid,
                 "emission_factor_tco2e_per_kwh": grid_factor,
                 "subtotal": round(scope2, 4),
             },
             "scope3": {
-                "flights_short_haul": round(s3_flights_short, 4),
-                "flights_long_haul": round(s3_flights_long, 4),
-                "hotel_stays": round(s3_hotel, 4),
-                "waste": round(s3_waste, 4),
-                "water": round(s3_water, 4),
+                "flights_short_haul": round(c["flights_short_haul"], 4),
+                "flights_long_haul": round(c["flights_long_haul"], 4),
+                "hotel_stays": round(c["hotel_stays"], 4),
+                "waste": round(c["waste"], 4),
+                "water": round(c["water"], 4),
                 "subtotal": round(scope3, 4),
             },
         },
     )
 
 
+def calculate_carbon(inputs: CarbonCalculatorInput) -> ScopeBreakdown:
+    factor = get_registry().resolver(inputs.factor_year)
+    grid_factor = factor(ELECTRICITY, inputs.country_grid)
+
+    # Scope 1
+    s1_natural_gas = inputs.natural_gas_kwh * factor("natural_gas_kwh")
+    s1_diesel = inputs.diesel_liters * factor("diesel_liters")
+    s1_petrol = inputs.petrol_liters * factor("petrol_liters")
+    s1_lpg = inputs.lpg_liters * factor("lpg_liters")
+    scope1 = s1_natural_gas + s1_diesel + s1_petrol + s1_lpg
+
+    # Scope 2
+    s2_electricity = inputs.electricity_kwh * grid_factor
+    scope2 = s2_electricity
+
+    # Scope 3
+    s3_flights_short = inputs.flights_short_haul_km * factor("flights_short_haul_km")
+    s3_flights_long = inputs.flights_long_haul_km * factor("flights_long_haul_km")
+    s3_hotel = inputs.hotel_nights * factor("hotel_nights")
+    s3_waste = inputs.waste_kg * factor("waste_kg")
+    s3_water = inputs.water_m3 * factor("water_m3")
+    scope3 = s3_flights_short + s3_flights_long + s3_hotel + s3_waste + s3_water
+
+    total = scope1 + scope2 + scope3
+
+    components = {
+        "natural_gas": s1_natural_gas, "diesel": s1_diesel, "petrol": s1_petrol, "lpg": s1_lpg,
+        "electricity": s2_electricity,
+        "flights_short_haul": s3_flights_short, "flights_long_haul": s3_flights_long,
+        "hotel_stays": s3_hotel, "waste": s3_waste, "water": s3_water,
+    }
+    return _scope_breakdown(components, scope1, scope2, scope3, total, inputs.country_grid, grid_factor)
+
+
+# Batch input field (= registry activity) → component name
+_BATCH_ACTIVITIES = [
+    ("natural_gas_kwh", "natural_gas"),
+    ("diesel_liters", "diesel"),
+    ("petrol_liters", "petrol"),
+    ("lpg_liters", "lpg"),
+    ("flights_short_haul_km", "flights_short_haul"),
+    ("flights_long_haul_km", "flights_long_haul"),
+    ("hotel_nights", "hotel_stays"),
+    ("waste_kg", "waste"),
+    ("water_m3", "water"),
+]
+
+
+def calculate_carbon_batch(inputs: list[CarbonCalculatorInput]) -> tuple[list[ScopeBreakdown], ScopeBreakdown]:
+    """Vectorized calculate_carbon over many inputs; returns (per-row results, portfolio totals).
+
+    Each component is one NumPy multiply over the whole column, and subtotals are
+    elementwise adds in the same order as the scalar path, so every per-row value is
+    bit-identical to calculate_carbon(). Factors are resolved once per distinct
+    (activity, region, year) in the batch.
+    """
+    import numpy as np  # only the batch path needs it; keeps it off the startup import chain
+
+    n = len(inputs)
+    registry = get_registry()
+    years = [i.factor_year for i in inputs]
+    resolvers = {y: registry.resolver(y) for y in set(years)}
+    single_year = len(resolvers) == 1
+
+    comp: dict[str, np.ndarray] = {}
+    for field, name in _BATCH_ACTIVITIES:
+        column = np.fromiter((getattr(i, field) for i in inputs), dtype=np.float64, count=n)
+        if single_year:
+            comp[name] = column * resolvers[years[0]](field)
+        else:
+            comp[name] = column * np.fromiter((resolvers[y](field) for y in years), dtype=np.float64, count=n)
+
+    grids = [i.country_grid for i in inputs]
+    grid_factors = np.fromiter(
+        (resolvers[y](ELECTRICITY, g) for y, g in zip(years, grids)), dtype=np.float64, count=n
+    )
+    electricity = np.fromiter((i.electricity_kwh for i in inputs), dtype=np.float64, count=n)
+    comp["electricity"] = electricity * grid_factors
+
+    scope1 = comp["natural_gas"] + comp["diesel"] + comp["petrol"] + comp["lpg"]
+    scope2 = comp["electricity"]
+    scope3 = comp["flights_short_haul"] + comp["flights_long_haul"] + comp["hotel_stays"] + comp["waste"] + comp["water"]
+    total = scope1 + scope2 + scope3
+
+    # .tolist() hands back Python floats so rounding matches the scalar round() exactly.
+    comp_lists = {k: v.tolist() for k, v in comp.items()}
+    s1, s2, s3, tot, gf = scope1.tolist(), scope2.tolist(), scope3.tolist(), total.tolist(), grid_factors.tolist()
+    results = [
+        _scope_breakdown({k: v[r] for k, v in comp_lists.items()}, s1[r], s2[r], s3[r], tot[r], grids[r], gf[r])
+        for r in range(n)
+    ]
+
+    total_electricity = float(electricity.sum())
+    totals = _scope_breakdown(
+        {k: float(v.sum()) for k, v in comp.items()},
+        float(scope1.sum()), float(scope2.sum()), float(scope3.sum()), float(total.sum()),
+        "mixed" if len(set(grids)) > 1 else (grids[0] if grids else "global"),
+        # Consumption-weighted average grid factor across the portfolio.
+        float(comp["electricity"].sum()) / total_electricity if total_electricity else 0.0,
+    )
+    return results, totals
+
+
 def get_emission_factors() -> dict:
     """Return all emission factors for transparency / frontend display."""
+    registry = get_registry()
     return {
-        "scope1": SCOPE1_FACTORS,
-        "scope2_grids": SCOPE2_GRID_FACTORS,
-        "scope3": SCOPE3_FACTORS,
-        "source": "DEFRA 2024, EPA eGRID 2023, IEA 2023",
+        "scope1": {f.activity: f.factor for f in registry.latest(scope=1)},
+        "scope2_grids": {f.region: f.factor for f in registry.grids()},
+        "scope3": {f.activity: f.factor for f in registry.latest(scope=3)},
+        "source": ", ".join(registry.sources()),
         "methodology": "GHG Protocol Corporate Standard",
+        "version": registry.version,
     }
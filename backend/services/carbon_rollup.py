@@ -0,0 +1,112 @@
+"""Carbon Rollup — per-company, per-period, per-scope emission totals kept up to date on write.
+
+`carbon_monthly_rollup` holds one row per (company_id, reporting_period, scope). Every
+API write path into carbon_footprint_details (single create, /bulk, /import) calls
+`apply_carbon_rows` in the same transaction, which adds the new rows' totals with an
+upsert, so trend and scope-total reads touch a few dozen rollup rows instead of the
+whole ledger. `rebuild_rollup` recomputes it from scratch after out-of-band edits.
+
+Ledger rows without a scope (a file's reported total) are rolled up under
+scope UNSCOPED: they count towards trends and totals but not towards any scope.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from services.periods import ALL_TIME, PeriodRange
+
+_CENTS = Decimal("0.01")
+
+UNSCOPED = 0
+
+# Plain string: esg_analytics also embeds it as a CTE in its aggregate query.
+# {period_filter} is a PeriodRange.filter() fragment.
+TREND_SQL = """
+    SELECT reporting_period, SUM(total_tco2e) AS total
+    FROM carbon_monthly_rollup
+    WHERE company_id = :cid{period_filter}
+    GROUP BY reporting_period
+    ORDER BY reporting_period DESC
+    LIMIT :months
+"""
+
+_SCOPE_TOTALS_SQL = """
+    SELECT scope, SUM(total_tco2e) AS total
+    FROM carbon_monthly_rollup
+    WHERE company_id = :cid AND scope <> 0{period_filter}
+    GROUP BY scope
+    ORDER BY scope
+"""
+
+
+def _tons(value) -> Decimal:
+    # The ledger column is DECIMAL(12,2): round the way Postgres does on insert
+    # (half away from zero, from the value's shortest repr) so sums match exactly.
+    return Decimal(repr(value) if isinstance(value, float) else str(value)).quantize(_CENTS, rounding=ROUND_HALF_UP)
+
+
+def apply_carbon_rows(db: Session, rows: Iterable[dict]) -> int:
+    """Add freshly inserted ledger rows to the rollup. Does not commit; returns keys touched."""
+    deltas: dict[tuple, list] = {}
+    for row in rows:
+        if row.get("emissions_co2_tons") is None or row.get("reporting_period") is None:
+            continue
+        key = (str(row["company_id"]), row["reporting_period"], row.get("scope") or UNSCOPED)
+        acc = deltas.setdefault(key, [Decimal(0), 0])
+        acc[0] += _tons(row["emissions_co2_tons"])
+        acc[1] += 1
+    if not deltas:
+        return 0
+
+    values, params = [], {}
+    # Sorted keys: concurrent writers lock rollup rows in the same order.
+    for i, (key, (total, count)) in enumerate(sorted(deltas.items(), key=lambda kv: (kv[0][0], str(kv[0][1]), kv[0][2]))):
+        values.append(f"(:c{i}, :p{i}, :s{i}, :t{i}, :n{i}, NOW())")
+        params.update({f"c{i}": key[0], f"p{i}": key[1], f"s{i}": key[2], f"t{i}": total, f"n{i}": count})
+    db.execute(
+        text(f"""
+            INSERT INTO carbon_monthly_rollup (company_id, reporting_period, scope, total_tco2e, entry_count, updated_at)
+            VALUES {', '.join(values)}
+            ON CONFLICT (company_id, reporting_period, scope) DO UPDATE
+            SET total_tco2e = carbon_monthly_rollup.total_tco2e + EXCLUDED.total_tco2e,
+                entry_count = carbon_monthly_rollup.entry_count + EXCLUDED.entry_count,
+                updated_at = NOW()
+        """),
+        params,
+    )
+    return len(deltas)
+
+
+def rebuild_rollup(db: Session, company_id: Optional[str] = None) -> None:
+    """Recompute the rollup from the ledger (one company, or all). Commits."""
+    filters = ["company_id IS NOT NULL", "reporting_period IS NOT NULL", "emissions_co2_tons IS NOT NULL"]
+    params = {}
+    if company_id:
+        filters.append("company_id = :cid")
+        params["cid"] = company_id
+    db.execute(text(f"DELETE FROM carbon_monthly_rollup {'WHERE company_id = :cid' if company_id else ''}"), params)
+    db.execute(
+        text(f"""
+            INSERT INTO carbon_monthly_rollup (company_id, reporting_period, scope, total_tco2e, entry_count)
+            SELECT company_id, reporting_period, COALESCE(scope, :unscoped), SUM(emissions_co2_tons), COUNT(*)
+            FROM carbon_footprint_details
+            WHERE {' AND '.join(filters)}
+            GROUP BY company_id, reporting_period, COALESCE(scope, :unscoped)
+        """),
+        {**params, "unscoped": UNSCOPED},
+    )
+    db.commit()
+
+
+def fetch_trend_rows(db: Session, company_id: str, months: int = 12, period: PeriodRange = ALL_TIME) -> list:
+    """Latest `months` periods within `period`, newest first, as (reporting_period, total) rows."""
+    sql = TREND_SQL.format(period_filter=period.filter())
+    return db.execute(text(sql), {"cid": company_id, "months": months, **period.params()}).mappings().all()
+
+
+def fetch_scope_totals(db: Session, company_id: str, period: PeriodRange = ALL_TIME) -> dict[int, float]:
+    sql = _SCOPE_TOTALS_SQL.format(period_filter=period.filter())
+    rows = db.execute(text(sql), {"cid": company_id, **period.params()}).mappings().all()
+    return {int(r["scope"]): float(r["total"] or 0) for r in rows}
@@ -0,0 +1,239 @@
+"""Chart Rendering — thread-safe matplotlib charts, rendered in parallel and memoized.
+
+Charts are described by plain, picklable spec dicts ({"kind": "line" | "bar" | "pie", ...})
+and drawn with the object-oriented Figure/Agg API, so no pyplot global state is
+involved. `render_charts` hashes every spec, serves repeats from an in-process LRU,
+and fans the misses out to a small process pool. Output is PNG, or SVG/PDF for
+vector embedding; vector output is byte-stable for the same spec.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", str(min(4, os.cpu_count() or 1))))
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "256"))
+CHART_FORMATS = ("png", "svg", "pdf")
+
+# Bump when the drawing code changes so memoized images are not reused.
+CHART_RENDERER_VERSION = "1"
+
+_FIGSIZE = (6, 4)
+_DPI = 100
+# How often a caller waiting on the pool checks its cancel event.
+_CANCEL_POLL_SECONDS = 0.1
+# Strip timestamps so identical specs produce identical bytes.
+_METADATA = {"png": {"Software": None}, "svg": {"Date": None}, "pdf": {"CreationDate": None}}
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_cache: OrderedDict[str, bytes] = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+# ── Drawing (runs in worker processes) ────────────────────────────────────────
+
+def _new_figure():
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=_FIGSIZE, dpi=_DPI)
+    return fig, fig.add_subplot()
+
+
+def _draw_line(ax, spec: dict) -> None:
+    ax.plot(spec["x"], spec["y"], marker="o")
+    ax.set_xlabel(spec.get("xlabel", ""))
+    ax.set_ylabel(spec.get("ylabel", ""))
+    ax.grid(True)
+    ax.tick_params(axis="x", labelrotation=45)
+
+
+def _draw_bar(ax, spec: dict) -> None:
+    categories = [str(c) for c in spec["categories"]]
+    series = spec["series"]
+    width = 0.8 / max(1, len(series))
+    positions = range(len(categories))
+    for i, (name, values) in enumerate(series.items()):
+        offset = (i - (len(series) - 1) / 2) * width
+        ax.bar([p + offset for p in positions], values, width=width, label=name)
+    ax.set_xticks(list(positions), categories)
+    ax.set_xlabel(spec.get("xlabel", ""))
+    ax.set_ylabel(spec.get("ylabel", ""))
+    ax.legend(title=spec.get("legend_title"))
+
+
+def _draw_pie(ax, spec: dict) -> None:
+    ax.pie(spec["sizes"], labels=spec["labels"], autopct="%1.1f%%", startangle=90)
+    ax.axis("equal")  # equal aspect ratio keeps the pie circular
+
+
+_DRAWERS = {"line": _draw_line, "bar": _draw_bar, "pie": _draw_pie}
+
+
+def draw_chart(spec: dict, fmt: str = "png") -> bytes:
+    """Render one spec to image bytes. Safe to call from any thread or process."""
+    from matplotlib import rc_context
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig, ax = _new_figure()
+    FigureCanvasAgg(fig)
+    _DRAWERS[spec["kind"]](ax, spec)
+    ax.set_title(spec.get("title", ""))
+    fig.tight_layout()
+    buf = io.BytesIO()
+    # A fixed salt keeps SVG element ids (and so the bytes) stable across renders.
+    with rc_context({"svg.hashsalt": CHART_RENDERER_VERSION}):
+        fig.savefig(buf, format=fmt, metadata=_METADATA[fmt])
+    return buf.getvalue()
+
+
+# ── Memoization ───────────────────────────────────────────────────────────────
+
+def chart_key(spec: dict, fmt: str) -> str:
+    payload = json.dumps([CHART_RENDERER_VERSION, fmt, spec], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_get(key: str) -> bytes | None:
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+        return data
+
+
+def _cache_put(key: str, data: bytes) -> None:
+    with _cache_lock:
+        _cache[key] = data
+        _cache.move_to_end(key)
+        while len(_cache) > CHART_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def cache_stats() -> dict:
+    with _cache_lock:
+        return {"size": len(_cache), "maxsize": CHART_CACHE_SIZE, **_stats}
+
+
+# ── Pool ──────────────────────────────────────────────────────────────────────
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: the API process runs threads, which don't survive fork() safely.
+            _executor = ProcessPoolExecutor(
+                max_workers=CHART_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _discard_executor(broken: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next `_get_executor()` starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _validate(spec: dict, fmt: str) -> None:
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format '{fmt}'. Use one of: {', '.join(CHART_FORMATS)}")
+    if spec.get("kind") not in _DRAWERS:
+        raise ValueError(f"Unknown chart kind '{spec.get('kind')}'")
+
+
+def render_chart(spec: dict, fmt: str = "png") -> bytes:
+    """Render one chart in the calling thread, through the memo cache."""
+    _validate(spec, fmt)
+    key = chart_key(spec, fmt)
+    data = _cache_get(key)
+    if data is None:
+        data = draw_chart(spec, fmt)
+        _cache_put(key, data)
+    return data
+
+
+def render_charts(specs: list[dict], fmt: str = "png", cancel: threading.Event | None = None) -> list[bytes]:
+    """Render many charts, in input order. Cache misses are drawn concurrently in the pool.
+
+    Setting `cancel` withdraws the charts the pool hasn't started and raises CancelledError.
+    """
+    for spec in specs:
+        _validate(spec, fmt)
+    keys = [chart_key(spec, fmt) for spec in specs]
+    results: dict[str, bytes] = {}
+    todo: dict[str, dict] = {}
+    for key, spec in zip(keys, specs):
+        if key in results or key in todo:
+            continue
+        data = _cache_get(key)
+        if data is not None:
+            results[key] = data
+        else:
+            todo[key] = spec
+
+    # One chart isn't worth the inter-process round-trip; draw it here.
+    if len(todo) == 1 or (todo and CHART_WORKERS <= 1):
+        for key, spec in todo.items():
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+            results[key] = draw_chart(spec, fmt)
+            _cache_put(key, results[key])
+    elif todo:
+        results.update(_draw_in_pool(todo, fmt, cancel))
+    return [results[key] for key in keys]
+
+
+def _result(future: Future, cancel: threading.Event | None) -> bytes:
+    if cancel is None:
+        return future.result()
+    while not wait([future], timeout=_CANCEL_POLL_SECONDS).done:
+        if cancel.is_set():
+            raise CancelledError()
+    return future.result()
+
+
+def _draw_in_pool(todo: dict[str, dict], fmt: str, cancel: threading.Event | None) -> dict[str, bytes]:
+    drawn: dict[str, bytes] = {}
+    for attempt in range(2):
+        pool = _get_executor()
+        futures = {}
+        try:
+            for key, spec in todo.items():
+                if key not in drawn:
+                    futures[key] = pool.submit(draw_chart, spec, fmt)
+            for key, future in futures.items():
+                drawn[key] = _result(future, cancel)
+                _cache_put(key, drawn[key])
+            return drawn
+        except BrokenProcessPool:
+            # A worker died (OOM, a crash in Agg) and took the pool down; every later
+            # submit would fail the same way, so replace the pool and retry the rest once.
+            _discard_executor(pool)
+            if attempt:
+                raise
+        finally:
+            # No-op for finished charts; on cancel or error, queued ones never start.
+            for future in futures.values():
+                future.cancel()
+    return drawn
@@ -0,0 +1,129 @@
+"""Dashboard — one request for every widget on a page, with shared, concurrent sub-queries.
+
+Each widget names the source it is derived from. Sources are deduplicated, so the
+summary, score, breakdown and carbon-trend widgets all come from a single
+`fetch_aggregates` row (cached per data version, like the analytics routes), and
+each ledger list is one keyset page. Independent sources run concurrently, one
+pooled connection each: the first on the request's session, the rest on a shared
+thread pool of DASHBOARD_WORKERS. Those connections are reserved out of the route
+threadpool's share of the engine pool (see services/db.py), so workers always find
+one free while handlers wait on them. Each widget's payload has the shape its
+standalone endpoint returns.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from services.analytics_cache import analytics_cache
+from services.db import DASHBOARD_WORKERS, SessionLocal
+from services.esg_analytics import breakdown_from, fetch_aggregates, score_from, summary_from, trend_from
+from services.pagination import query_page
+from services.periods import PeriodRange
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class DashboardQuery:
+    company_id: str
+    months: int
+    limit: int
+    period: PeriodRange
+    version: int
+
+
+# ── Sources ───────────────────────────────────────────────────────────────────
+
+def _aggregates(db: Session, q: DashboardQuery) -> dict:
+    return analytics_cache.get_or_compute(
+        q.company_id, ("aggregates", q.months, q.period.key, q.version),
+        lambda: fetch_aggregates(q.company_id, db, q.months, q.period),
+    )
+
+
+def _ledger(table: str, sort_col: str, descending: bool = True, extra: str = "") -> Callable[[Session, DashboardQuery], dict]:
+    def load(db: Session, q: DashboardQuery) -> dict:
+        where = [f"company_id = :company_id{extra}"]
+        params = {"company_id": q.company_id}
+        if sort_col == "reporting_period":
+            where[0] += q.period.filter()
+            params.update(q.period.params())
+        return query_page(db, table, where, params, sort_col, descending=descending, limit=q.limit)
+    return load
+
+
+SOURCES: dict[str, Callable[[Session, DashboardQuery], object]] = {
+    "aggregates": _aggregates,
+    "carbon": _ledger("carbon_footprint_details", "reporting_period"),
+    "energy": _ledger("energy_consumption", "reporting_period"),
+    "waste": _ledger("waste_management_data", "reporting_period"),
+    "water": _ledger("water_usage_details", "reporting_period"),
+    "employees": _ledger("employee_engagement", "reporting_period"),
+    "suppliers": _ledger("supply_chain_metrics", "esg_score"),
+    "targets": _ledger("esg_targets", "target_date", descending=False, extra=" AND is_active = true"),
+}
+
+# widget → (source, payload from the source's result)
+WIDGETS: dict[str, tuple[str, Callable]] = {
+    "summary": ("aggregates", lambda agg, q: summary_from(q.company_id, agg).model_dump()),
+    "score": ("aggregates", lambda agg, q: score_from(agg).model_dump()),
+    "breakdown": ("aggregates", lambda agg, q: breakdown_from(score_from(agg))),
+    "carbon_trend": ("aggregates", lambda agg, q: {"trend": [p.model_dump() for p in trend_from(agg)]}),
+    **{name: (name, lambda page, q: page) for name in SOURCES if name != "aggregates"},
+}
+
+
+# ── Execution ─────────────────────────────────────────────────────────────────
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _load_with_own_session(source: str, q: DashboardQuery):
+    db = SessionLocal()
+    try:
+        return SOURCES[source](db, q)
+    finally:
+        db.close()
+
+
+def build_dashboard(db: Session, widgets: list[str], q: DashboardQuery) -> dict:
+    """Load each distinct source once (concurrently) and render the requested widgets."""
+    sources = list(dict.fromkeys(WIDGETS[w][0] for w in widgets))
+    inline, rest = sources[0], sources[1:]
+    # copy_context per task: the worker's queries count towards this request's Server-Timing.
+    futures = {
+        source: _get_executor().submit(contextvars.copy_context().run, _load_with_own_session, source, q)
+        for source in rest
+    }
+    try:
+        results = {inline: SOURCES[inline](db, q)}
+        for source, future in futures.items():
+            results[source] = future.result()
+    finally:
+        # On error, don't leave queued sources to run for a response that won't be sent.
+        for future in futures.values():
+            future.cancel()
+
+    return {
+        "company_id": q.company_id,
+        "period": q.period.label,
+        "widgets": {w: WIDGETS[w][1](results[WIDGETS[w][0]], q) for w in widgets},
+    }
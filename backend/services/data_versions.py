@@ -0,0 +1,140 @@
+"""Data Versions — per-company change counter behind ETag / Last-Modified on reads.
+
+Every API write to a company's ledgers calls `bump_version` in its own transaction,
+so `company_data_versions` moves exactly when the data does, for every worker.
+GET endpoints declare `Depends(conditional_get)`: it looks the version up (one
+primary-key read), derives a strong ETag from it plus the request URL, and answers
+`If-None-Match` / `If-Modified-Since` with a 304 before the handler runs a query.
+`ConditionalGetMiddleware` puts the validators on the 200 responses, including
+handlers that return a Response of their own.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Depends, HTTPException, Query, Request
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from services.db import DEFAULT_COMPANY_ID, get_db
+
+# Bump when a response format changes without the data changing, so clients drop
+# representations cached under the old ETags.
+VALIDATOR_VERSION = "1"
+
+_BUMP_SQL = text("""
+    INSERT INTO company_data_versions (company_id, version, updated_at)
+    VALUES (:cid, 1, NOW())
+    ON CONFLICT (company_id) DO UPDATE
+    SET version = company_data_versions.version + 1, updated_at = NOW()
+""")
+
+_VERSION_SQL = text("SELECT version, updated_at FROM company_data_versions WHERE company_id = :cid")
+
+
+def bump_version(db: Session, company_ids: Iterable) -> None:
+    """Advance each company's data version. Does not commit: call before the write's commit."""
+    # Sorted: concurrent writers lock version rows in the same order.
+    for company_id in sorted({str(c) for c in company_ids}):
+        db.execute(_BUMP_SQL, {"cid": company_id})
+
+
+def get_version(db: Session, company_id: str) -> tuple[int, Optional[datetime]]:
+    """(version, last change) for a company; (0, None) if nothing was written since tracking began."""
+    row = db.execute(_VERSION_SQL, {"cid": company_id}).first()
+    return (row[0], row[1]) if row else (0, None)
+
+
+# ── Validators ────────────────────────────────────────────────────────────────
+
+def make_etag(company_id: str, version: int, request: Request) -> str:
+    # Query params are part of the representation (period, fields, limit, cursor, ...).
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    raw = f"{VALIDATOR_VERSION}:{company_id}:{version}:{request.url.path}?{query}"
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match.
+    candidates = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag in candidates
+
+
+def _not_modified_since(if_modified_since: str, last_modified: Optional[datetime]) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole-second resolution: a change later in the same second as
+    # `last_modified` would look unmodified, so only trust dates at least a second old
+    # and leave recent changes to the ETag.
+    if datetime.now(timezone.utc) - last_modified < timedelta(seconds=1):
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_get(
+    request: Request,
+    company_id: str = Query(DEFAULT_COMPANY_ID),
+    db: Session = Depends(get_db),
+) -> int:
+    """Dependency for company-scoped GETs: 304 when the client's copy is current.
+
+    Returns the data version, for handlers that key in-process caches on it: another
+    worker's write changes the version but can't invalidate this process's cache.
+    """
+    version, updated_at = get_version(db, company_id)
+    # Hand the connection back until the handler queries: dependencies run in their
+    # own threadpool call, so a connection held between that call and the handler's
+    # isn't covered by DB_THREADPOOL_SIZE and a burst of requests can drain the pool.
+    db.rollback()
+    headers = {"ETag": make_etag(company_id, version, request), "Cache-Control": "private, no-cache"}
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        not_modified = _not_modified_since(request.headers.get("if-modified-since", ""), updated_at)
+    if not_modified:
+        raise HTTPException(status_code=304, headers=headers)
+    request.state.validators = headers
+    return version
+
+
+# ── ASGI middleware ───────────────────────────────────────────────────────────
+
+class ConditionalGetMiddleware:
+    """Adds the validators `conditional_get` computed to successful responses."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                # request.state is backed by scope["state"], shared with the route's Request.
+                validators = scope.get("state", {}).get("validators")
+                if validators:
+                    headers = list(message.get("headers", []))
+                    present = {k.lower() for k, _ in headers}
+                    for name, value in validators.items():
+                        key = name.lower().encode("latin-1")
+                        if key not in present:
+                            headers.append((key, value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,17 +1,71 @@
 import os
 from decimal import Decimal
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, Session
+from fastapi import Response
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Company used when a request doesn't name one (the demo tenant).
+DEFAULT_COMPANY_ID = os.getenv("DEFAULT_COMPANY_ID", "8479cb95-2057-490d-813c-825e83d71890")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Route handlers that use a Session are plain `def`, so Starlette runs them in the
+# AnyIO worker threadpool instead of on the event loop. Capping that pool at the
+# number of connections the engine can hand out keeps threads from piling up
+# behind `pool_timeout` when Neon is slow.
+#
+# /api/dashboard handlers hold their connection while its shared workers each take
+# another, so DASHBOARD_WORKERS connections are kept out of the handlers' share:
+# otherwise a burst of dashboards could check out every connection and leave the
+# workers they wait on queued behind `pool_timeout`. Ledger exports hold a connection
+# for the whole download but only borrow a thread per chunk, so the EXPORT_MAX_CONCURRENT
+# connections they may take are kept out of it too.
+DASHBOARD_WORKERS = int(os.getenv("DASHBOARD_WORKERS", "4"))
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+DB_THREADPOOL_SIZE = int(os.getenv(
+    "DB_THREADPOOL_SIZE",
+    str(max(1, DB_POOL_SIZE + DB_MAX_OVERFLOW - DASHBOARD_WORKERS - EXPORT_MAX_CONCURRENT)),
+))
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 
+# ── NUMERIC as float ──────────────────────────────────────────────────────────
+# Every API response turns NUMERIC columns into floats anyway, so have psycopg2
+# parse them as floats in the first place instead of building a Decimal per cell
+# and converting it again. Writes are unaffected: parameters still bind as sent.
+
+def _numeric_as_float(dbapi_conn, connection_record):
+    import psycopg2.extensions as ext
+
+    caster = ext.new_type(ext.DECIMAL.values, "NUMERIC_FLOAT", lambda value, cur: None if value is None else float(value))
+    ext.register_type(caster, dbapi_conn)
+
+
+def numeric_as_float(target) -> None:
+    """Register the NUMERIC → float typecaster on every new connection of `target` (idempotent)."""
+    if target.dialect.driver == "psycopg2" and not event.contains(target, "connect", _numeric_as_float):
+        event.listen(target, "connect", _numeric_as_float)
+
+
+numeric_as_float(engine)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -26,3 +80,18 @@ def _clean(v):
 
 def rows_to_list(rows) -> list[dict]:
     return [{k: _clean(v) for k, v in dict(r).items()} for r in rows]
+
+
+def result_dicts(result) -> list[dict]:
+    """One plain dict per row, built straight from the cursor tuples: no RowMapping, no per-cell cleaning."""
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def json_response(content) -> Response:
+    """Encode `content` with orjson and skip FastAPI's jsonable_encoder pass.
+
+    Handles dict / list / str / int / float / bool / None, dates and UUIDs, i.e. what
+    the driver returns once NUMERIC arrives as float.
+    """
+    return Response(orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS), media_type="application/json")
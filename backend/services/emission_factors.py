@@ -0,0 +1,121 @@
+"""
+Emission Factor Registry
+Loads the factor table (factors/emission_factors.csv) once per process and indexes
+it by (activity, region, year), so every lookup is a dict hit. Region falls back to
+"global" and year to the latest one on or before the year asked for.
+"""
+import csv
+import hashlib
+import os
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional
+
+EMISSION_FACTORS_PATH = os.getenv("EMISSION_FACTORS_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "factors", "emission_factors.csv"
+)
+
+GLOBAL_REGION = "global"
+ELECTRICITY = "electricity_kwh"
+
+
+@dataclass(frozen=True)
+class EmissionFactor:
+    activity: str
+    region: str
+    year: int
+    scope: int
+    factor: float      # tCO2e per unit
+    unit: str
+    source: str
+    label: str
+
+
+class FactorRegistry:
+    def __init__(self, factors: list[EmissionFactor], version: str):
+        self.version = version
+        self._index: dict[tuple[str, str, int], EmissionFactor] = {}
+        years: dict[tuple[str, str], list[int]] = {}
+        for f in factors:
+            self._index[(f.activity, f.region, f.year)] = f
+            years.setdefault((f.activity, f.region), []).append(f.year)
+        self._years = {k: sorted(set(v)) for k, v in years.items()}
+        # (activity, region, None) → latest vintage, the common case
+        for (activity, region), ys in self._years.items():
+            self._index[(activity, region, None)] = self._index[(activity, region, ys[-1])]
+
+    def _resolve_year(self, activity: str, region: str, year: int) -> Optional[EmissionFactor]:
+        ys = self._years.get((activity, region))
+        if not ys:
+            return None
+        pos = bisect_right(ys, year)
+        # Nothing published that early: use the oldest vintage we have.
+        return self._index[(activity, region, ys[pos - 1] if pos else ys[0])]
+
+    def get(self, activity: str, region: str = GLOBAL_REGION, year: Optional[int] = None) -> EmissionFactor:
+        """Factor for (activity, region, year), falling back to the global region."""
+        regions = (region,) if region == GLOBAL_REGION else (region, GLOBAL_REGION)
+        for r in regions:
+            hit = self._index.get((activity, r, year))
+            if hit is None and year is not None:
+                hit = self._resolve_year(activity, r, year)
+            if hit is not None:
+                return hit
+        raise KeyError(f"No emission factor for {activity!r}")
+
+    def factor(self, activity: str, region: str = GLOBAL_REGION, year: Optional[int] = None) -> float:
+        return self.get(activity, region, year).factor
+
+    def resolver(self, year: Optional[int] = None) -> Callable[[str, str], float]:
+        """Memoized (activity, region) → factor for one batch, pinned to one year."""
+        cache: dict[tuple[str, str], float] = {}
+
+        def resolve(activity: str, region: str = GLOBAL_REGION) -> float:
+            key = (activity, region)
+            hit = cache.get(key)
+            if hit is None:
+                hit = cache[key] = self.get(activity, region, year).factor
+            return hit
+
+        return resolve
+
+    def latest(self, scope: Optional[int] = None, activity: Optional[str] = None) -> list[EmissionFactor]:
+        """Latest vintage of every (activity, region), in table order."""
+        out = []
+        for (a, region), ys in self._years.items():
+            f = self._index[(a, region, ys[-1])]
+            if (scope is None or f.scope == scope) and (activity is None or a == activity):
+                out.append(f)
+        return out
+
+    def grids(self) -> list[EmissionFactor]:
+        return self.latest(activity=ELECTRICITY)
+
+    def sources(self) -> list[str]:
+        return list(dict.fromkeys(f.source for f in self.latest()))
+
+
+def load_registry(path: str = EMISSION_FACTORS_PATH) -> FactorRegistry:
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    lines = [line for line in raw.decode("utf-8").splitlines() if line and not line.startswith("#")]
+    factors = [
+        EmissionFactor(
+            activity=row["activity"],
+            region=row["region"],
+            year=int(row["year"]),
+            scope=int(row["scope"]),
+            factor=float(row["factor_kg"]) / 1000,
+            unit=row["unit"],
+            source=row["source"],
+            label=row["label"],
+        )
+        for row in csv.DictReader(lines)
+    ]
+    return FactorRegistry(factors, version=hashlib.sha256(raw).hexdigest()[:12])
+
+
+@lru_cache(maxsize=1)
+def get_registry() -> FactorRegistry:
+    return load_registry()
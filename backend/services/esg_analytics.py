@@ -1,10 +1,14 @@
 """ESG Analytics Engine — computes ESG scores, KPI trends, and benchmarks from Neon PostgreSQL."""
 
-from typing import List
+from functools import lru_cache
+from typing import List, Optional
 from decimal import Decimal
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from models.schemas import ESGScore, TrendPoint, AnalyticsSummary
+from models.schemas import ESGScore, TrendPoint, AnalyticsSummary, PortfolioHolding, PortfolioResponse
+from services.carbon_rollup import TREND_SQL, fetch_trend_rows
+from services.db import DEFAULT_COMPANY_ID
+from services.periods import ALL_TIME, PeriodRange
 
 
 def _f(v) -> float:
@@ -13,7 +17,7 @@ def _f(v) -> float:
         return 0.0
     return float(v)
 
-COMPANY_ID = "8479cb95-2057-490d-813c-825e83d71890"
+COMPANY_ID = DEFAULT_COMPANY_ID
 
 
 def _grade(score: float) -> str:
@@ -25,144 +29,352 @@ def _grade(score: float) -> str:
     return "D"
 
 
-def compute_environmental_score(company_id: str, db: Session) -> float:
-    energy = db.execute(
-        text("SELECT energy_type, consumption_kwh FROM energy_consumption WHERE company_id = :cid"),
-        {"cid": company_id}
-    ).mappings().all()
-    total_kwh = sum(_f(r["consumption_kwh"]) for r in energy)
-    renewable_kwh = sum(_f(r["consumption_kwh"]) for r in energy if r["energy_type"] == "renewable")
-    renewable_pct = (renewable_kwh / total_kwh * 100) if total_kwh > 0 else 0
-
-    waste = db.execute(
-        text("SELECT amount_kg, disposal_method FROM waste_management_data WHERE company_id = :cid"),
-        {"cid": company_id}
-    ).mappings().all()
-    total_waste = sum(_f(r["amount_kg"]) for r in waste)
-    recycled = sum(_f(r["amount_kg"]) for r in waste if r["disposal_method"] == "recycled")
-    recycling_rate = (recycled / total_waste * 100) if total_waste > 0 else 0
-
-    env_targets = db.execute(
-        text("SELECT current_value, target_value FROM esg_targets WHERE company_id = :cid AND category = 'environmental' AND is_active = true"),
-        {"cid": company_id}
-    ).mappings().all()
-    target_progress = [
-        min(100, _f(t["current_value"]) / _f(t["target_value"]) * 100)
-        for t in env_targets if t["target_value"] and _f(t["target_value"]) > 0
-    ]
-    avg_target_progress = sum(target_progress) / len(target_progress) if target_progress else 50
+# ── Aggregation queries ────────────────────────────────────────────────────────
+# All SUM/FILTER/GROUP BY work happens in Postgres so every endpoint costs a
+# single round-trip that returns one row, regardless of ledger size. The carbon
+# trend reads the per-period rollup (services/carbon_rollup.py), not the ledger.
+#
+# {period_filter} / {as_of_filter} take PeriodRange fragments: ledger sums become
+# range scans on (company_id, reporting_period), point-in-time engagement metrics
+# take the latest value before the period end, and a bounded carbon total is
+# summed from the rollup (rows without a period can't fall in a bounded range).
+
+_LATEST = "ORDER BY reporting_period DESC NULLS LAST LIMIT 1"
+_TARGET_PROGRESS = "LEAST(100, COALESCE(current_value, 0)::float8 / target_value::float8 * 100)"
+
+_CARBON_TOTAL_SQL = {
+    False: "SELECT COALESCE(SUM(emissions_co2_tons), 0) AS total_carbon "
+           "FROM carbon_footprint_details WHERE company_id = :cid",
+    True: "SELECT COALESCE(SUM(total_tco2e), 0) AS total_carbon "
+          "FROM carbon_monthly_rollup WHERE company_id = :cid{period_filter}",
+}
+
+_AGGREGATES_SQL = f"""
+    WITH carbon AS ({{carbon}}),
+    energy AS (
+        SELECT COALESCE(SUM(consumption_kwh), 0) AS total_kwh,
+               COALESCE(SUM(consumption_kwh) FILTER (WHERE energy_type = 'renewable'), 0) AS renewable_kwh
+        FROM energy_consumption WHERE company_id = :cid{{period_filter}}
+    ),
+    waste AS (
+        SELECT COALESCE(SUM(amount_kg), 0) AS total_waste_kg,
+               COALESCE(SUM(amount_kg) FILTER (WHERE disposal_method = 'recycled'), 0) AS recycled_kg
+        FROM waste_management_data WHERE company_id = :cid{{period_filter}}
+    ),
+    water AS (
+        SELECT COALESCE(SUM(consumption_liters), 0) AS total_water_l
+        FROM water_usage_details WHERE company_id = :cid{{period_filter}}
+    ),
+    targets AS (
+        SELECT COUNT(*) AS targets_total,
+               COUNT(*) FILTER (
+                   WHERE target_value <> 0
+                     AND COALESCE(current_value, 0)::float8 / target_value::float8 >= 0.8
+               ) AS targets_on_track,
+               AVG({_TARGET_PROGRESS}) FILTER (WHERE category = 'environmental' AND target_value > 0) AS env_target_progress,
+               AVG({_TARGET_PROGRESS}) FILTER (WHERE category = 'governance' AND target_value > 0) AS gov_target_progress
+        FROM esg_targets WHERE company_id = :cid AND is_active = true
+    ),
+    engagement AS (
+        SELECT metric_name, value, target_value, reporting_period
+        FROM employee_engagement
+        WHERE company_id = :cid{{as_of_filter}}
+          AND metric_name IN ('Employee Satisfaction Score', 'Female Representation', 'Safety Incidents')
+    ),
+    trend AS ({TREND_SQL})
+    SELECT carbon.*, energy.*, waste.*, water.*, targets.*,
+           (SELECT value FROM engagement WHERE metric_name = 'Employee Satisfaction Score' {_LATEST}) AS satisfaction_value,
+           (SELECT target_value FROM engagement WHERE metric_name = 'Employee Satisfaction Score' {_LATEST}) AS satisfaction_max,
+           (SELECT value FROM engagement WHERE metric_name = 'Female Representation' {_LATEST}) AS female_representation,
+           (SELECT value FROM engagement WHERE metric_name = 'Safety Incidents' {_LATEST}) AS safety_incidents,
+           (SELECT COALESCE(json_agg(json_build_object('period', reporting_period, 'value', total)
+                                     ORDER BY reporting_period), '[]'::json)
+            FROM trend) AS carbon_trend
+    FROM carbon, energy, waste, water, targets
+"""
+
+
+_NEWEST = "ORDER BY reporting_period DESC NULLS LAST"
+
+_PORTFOLIO_CARBON_SQL = {
+    False: "SELECT company_id, SUM(emissions_co2_tons) AS total_carbon FROM carbon_footprint_details "
+           "WHERE company_id IN (SELECT company_id FROM portfolio) GROUP BY company_id",
+    True: "SELECT company_id, SUM(total_tco2e) AS total_carbon FROM carbon_monthly_rollup "
+          "WHERE company_id IN (SELECT company_id FROM portfolio){period_filter} GROUP BY company_id",
+}
+
+# Same columns as _AGGREGATES_SQL, one row per company: every CTE is a single
+# GROUP BY company_id pass, so a portfolio of any size costs one round-trip.
+_PORTFOLIO_SQL = f"""
+    WITH portfolio AS (
+        SELECT id AS company_id, name, industry FROM companies {{portfolio_filter}}
+    ),
+    carbon AS ({{carbon}}),
+    energy AS (
+        SELECT company_id, SUM(consumption_kwh) AS total_kwh,
+               SUM(consumption_kwh) FILTER (WHERE energy_type = 'renewable') AS renewable_kwh
+        FROM energy_consumption WHERE company_id IN (SELECT company_id FROM portfolio){{period_filter}}
+        GROUP BY company_id
+    ),
+    waste AS (
+        SELECT company_id, SUM(amount_kg) AS total_waste_kg,
+               SUM(amount_kg) FILTER (WHERE disposal_method = 'recycled') AS recycled_kg
+        FROM waste_management_data WHERE company_id IN (SELECT company_id FROM portfolio){{period_filter}}
+        GROUP BY company_id
+    ),
+    water AS (
+        SELECT company_id, SUM(consumption_liters) AS total_water_l
+        FROM water_usage_details WHERE company_id IN (SELECT company_id FROM portfolio){{period_filter}}
+        GROUP BY company_id
+    ),
+    targets AS (
+        SELECT company_id,
+               COUNT(*) AS targets_total,
+               COUNT(*) FILTER (
+                   WHERE target_value <> 0
+                     AND COALESCE(current_value, 0)::float8 / target_value::float8 >= 0.8
+               ) AS targets_on_track,
+               AVG({_TARGET_PROGRESS}) FILTER (WHERE category = 'environmental' AND target_value > 0) AS env_target_progress,
+               AVG({_TARGET_PROGRESS}) FILTER (WHERE category = 'governance' AND target_value > 0) AS gov_target_progress
+        FROM esg_targets WHERE company_id IN (SELECT company_id FROM portfolio) AND is_active = true
+        GROUP BY company_id
+    ),
+    engagement AS (
+        SELECT company_id,
+               (array_agg(value {_NEWEST}) FILTER (WHERE metric_name = 'Employee Satisfaction Score'))[1] AS satisfaction_value,
+               (array_agg(target_value {_NEWEST}) FILTER (WHERE metric_name = 'Employee Satisfaction Score'))[1] AS satisfaction_max,
+               (array_agg(value {_NEWEST}) FILTER (WHERE metric_name = 'Female Representation'))[1] AS female_representation,
+               (array_agg(value {_NEWEST}) FILTER (WHERE metric_name = 'Safety Incidents'))[1] AS safety_incidents
+        FROM employee_engagement
+        WHERE company_id IN (SELECT company_id FROM portfolio){{as_of_filter}}
+          AND metric_name IN ('Employee Satisfaction Score', 'Female Representation', 'Safety Incidents')
+        GROUP BY company_id
+    ),
+    trend AS (
+        SELECT company_id,
+               json_agg(json_build_object('period', reporting_period, 'value', total) ORDER BY reporting_period) AS carbon_trend
+        FROM (
+            SELECT company_id, reporting_period, SUM(total_tco2e) AS total,
+                   ROW_NUMBER() OVER (PARTITION BY company_id ORDER BY reporting_period DESC) AS recency
+            FROM carbon_monthly_rollup WHERE company_id IN (SELECT company_id FROM portfolio){{period_filter}}
+            GROUP BY company_id, reporting_period
+        ) periods
+        WHERE recency <= :months
+        GROUP BY company_id
+    )
+    SELECT p.company_id, p.name, p.industry,
+           COALESCE(carbon.total_carbon, 0) AS total_carbon,
+           COALESCE(energy.total_kwh, 0) AS total_kwh, COALESCE(energy.renewable_kwh, 0) AS renewable_kwh,
+           COALESCE(waste.total_waste_kg, 0) AS total_waste_kg, COALESCE(waste.recycled_kg, 0) AS recycled_kg,
+           COALESCE(water.total_water_l, 0) AS total_water_l,
+           COALESCE(targets.targets_total, 0) AS targets_total,
+           COALESCE(targets.targets_on_track, 0) AS targets_on_track,
+           targets.env_target_progress, targets.gov_target_progress,
+           engagement.satisfaction_value, engagement.satisfaction_max,
+           engagement.female_representation, engagement.safety_incidents,
+           COALESCE(trend.carbon_trend, '[]'::json) AS carbon_trend
+    FROM portfolio p
+    LEFT JOIN carbon USING (company_id)
+    LEFT JOIN energy USING (company_id)
+    LEFT JOIN waste USING (company_id)
+    LEFT JOIN water USING (company_id)
+    LEFT JOIN targets USING (company_id)
+    LEFT JOIN engagement USING (company_id)
+    LEFT JOIN trend USING (company_id)
+"""
+
+
+@lru_cache(maxsize=None)
+def _aggregates_query(period_filter: str, as_of_filter: str):
+    carbon = _CARBON_TOTAL_SQL[bool(period_filter)].format(period_filter=period_filter)
+    return text(_AGGREGATES_SQL.format(carbon=carbon, period_filter=period_filter, as_of_filter=as_of_filter))
+
+
+def fetch_aggregates(company_id: str, db: Session, months: int = 12, period: PeriodRange = ALL_TIME) -> dict:
+    """Run the single aggregation query and return its one-row result as a dict."""
+    query = _aggregates_query(period.filter(), period.as_of())
+    row = db.execute(query, {"cid": company_id, "months": months, **period.params()}).mappings().first()
+    return dict(row)
+
+
+def fetch_portfolio_aggregates(
+    company_ids: Optional[List[str]], db: Session, months: int = 12, period: PeriodRange = ALL_TIME
+) -> list[dict]:
+    """One aggregate row per company (all companies when company_ids is None)."""
+    params = {"months": months, **period.params()}
+    portfolio_filter = ""
+    if company_ids is not None:
+        portfolio_filter = "WHERE id = ANY(CAST(:cids AS uuid[]))"
+        params["cids"] = list(company_ids)
+    period_filter = period.filter()
+    sql = _PORTFOLIO_SQL.format(
+        portfolio_filter=portfolio_filter,
+        carbon=_PORTFOLIO_CARBON_SQL[bool(period_filter)].format(period_filter=period_filter),
+        period_filter=period_filter,
+        as_of_filter=period.as_of(),
+    )
+    return [dict(r) for r in db.execute(text(sql), params).mappings().all()]
 
-    return round(min(100, (renewable_pct * 0.4) + (recycling_rate * 0.3) + (avg_target_progress * 0.3)), 1)
 
+# ── Score derivation (pure functions over the aggregate row) ──────────────────
+
+def _renewable_pct(agg: dict) -> float:
+    total_kwh = _f(agg["total_kwh"])
+    return (_f(agg["renewable_kwh"]) / total_kwh * 100) if total_kwh > 0 else 0
+
+
+def _recycling_rate(agg: dict) -> float:
+    total_waste = _f(agg["total_waste_kg"])
+    return (_f(agg["recycled_kg"]) / total_waste * 100) if total_waste > 0 else 0
+
+
+def _environmental_from(agg: dict) -> float:
+    renewable_pct = _renewable_pct(agg)
+    recycling_rate = _recycling_rate(agg)
+
+    progress = agg["env_target_progress"]
+    avg_target_progress = _f(progress) if progress is not None else 50
+
+    return round(min(100, (renewable_pct * 0.4) + (recycling_rate * 0.3) + (avg_target_progress * 0.3)), 1)
 
-def compute_social_score(company_id: str, db: Session) -> float:
-    engagement = db.execute(
-        text("SELECT metric_name, value, target_value FROM employee_engagement WHERE company_id = :cid"),
-        {"cid": company_id}
-    ).mappings().all()
-    rows = {r["metric_name"]: r for r in engagement}
 
-    satisfaction_raw = _f(rows.get("Employee Satisfaction Score", {}).get("value", 0))
-    satisfaction_max = _f(rows.get("Employee Satisfaction Score", {}).get("target_value", 5)) or 5
+def _social_from(agg: dict) -> float:
+    satisfaction_raw = _f(agg["satisfaction_value"])
+    satisfaction_max = _f(agg["satisfaction_max"]) or 5
     satisfaction_score = (satisfaction_raw / satisfaction_max * 100) if satisfaction_max else 0
 
-    diversity_raw = _f(rows.get("Female Representation", {}).get("value", 0))
+    diversity_raw = _f(agg["female_representation"])
     diversity_score = min(100, diversity_raw * 2)
 
-    safety_incidents = _f(rows.get("Safety Incidents", {}).get("value", 0))
+    safety_incidents = _f(agg["safety_incidents"])
     safety_score = max(0, 100 - (safety_incidents * 10))
 
     return round(min(100, (satisfaction_score * 0.35) + (diversity_score * 0.30) + (safety_score * 0.35)), 1)
 
 
-def compute_governance_score(company_id: str, db: Session) -> float:
-    targets = db.execute(
-        text("SELECT current_value, target_value FROM esg_targets WHERE company_id = :cid AND category = 'governance' AND is_active = true"),
-        {"cid": company_id}
-    ).mappings().all()
+def _governance_from(agg: dict) -> float:
+    progress = agg["gov_target_progress"]
+    return round(_f(progress) if progress is not None else 75.0, 1)
 
-    if not targets:
-        return 75.0
 
-    progress = [
-        min(100, _f(t["current_value"]) / _f(t["target_value"]) * 100)
-        for t in targets if t["target_value"] and _f(t["target_value"]) > 0
-    ]
-    return round(sum(progress) / len(progress) if progress else 75.0, 1)
+# score_from / trend_from / summary_from derive every analytics payload from one
+# fetch_aggregates row, so callers needing several of them query once.
 
-
-def compute_esg_score(company_id: str, db: Session) -> ESGScore:
-    e = compute_environmental_score(company_id, db)
-    s = compute_social_score(company_id, db)
-    g = compute_governance_score(company_id, db)
+def score_from(agg: dict) -> ESGScore:
+    e = _environmental_from(agg)
+    s = _social_from(agg)
+    g = _governance_from(agg)
     overall = round((e * 0.4) + (s * 0.3) + (g * 0.3), 1)
     return ESGScore(environmental=e, social=s, governance=g, overall=overall, grade=_grade(overall))
 
 
-def compute_carbon_trend(company_id: str, db: Session, months: int = 12) -> List[TrendPoint]:
-    carbon = db.execute(
-        text("SELECT emissions_co2_tons, reporting_period FROM carbon_footprint_details WHERE company_id = :cid ORDER BY reporting_period ASC"),
-        {"cid": company_id}
-    ).mappings().all()
-
-    period_totals: dict[str, float] = {}
-    for r in carbon:
-        p = str(r["reporting_period"])
-        period_totals[p] = period_totals.get(p, 0) + _f(r["emissions_co2_tons"])
-
-    sorted_periods = sorted(period_totals.keys())[-months:]
-    return [TrendPoint(period=p, value=round(period_totals[p], 2)) for p in sorted_periods]
-
-
-def compute_analytics_summary(company_id: str, db: Session) -> AnalyticsSummary:
-    carbon = db.execute(
-        text("SELECT emissions_co2_tons FROM carbon_footprint_details WHERE company_id = :cid"),
-        {"cid": company_id}
-    ).mappings().all()
-    total_carbon = sum(_f(r["emissions_co2_tons"]) for r in carbon)
-
-    energy = db.execute(
-        text("SELECT energy_type, consumption_kwh FROM energy_consumption WHERE company_id = :cid"),
-        {"cid": company_id}
-    ).mappings().all()
-    total_kwh = sum(_f(r["consumption_kwh"]) for r in energy)
-    renewable_kwh = sum(_f(r["consumption_kwh"]) for r in energy if r["energy_type"] == "renewable")
-    renewable_pct = (renewable_kwh / total_kwh * 100) if total_kwh > 0 else 0
-
-    waste = db.execute(
-        text("SELECT amount_kg, disposal_method FROM waste_management_data WHERE company_id = :cid"),
-        {"cid": company_id}
-    ).mappings().all()
-    total_waste = sum(_f(r["amount_kg"]) for r in waste)
-    recycled = sum(_f(r["amount_kg"]) for r in waste if r["disposal_method"] == "recycled")
-    recycling_rate = (recycled / total_waste * 100) if total_waste > 0 else 0
-
-    water = db.execute(
-        text("SELECT consumption_liters FROM water_usage_details WHERE company_id = :cid"),
-        {"cid": company_id}
-    ).mappings().all()
-    total_water_ml = sum(_f(r["consumption_liters"]) for r in water) / 1_000_000
-
-    targets = db.execute(
-        text("SELECT current_value, target_value FROM esg_targets WHERE company_id = :cid AND is_active = true"),
-        {"cid": company_id}
-    ).mappings().all()
-    on_track = sum(
-        1 for t in targets
-        if t["target_value"] and _f(t["current_value"]) / _f(t["target_value"]) >= 0.8
-    )
+def trend_from(agg: dict) -> List[TrendPoint]:
+    return [
+        TrendPoint(period=str(p["period"]), value=round(_f(p["value"]), 2))
+        for p in agg["carbon_trend"]
+    ]
 
-    esg_score = compute_esg_score(company_id, db)
-    carbon_trend = compute_carbon_trend(company_id, db)
 
+def summary_from(company_id: str, agg: dict) -> AnalyticsSummary:
     return AnalyticsSummary(
         company_id=company_id,
-        total_carbon_tco2e=round(total_carbon, 2),
-        renewable_energy_pct=round(renewable_pct, 1),
-        recycling_rate_pct=round(recycling_rate, 1),
-        water_usage_ml=round(total_water_ml, 2),
-        esg_score=esg_score,
-        carbon_trend=carbon_trend,
-        targets_on_track=on_track,
-        targets_total=len(targets),
+        total_carbon_tco2e=round(_f(agg["total_carbon"]), 2),
+        renewable_energy_pct=round(_renewable_pct(agg), 1),
+        recycling_rate_pct=round(_recycling_rate(agg), 1),
+        water_usage_ml=round(_f(agg["total_water_l"]) / 1_000_000, 2),
+        esg_score=score_from(agg),
+        carbon_trend=trend_from(agg),
+        targets_on_track=int(agg["targets_on_track"]),
+        targets_total=int(agg["targets_total"]),
+    )
+
+
+SCORE_METHODOLOGY = {
+    "environmental": "40% renewable energy share + 30% recycling rate + 30% env target progress",
+    "social": "35% employee satisfaction + 30% gender diversity + 35% safety record",
+    "governance": "Average progress across all active governance targets",
+}
+
+
+def breakdown_from(score: ESGScore) -> dict:
+    return {pillar: {"score": getattr(score, pillar), "methodology": text} for pillar, text in SCORE_METHODOLOGY.items()}
+
+
+# ── Public API ─────────────────────────────────────────────────────────────────
+
+def compute_environmental_score(company_id: str, db: Session, period: PeriodRange = ALL_TIME) -> float:
+    return _environmental_from(fetch_aggregates(company_id, db, period=period))
+
+
+def compute_social_score(company_id: str, db: Session, period: PeriodRange = ALL_TIME) -> float:
+    return _social_from(fetch_aggregates(company_id, db, period=period))
+
+
+def compute_governance_score(company_id: str, db: Session, period: PeriodRange = ALL_TIME) -> float:
+    return _governance_from(fetch_aggregates(company_id, db, period=period))
+
+
+def compute_esg_score(company_id: str, db: Session, period: PeriodRange = ALL_TIME) -> ESGScore:
+    return score_from(fetch_aggregates(company_id, db, period=period))
+
+
+def compute_carbon_trend(
+    company_id: str, db: Session, months: int = 12, period: PeriodRange = ALL_TIME
+) -> List[TrendPoint]:
+    rows = fetch_trend_rows(db, company_id, months, period)
+    return [TrendPoint(period=str(r["reporting_period"]), value=round(_f(r["total"]), 2)) for r in reversed(rows)]
+
+
+def compute_analytics_summary(company_id: str, db: Session, period: PeriodRange = ALL_TIME) -> AnalyticsSummary:
+    return summary_from(company_id, fetch_aggregates(company_id, db, period=period))
+
+
+PORTFOLIO_SORT_KEYS = {
+    "overall": lambda h: -h.esg_score.overall,
+    "environmental": lambda h: -h.esg_score.environmental,
+    "social": lambda h: -h.esg_score.social,
+    "governance": lambda h: -h.esg_score.governance,
+    "total_carbon": lambda h: h.total_carbon_tco2e,   # lowest emitter first
+}
+
+
+def compute_portfolio(
+    company_ids: Optional[List[str]], db: Session, months: int = 12, sort_by: str = "overall",
+    period: PeriodRange = ALL_TIME,
+) -> PortfolioResponse:
+    """Score and rank many companies from a single GROUP BY company_id query."""
+    rows = fetch_portfolio_aggregates(company_ids, db, months, period)
+    holdings = [
+        PortfolioHolding(
+            **summary_from(str(agg["company_id"]), agg).model_dump(),
+            name=agg["name"],
+            industry=agg["industry"],
+        )
+        for agg in rows
+    ]
+    holdings.sort(key=lambda h: (PORTFOLIO_SORT_KEYS[sort_by](h), h.name))
+    for rank, h in enumerate(holdings, 1):
+        h.rank = rank
+
+    n = len(holdings)
+    averages = None
+    if n:
+        e = round(sum(h.esg_score.environmental for h in holdings) / n, 1)
+        s = round(sum(h.esg_score.social for h in holdings) / n, 1)
+        g = round(sum(h.esg_score.governance for h in holdings) / n, 1)
+        overall = round(sum(h.esg_score.overall for h in holdings) / n, 1)
+        averages = ESGScore(environmental=e, social=s, governance=g, overall=overall, grade=_grade(overall))
+
+    grades: dict[str, int] = {}
+    for h in holdings:
+        grades[h.esg_score.grade] = grades.get(h.esg_score.grade, 0) + 1
+    found = {h.company_id for h in holdings}
+    return PortfolioResponse(
+        count=n,
+        sort_by=sort_by,
+        average_score=averages,
+        total_carbon_tco2e=round(sum(h.total_carbon_tco2e for h in holdings), 2),
+        grade_distribution=grades,
+        holdings=holdings,
+        missing=[c for c in (company_ids or []) if c not in found],
     )
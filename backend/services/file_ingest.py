@@ -0,0 +1,194 @@
+"""File Ingestion — streams an "ESG Metrics" workbook or CSV into the ledger tables.
+
+The upload is read row by row (openpyxl read-only mode, or the csv module) straight
+from the spooled upload file, mapped onto carbon / energy / waste / water rows, and
+flushed through services/bulk_ingest in fixed-size batches. Memory is bounded by the
+batch size, not the file size, and `ingest_file` yields a progress event per flush.
+"""
+import codecs
+import csv
+import os
+from datetime import date, datetime
+from typing import IO, Any, Iterator
+
+from sqlalchemy.orm import Session
+
+from services.bulk_ingest import BULK_CHUNK_SIZE, validate_rows, bulk_write
+from services.data_versions import bump_version
+
+SHEET_NAME = "ESG Metrics"
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Scope-specific headers win over the unscoped total when a sheet has them.
+SCOPE_COLUMNS = {
+    1: "Scope 1 Emissions (tons CO2e)",
+    2: "Scope 2 Emissions (tons CO2e)",
+    3: "Scope 3 Emissions (tons CO2e)",
+}
+TOTAL_CARBON_COLUMN = "Carbon Emissions (tons CO2e)"
+ENERGY_TOTAL_COLUMNS = {"Energy Consumption (kWh)": 1, "Energy Consumption (MWh)": 1000}
+ENERGY_RENEWABLE_PCT_COLUMN = "Energy Renewable (%)"
+WATER_COLUMN = "Water Usage (m3)"
+WASTE_COLUMNS = {"Waste Recycled (tons)": "recycled", "Waste Unrecycled (tons)": "landfill"}
+PERIOD_COLUMNS = ("Reporting Period", "Period", "Date", "Month")
+YEAR_COLUMN = "Year"
+
+
+# ── Readers ───────────────────────────────────────────────────────────────────
+
+def _iter_xlsx(fileobj: IO[bytes], sheet: str) -> Iterator[dict]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        if sheet not in wb.sheetnames:
+            raise ValueError(f"Worksheet '{sheet}' not found (have: {', '.join(wb.sheetnames)})")
+        rows = wb[sheet].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        names = [str(h).strip() if h is not None else "" for h in header]
+        for values in rows:
+            if values is None or all(v is None for v in values):
+                continue
+            yield dict(zip(names, values))
+    finally:
+        wb.close()
+
+
+def _iter_csv(fileobj: IO[bytes]) -> Iterator[dict]:
+    reader = csv.DictReader(codecs.iterdecode(fileobj, "utf-8-sig"))
+    for row in reader:
+        yield {(k or "").strip(): (v if v != "" else None) for k, v in row.items()}
+
+
+def iter_sheet_rows(fileobj: IO[bytes], filename: str, sheet: str = SHEET_NAME) -> Iterator[dict]:
+    """Yield one {header: value} dict per data row without loading the whole file."""
+    if filename.lower().endswith(".csv"):
+        return _iter_csv(fileobj)
+    if filename.lower().endswith(".xlsx"):
+        return _iter_xlsx(fileobj, sheet)
+    raise ValueError("Only .xlsx and .csv files can be streamed")
+
+
+# ── Column mapping ────────────────────────────────────────────────────────────
+
+def _num(v: Any) -> float | None:
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _period(row: dict) -> date | None:
+    for col in PERIOD_COLUMNS:
+        v = row.get(col)
+        if isinstance(v, datetime):
+            return v.date()
+        if isinstance(v, date):
+            return v
+        if isinstance(v, str) and v.strip():
+            try:
+                return date.fromisoformat(v.strip()[:10])
+            except ValueError:
+                pass
+    year = _num(row.get(YEAR_COLUMN))
+    # Annual sheets: book the year's totals at its last day.
+    return date(int(year), 12, 31) if year else None
+
+
+def map_row(row: dict, company_id: str) -> Iterator[tuple[str, dict]]:
+    """Translate one sheet row into (ledger, raw row) pairs for the bulk writer."""
+    period = _period(row)
+    base = {"company_id": company_id, "reporting_period": period}
+
+    scoped = [(scope, _num(row.get(col))) for scope, col in SCOPE_COLUMNS.items()]
+    scoped = [(scope, v) for scope, v in scoped if v is not None]
+    if scoped:
+        for scope, tons in scoped:
+            yield "carbon", {**base, "scope": scope, "emissions_co2_tons": tons,
+                             "calculation_method": "file_upload", "unit": "tCO2e"}
+    else:
+        total = _num(row.get(TOTAL_CARBON_COLUMN))
+        if total is not None:
+            yield "carbon", {**base, "scope": None, "category": "Reported total (unscoped)",
+                             "emissions_co2_tons": total, "calculation_method": "file_upload", "unit": "tCO2e"}
+
+    for col, multiplier in ENERGY_TOTAL_COLUMNS.items():
+        total_kwh = _num(row.get(col))
+        if total_kwh is None:
+            continue
+        total_kwh *= multiplier
+        renewable_pct = _num(row.get(ENERGY_RENEWABLE_PCT_COLUMN))
+        if renewable_pct is None:
+            yield "energy", {**base, "energy_type": "grid", "consumption_kwh": total_kwh}
+        else:
+            renewable_kwh = total_kwh * renewable_pct / 100
+            yield "energy", {**base, "energy_type": "renewable", "consumption_kwh": renewable_kwh}
+            yield "energy", {**base, "energy_type": "non-renewable", "consumption_kwh": total_kwh - renewable_kwh}
+        break
+
+    water_m3 = _num(row.get(WATER_COLUMN))
+    if water_m3 is not None:
+        yield "water", {**base, "usage_type": "total", "consumption_liters": water_m3 * 1000}
+
+    for col, method in WASTE_COLUMNS.items():
+        tons = _num(row.get(col))
+        if tons is not None:
+            yield "waste", {**base, "disposal_method": method, "amount_kg": tons * 1000}
+
+
+# ── Pipeline ──────────────────────────────────────────────────────────────────
+
+def ingest_file(
+    db: Session,
+    fileobj: IO[bytes],
+    filename: str,
+    company_id: str,
+    sheet: str = SHEET_NAME,
+    batch_size: int = BULK_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """Stream, map, validate and batch-write a file; yields progress events.
+
+    All batches share one transaction, committed after the last row, so a failed
+    import leaves nothing behind. The final event has `"event": "done"`.
+    """
+    buffers: dict[str, list[dict]] = {}
+    counts = {"rows_read": 0, "inserted": {}, "invalid": 0}
+    errors: list[dict] = []
+
+    def flush(ledger: str) -> dict:
+        batch = buffers.pop(ledger, [])
+        valid, bad = validate_rows(ledger, batch)
+        for err in bad:
+            if len(errors) < 100:
+                errors.append({"ledger": ledger, "row": batch[err["index"]]["_row"], "errors": err["errors"]})
+        counts["invalid"] += len(bad)
+        written = bulk_write(db, ledger, valid)
+        counts["inserted"][ledger] = counts["inserted"].get(ledger, 0) + written
+        return {"event": "progress", "ledger": ledger, "rows_read": counts["rows_read"],
+                "inserted": dict(counts["inserted"]), "invalid": counts["invalid"]}
+
+    try:
+        for row in iter_sheet_rows(fileobj, filename, sheet):
+            counts["rows_read"] += 1
+            for ledger, mapped in map_row(row, company_id):
+                # _row (1-based sheet data row) is ignored by the schemas; kept for error reports.
+                mapped["_row"] = counts["rows_read"]
+                buf = buffers.setdefault(ledger, [])
+                buf.append(mapped)
+                if len(buf) >= batch_size:
+                    yield flush(ledger)
+        for ledger in list(buffers):
+            yield flush(ledger)
+        if any(counts["inserted"].values()):
+            bump_version(db, [company_id])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        yield {"event": "error", "message": str(e), "rows_read": counts["rows_read"]}
+        return
+    yield {"event": "done", "rows_read": counts["rows_read"], "inserted": counts["inserted"],
+           "invalid": counts["invalid"], "errors": errors}
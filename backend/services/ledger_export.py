@@ -0,0 +1,209 @@
+"""Ledger Export — full-table dumps streamed from a server-side cursor.
+
+`export_ledger` runs one ordered SELECT with `stream_results`/`yield_per`, so psycopg2
+uses a named (server-side) cursor and fetches EXPORT_BATCH_ROWS rows at a time, and
+encodes each batch as it arrives: CSV, NDJSON, or Parquet row groups (pyarrow, which
+is optional and only imported for Parquet). Memory is bounded by the batch size, not
+the table size, and CSV/NDJSON chunks reach the client while later batches are
+still being read.
+
+Each export keeps a pooled connection for the whole download, so at most
+EXPORT_MAX_CONCURRENT run at once (their connections are reserved in services/db.py);
+further requests get a 503 instead of queueing for a connection.
+"""
+import csv
+import io
+import os
+import threading
+import weakref
+from typing import Iterator, Optional
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from services.db import EXPORT_MAX_CONCURRENT, SessionLocal
+from services.pagination import TABLE_COLUMNS
+from services.periods import ALL_TIME, PeriodRange
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+EXPORT_LEDGERS: dict[str, str] = {
+    "carbon": "carbon_footprint_details",
+    "energy": "energy_consumption",
+    "waste": "waste_management_data",
+    "water": "water_usage_details",
+    "employees": "employee_engagement",
+    "suppliers": "supply_chain_metrics",
+    "targets": "esg_targets",
+}
+
+EXPORT_FORMATS: dict[str, tuple[str, str]] = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def has_period(table: str) -> bool:
+    return "reporting_period" in TABLE_COLUMNS[table]
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ── Query ─────────────────────────────────────────────────────────────────────
+
+def _iter_batches(table: str, columns: list[str], company_id: str, period: PeriodRange):
+    """Yield (cursor description, rows) per fetched batch; owns its session."""
+    sort_col = "reporting_period" if has_period(table) else "created_at"
+    sql = (
+        f"SELECT {', '.join(columns)} FROM {table} WHERE company_id = :cid{period.filter()} "
+        f"ORDER BY {sort_col}, id"
+    )
+    db = SessionLocal()
+    try:
+        conn = db.connection(execution_options={"stream_results": True, "yield_per": EXPORT_BATCH_ROWS})
+        result = conn.execute(text(sql), {"cid": company_id, **period.params()})
+        description = result.cursor.description
+        for rows in result.partitions(EXPORT_BATCH_ROWS):
+            yield description, rows
+        result.close()
+    finally:
+        db.close()
+
+
+# ── Encoders ──────────────────────────────────────────────────────────────────
+
+def _encode_csv(columns: list[str], batches) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    # The header goes out before the query runs: the client gets its first byte at once.
+    yield buf.getvalue().encode()
+    for _, rows in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue().encode()
+
+
+def _encode_ndjson(columns: list[str], batches) -> Iterator[bytes]:
+    for _, rows in batches:
+        yield b"".join(orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+# Postgres type OIDs → Arrow types; anything else (text, uuid, …) is exported as a string.
+_ARROW_TYPES = {
+    16: "bool_", 20: "int64", 21: "int32", 23: "int32", 700: "float32", 701: "float64",
+    1700: "float64", 1082: "date32", 1114: "timestamp", 1184: "timestamptz",
+}
+
+
+def _arrow_schema(pa, columns: list[str], description):
+    fields = []
+    for name, col in zip(columns, description):
+        kind = _ARROW_TYPES.get(col[1], "string")
+        if kind == "timestamp":
+            arrow_type = pa.timestamp("us")
+        elif kind == "timestamptz":
+            arrow_type = pa.timestamp("us", tz="UTC")
+        else:
+            arrow_type = getattr(pa, kind)()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file for ParquetWriter: keeps a running offset (the footer records
+    row-group positions) and lets the encoder take written bytes as they arrive."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _encode_parquet(columns: list[str], batches) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    for description, rows in batches:
+        if writer is None:
+            schema = _arrow_schema(pa, columns, description)
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        data = {
+            field.name: [None if v is None else (str(v) if field.type == pa.string() else v) for v in values]
+            for field, values in zip(schema, zip(*rows))
+        }
+        # Each batch is one row group, written through to the sink.
+        writer.write_batch(pa.RecordBatch.from_pydict(data, schema=schema))
+        chunk = sink.take()
+        if chunk:
+            yield chunk
+    if writer is None:
+        # Empty result: still a valid (zero-row) file.
+        writer = pq.ParquetWriter(sink, pa.schema([pa.field(name, pa.string()) for name in columns]))
+    writer.close()
+    yield sink.take()
+
+
+_ENCODERS = {"csv": _encode_csv, "ndjson": _encode_ndjson, "parquet": _encode_parquet}
+
+
+def export_ledger(
+    ledger: str,
+    company_id: str,
+    fmt: str = "csv",
+    period: PeriodRange = ALL_TIME,
+    fields: Optional[list[str]] = None,
+) -> Iterator[bytes]:
+    """Stream one company's ledger in `fmt`, ordered by reporting period then id.
+
+    Takes an export slot now (503 if none is free) and frees it when the stream ends,
+    fails, is closed, or is dropped unread.
+    """
+    if not _export_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail=f"{EXPORT_MAX_CONCURRENT} exports already running; retry shortly",
+            headers={"Retry-After": "10"},
+        )
+    table = EXPORT_LEDGERS[ledger]
+    columns = fields or TABLE_COLUMNS[table]
+
+    def stream() -> Iterator[bytes]:
+        try:
+            yield from _ENCODERS[fmt](columns, _iter_batches(table, columns, company_id, period))
+        finally:
+            release()
+
+    chunks = stream()
+    # Runs once: from the finally above, or when a never-started stream is collected.
+    release = weakref.finalize(chunks, _export_slots.release)
+    return chunks
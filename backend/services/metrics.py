@@ -0,0 +1,331 @@
+"""Metrics — request timing, DB query counts, R2 and PDF durations in Prometheus format.
+
+`MetricsMiddleware` opens a per-request `RequestStats` (a context variable, so it
+follows the request into threadpool handlers) and records route latency when the
+response finishes. SQLAlchemy cursor events (`instrument_engine`), `track_r2` and
+`track_pdf` add to both the process-wide histograms and the current request's
+stats, which are reported in a `Server-Timing` header and, per route, as
+query-count histograms — a route whose query count grows with its data is an N+1.
+`render()` produces the text exposition served at /metrics.
+
+Metrics are per process. Report-job workers `drain()` what they recorded and the
+API process `merge()`s it, so PDF builds done in the pool still show up.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+BUILD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+# ── Metric types ──────────────────────────────────────────────────────────────
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels → [count per bucket (non-cumulative, +Inf last)..., sum, count]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._labels(labels)
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        lines = []
+        for key, values in sorted(series.items()):
+            base = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_fmt_labels(base + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(base)} {values[-2]!r}")
+            lines.append(f"{self.name}_count{_fmt_labels(base)} {values[-1]}")
+        return lines
+
+    def drain(self) -> dict:
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series: dict) -> None:
+        with self._lock:
+            for key, values in series.items():
+                current = self._series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0, 0])
+                for i, v in enumerate(values):
+                    current[i] += v
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = dict(self._series)
+        return [
+            f"{self.name}{_fmt_labels(list(zip(self.labelnames, key)))} {value:g}"
+            for key, value in sorted(series.items())
+        ]
+
+    def drain(self) -> dict:
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series: dict) -> None:
+        with self._lock:
+            for key, value in series.items():
+                self._series[key] = self._series.get(key, 0) + value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"),
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request.", ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request.", ("method", "route"),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement latency by statement type.", ("statement",),
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "SQL statements that raised.", ("statement",))
+R2_REQUEST_SECONDS = Histogram(
+    "r2_request_duration_seconds", "Cloudflare R2 call latency.", ("operation",),
+)
+R2_REQUEST_ERRORS = Counter("r2_request_errors_total", "Cloudflare R2 calls that raised.", ("operation",))
+PDF_BUILD_SECONDS = Histogram(
+    "pdf_build_duration_seconds", "generate_pdf wall time.", ("report_type",), BUILD_BUCKETS,
+)
+
+REGISTRY = [
+    HTTP_REQUEST_SECONDS, HTTP_REQUEST_DB_QUERIES, HTTP_REQUEST_DB_SECONDS,
+    DB_QUERY_SECONDS, DB_QUERY_ERRORS, R2_REQUEST_SECONDS, R2_REQUEST_ERRORS, PDF_BUILD_SECONDS,
+]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def drain() -> dict:
+    """Take (and reset) everything recorded in this process, keyed by metric name."""
+    return {metric.name: metric.drain() for metric in REGISTRY}
+
+
+def merge(snapshot: Optional[dict]) -> None:
+    """Add a `drain()` snapshot from another process."""
+    if not snapshot:
+        return
+    for metric in REGISTRY:
+        if metric.name in snapshot:
+            metric.merge(snapshot[metric.name])
+
+
+# ── Per-request stats ─────────────────────────────────────────────────────────
+
+class RequestStats:
+    __slots__ = ("start", "db_queries", "db_seconds", "r2_calls", "r2_seconds", "pdf_seconds", "_lock")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.r2_calls = 0
+        self.r2_seconds = 0.0
+        self.pdf_seconds = 0.0
+        # A handler may fan queries out over several threads.
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds: float) -> None:
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def add_r2(self, seconds: float) -> None:
+        with self._lock:
+            self.r2_calls += 1
+            self.r2_seconds += seconds
+
+    def add_pdf(self, seconds: float) -> None:
+        with self._lock:
+            self.pdf_seconds += seconds
+
+    def server_timing(self) -> str:
+        parts = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"']
+        if self.r2_calls:
+            parts.append(f'r2;dur={self.r2_seconds * 1000:.1f};desc="{self.r2_calls} calls"')
+        if self.pdf_seconds:
+            parts.append(f"pdf;dur={self.pdf_seconds * 1000:.1f}")
+        parts.append(f"app;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_r2(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        R2_REQUEST_ERRORS.inc(operation=operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        R2_REQUEST_SECONDS.observe(elapsed, operation=operation)
+        stats = _current.get()
+        if stats is not None:
+            stats.add_r2(elapsed)
+
+
+@contextmanager
+def track_pdf(report_type: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PDF_BUILD_SECONDS.observe(elapsed, report_type=report_type)
+        stats = _current.get()
+        if stats is not None:
+            stats.add_pdf(elapsed)
+
+
+# ── SQLAlchemy hooks ──────────────────────────────────────────────────────────
+
+def _statement_type(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else ""
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERY_SECONDS.observe(elapsed, statement=_statement_type(statement))
+    stats = _current.get()
+    if stats is not None:
+        stats.add_query(elapsed)
+
+
+def _on_error(ctx):
+    if ctx.connection is not None and ctx.connection.info.get("query_start"):
+        elapsed = time.perf_counter() - ctx.connection.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.add_query(elapsed)
+    DB_QUERY_ERRORS.inc(statement=_statement_type(ctx.statement or ""))
+
+
+def instrument_engine(engine) -> None:
+    """Time every cursor execution on `engine` (idempotent)."""
+    from sqlalchemy import event
+
+    if event.contains(engine, "before_cursor_execute", _before_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _on_error)
+
+
+# ── ASGI middleware ───────────────────────────────────────────────────────────
+
+class MetricsMiddleware:
+    """Per-route latency and DB histograms, plus a Server-Timing response header.
+
+    Routes are labelled by their template ("/api/reports/{report_id}"), never the raw
+    path, so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", None) or "unmatched"}
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - stats.start, status=status, **labels)
+            HTTP_REQUEST_DB_QUERIES.observe(stats.db_queries, **labels)
+            HTTP_REQUEST_DB_SECONDS.observe(stats.db_seconds, **labels)
@@ -0,0 +1,145 @@
+"""Keyset pagination and column projection for the /api/esg list endpoints.
+
+Pages are ordered by (sort column, id) and continued with an opaque cursor holding
+the last row's key, so page N is an index range scan rather than an OFFSET that
+re-reads every earlier row. `fields=` narrows the SELECT list to a whitelisted subset.
+Pages are encoded straight to JSON bytes (services/db.json_response).
+"""
+import base64
+import json
+import uuid
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from services.db import json_response, result_dicts
+
+_LEDGER_COMMON = ["id", "company_id", "facility_name", "cost", "currency", "reporting_period", "created_at"]
+
+TABLE_COLUMNS: dict[str, list[str]] = {
+    "carbon_footprint_details": [
+        "id", "company_id", "scope", "category", "source_description", "emissions_co2_tons",
+        "calculation_method", "emission_factor", "activity_data", "unit", "reporting_period",
+        "verified", "created_at",
+    ],
+    "energy_consumption": _LEDGER_COMMON + ["energy_type", "source", "consumption_kwh"],
+    "waste_management_data": _LEDGER_COMMON + ["waste_type", "waste_category", "amount_kg", "disposal_method"],
+    "water_usage_details": _LEDGER_COMMON + ["usage_type", "source", "consumption_liters"],
+    "employee_engagement": [
+        "id", "company_id", "metric_name", "category", "value", "unit", "department",
+        "reporting_period", "target_value", "created_at",
+    ],
+    "supply_chain_metrics": [
+        "id", "company_id", "supplier_name", "supplier_category", "esg_score", "environmental_score",
+        "social_score", "governance_score", "certification_status", "last_audit_date",
+        "next_audit_date", "created_at", "updated_at",
+    ],
+    "esg_targets": [
+        "id", "company_id", "category", "metric_name", "target_value", "current_value", "unit",
+        "target_date", "description", "is_active", "created_at", "updated_at",
+    ],
+}
+
+
+def encode_cursor(sort_value, row_id) -> str:
+    raw = json.dumps([None if sort_value is None else str(sort_value), str(row_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# Parsers for the sort keys a cursor can carry; a value that doesn't parse would
+# otherwise only fail in Postgres, as a 500.
+_SORT_VALUE_PARSERS = {
+    "reporting_period": date.fromisoformat,
+    "target_date": date.fromisoformat,
+    "esg_score": int,
+}
+
+
+def decode_cursor(cursor: str, sort_col: Optional[str] = None) -> tuple[Optional[str], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        uuid.UUID(row_id)
+        if sort_value is not None:
+            if not isinstance(sort_value, str):
+                raise ValueError(sort_value)
+            _SORT_VALUE_PARSERS.get(sort_col, str)(sort_value)
+        return sort_value, row_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(table: str, fields: Optional[str]) -> Optional[list[str]]:
+    if not fields:
+        return None
+    allowed = TABLE_COLUMNS[table]
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return requested
+
+
+def _keyset_predicate(sort_col: str, descending: bool, cursor_value, has_value: bool) -> str:
+    # Postgres sorts NULLs first for DESC and last for ASC; the predicates below
+    # continue from the cursor row in exactly that order.
+    if descending:
+        if not has_value:
+            return f"(({sort_col} IS NULL AND id < :_cursor_id) OR {sort_col} IS NOT NULL)"
+        return f"(({sort_col}, id) < (:_cursor_value, :_cursor_id))"
+    if not has_value:
+        return f"({sort_col} IS NULL AND id > :_cursor_id)"
+    return f"(({sort_col}, id) > (:_cursor_value, :_cursor_id) OR {sort_col} IS NULL)"
+
+
+def query_page(
+    db: Session,
+    table: str,
+    where: list[str],
+    params: dict,
+    sort_col: str,
+    descending: bool = True,
+    limit: Optional[int] = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> dict:
+    """Run one keyset-paginated SELECT and return {data, count, next_cursor}."""
+    projection = parse_fields(table, fields)
+    select_cols = projection or TABLE_COLUMNS[table]
+    # The cursor needs the key columns even when the caller didn't ask for them.
+    query_cols = select_cols + [c for c in (sort_col, "id") if c not in select_cols]
+
+    clauses = list(where)
+    params = dict(params)
+    if cursor:
+        cursor_value, cursor_id = decode_cursor(cursor, sort_col)
+        clauses.append(_keyset_predicate(sort_col, descending, cursor_value, cursor_value is not None))
+        params["_cursor_id"] = cursor_id
+        if cursor_value is not None:
+            params["_cursor_value"] = cursor_value
+
+    direction = "DESC" if descending else "ASC"
+    sql = f"SELECT {', '.join(query_cols)} FROM {table} WHERE {' AND '.join(clauses)} ORDER BY {sort_col} {direction}, id {direction}"
+    if limit is not None:
+        sql += " LIMIT :_limit"
+        params["_limit"] = limit + 1
+
+    data = result_dicts(db.execute(text(sql), params))
+    next_cursor = None
+    if limit is not None and len(data) > limit:
+        data = data[:limit]
+        if data:
+            last = data[-1]
+            next_cursor = encode_cursor(last[sort_col], last["id"])
+
+    if len(query_cols) != len(select_cols):
+        data = [{k: r[k] for k in select_cols} for r in data]
+    return {"data": data, "count": len(data), "next_cursor": next_cursor}
+
+
+def fetch_page(db: Session, table: str, where: list[str], params: dict, sort_col: str, **kwargs) -> Response:
+    """query_page, encoded straight to a JSON response."""
+    return json_response(query_page(db, table, where, params, sort_col, **kwargs))
@@ -0,0 +1,156 @@
+"""Reporting Periods — parse period strings and from/to bounds into SQL range predicates.
+
+A `PeriodRange` is a half-open [start, end) interval of `reporting_period` dates;
+either side may be open. Its `filter()` fragment is appended to queries that already
+filter on company_id, so every bounded read is a range scan on the
+(company_id, reporting_period) indices. Unbounded ranges add nothing, keeping the
+all-time queries exactly as they were (including rows with no period).
+
+Period strings (report `period`, analytics `?period=`):
+    2024            calendar year          2024-Q2        calendar quarter
+    2024-03         month                  FY2024[-Q1]    fiscal year [quarter]
+    2024-01-01..2024-06-30  inclusive date range           "" / all  all time
+Fiscal years start in FISCAL_YEAR_START_MONTH and are named after the calendar
+year they end in (with July starts, FY2024 = 2023-07-01 .. 2024-06-30).
+"""
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+FISCAL_YEAR_START_MONTH = int(os.getenv("FISCAL_YEAR_START_MONTH", "1"))
+
+_YEAR = re.compile(r"^(\d{4})$")
+_MONTH = re.compile(r"^(\d{4})-(\d{2})$")
+_QUARTER = re.compile(r"^(\d{4})-Q([1-4])$")
+_FISCAL = re.compile(r"^FY(\d{4})(?:-Q([1-4]))?$")
+_RANGE = re.compile(r"^(\d{4}-\d{2}-\d{2})?\.\.(\d{4}-\d{2}-\d{2})?$")
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+@dataclass(frozen=True)
+class PeriodRange:
+    start: Optional[date] = None
+    end: Optional[date] = None      # exclusive
+
+    @property
+    def bounded(self) -> bool:
+        return self.start is not None or self.end is not None
+
+    @property
+    def key(self) -> tuple:
+        """Hashable identity, for cache keys."""
+        return (self.start, self.end)
+
+    def filter(self, column: str = "reporting_period") -> str:
+        """` AND ...` range predicate on `column` (empty when unbounded)."""
+        sql = ""
+        if self.start is not None:
+            sql += f" AND {column} >= :period_start"
+        if self.end is not None:
+            sql += f" AND {column} < :period_end"
+        return sql
+
+    def as_of(self, column: str = "reporting_period") -> str:
+        """Only the upper bound: for point-in-time metrics, the latest value up to the period end."""
+        return f" AND {column} < :period_end" if self.end is not None else ""
+
+    def params(self) -> dict:
+        params = {}
+        if self.start is not None:
+            params["period_start"] = self.start
+        if self.end is not None:
+            params["period_end"] = self.end
+        return params
+
+    @property
+    def label(self) -> str:
+        if not self.bounded:
+            return "All time"
+        first = self.start.isoformat() if self.start else "…"
+        last = (self.end - timedelta(days=1)).isoformat() if self.end else "…"
+        return f"{first} – {last}"
+
+
+ALL_TIME = PeriodRange()
+
+
+def parse_period(period: Optional[str]) -> PeriodRange:
+    """Parse a period string (see module docstring). Raises ValueError on anything else."""
+    value = (period or "").strip()
+    if value.lower() in ("", "all"):
+        return ALL_TIME
+    upper = value.upper()
+    if m := _YEAR.match(value):
+        start = date(int(m[1]), 1, 1)
+        return PeriodRange(start, _add_months(start, 12))
+    if m := _MONTH.match(value):
+        if not 1 <= int(m[2]) <= 12:
+            raise ValueError(f"Invalid month in period '{value}'")
+        start = date(int(m[1]), int(m[2]), 1)
+        return PeriodRange(start, _add_months(start, 1))
+    if m := _QUARTER.match(upper):
+        start = date(int(m[1]), 3 * (int(m[2]) - 1) + 1, 1)
+        return PeriodRange(start, _add_months(start, 3))
+    if m := _FISCAL.match(upper):
+        start = _add_months(date(int(m[1]), FISCAL_YEAR_START_MONTH, 1), -12 if FISCAL_YEAR_START_MONTH > 1 else 0)
+        if m[2]:
+            start = _add_months(start, 3 * (int(m[2]) - 1))
+            return PeriodRange(start, _add_months(start, 3))
+        return PeriodRange(start, _add_months(start, 12))
+    if m := _RANGE.match(value):
+        return period_range(
+            date.fromisoformat(m[1]) if m[1] else None,
+            date.fromisoformat(m[2]) if m[2] else None,
+        )
+    raise ValueError(
+        f"Unrecognised period '{value}'. Use YYYY, YYYY-MM, YYYY-Qn, FYYYYY[-Qn] or YYYY-MM-DD..YYYY-MM-DD"
+    )
+
+
+def period_range(date_from: Optional[date] = None, date_to: Optional[date] = None, period: Optional[str] = None) -> PeriodRange:
+    """Combine inclusive from/to dates or a period string (not both) into a PeriodRange."""
+    if period and (date_from or date_to):
+        raise ValueError("Pass either 'period' or 'from'/'to', not both")
+    if period:
+        return parse_period(period)
+    if date_from and date_to and date_from > date_to:
+        raise ValueError("'from' must not be after 'to'")
+    return PeriodRange(date_from, date_to + timedelta(days=1) if date_to else None)
+
+
+def default_period(report_type: str, today: Optional[date] = None) -> str:
+    """Period for a monthly/annual report requested without one: the last complete month / fiscal year."""
+    today = today or date.today()
+    if report_type == "monthly":
+        return _add_months(date(today.year, today.month, 1), -1).strftime("%Y-%m")
+    if report_type == "annual":
+        if FISCAL_YEAR_START_MONTH == 1:
+            return str(today.year - 1)
+        current = today.year + (1 if today.month >= FISCAL_YEAR_START_MONTH else 0)
+        return f"FY{current - 1}"
+    return ""
+
+
+def query_period(date_from: Optional[date], date_to: Optional[date], period: Optional[str]) -> PeriodRange:
+    """period_range for request input: invalid or conflicting values are a 400."""
+    try:
+        return period_range(date_from, date_to, period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def reporting_period(
+    date_from: Optional[date] = Query(None, alias="from", description="First day included (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Last day included (YYYY-MM-DD)"),
+    period: Optional[str] = Query(None, description="YYYY, YYYY-MM, YYYY-Qn or FYYYYY[-Qn]; instead of from/to"),
+) -> PeriodRange:
+    """Dependency: optional reporting-period scope from query params; omitted means all time."""
+    return query_period(date_from, date_to, period)
@@ -1,8 +1,11 @@
 import os
-import boto3
-from botocore.config import Config
+from email.utils import format_datetime
+from typing import Iterator
+
 from dotenv import load_dotenv
 
+from services.metrics import track_r2
+
 load_dotenv()
 
 R2_ACCOUNT_ID  = os.getenv("R2_ACCOUNT_ID", "")
@@ -10,6 +13,7 @@ R2_ACCESS_KEY  = os.getenv("R2_ACCESS_KEY", "")
 R2_SECRET_KEY  = os.getenv("R2_SECRET_KEY", "")
 R2_BUCKET      = os.getenv("R2_BUCKET", "bestbyte-reports")
 R2_ENDPOINT    = f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
+R2_CHUNK_SIZE  = int(os.getenv("R2_CHUNK_SIZE", str(64 * 1024)))
 
 _client = None
 
@@ -17,6 +21,10 @@ _client = None
 def _get_client():
     global _client
     if _client is None:
+        # boto3 costs ~0.1s to import; load it on first use, not at startup
+        import boto3
+        from botocore.config import Config
+
         _client = boto3.client(
             "s3",
             endpoint_url=R2_ENDPOINT,
@@ -30,29 +38,104 @@ def _get_client():
 
 def upload_pdf(pdf_bytes: bytes, key: str) -> str:
     """Upload PDF to R2 and return the object key."""
-    _get_client().put_object(
-        Bucket=R2_BUCKET,
-        Key=key,
-        Body=pdf_bytes,
-        ContentType="application/pdf",
-    )
+    with track_r2("put_object"):
+        _get_client().put_object(
+            Bucket=R2_BUCKET,
+            Key=key,
+            Body=pdf_bytes,
+            ContentType="application/pdf",
+        )
     return key
 
 
 def download_pdf(key: str) -> bytes:
     """Download PDF from R2 and return bytes."""
-    response = _get_client().get_object(Bucket=R2_BUCKET, Key=key)
-    return response["Body"].read()
+    with track_r2("get_object"):
+        response = _get_client().get_object(Bucket=R2_BUCKET, Key=key)
+        return response["Body"].read()
+
+
+def _iter_body(body, chunk_size: int) -> Iterator[bytes]:
+    try:
+        yield from body.iter_chunks(chunk_size=chunk_size)
+    finally:
+        body.close()
+
+
+def stream_pdf(
+    key: str,
+    range_header: str | None = None,
+    if_none_match: str | None = None,
+    chunk_size: int = R2_CHUNK_SIZE,
+) -> tuple[int, dict, Iterator[bytes] | None]:
+    """Open an R2 object for streaming, passing Range / If-None-Match through to R2.
+
+    Returns (status_code, headers, body_iterator). The iterator yields `chunk_size`
+    pieces straight off the S3 response, so a download never buffers the whole PDF.
+    It is None for 304 and 416 responses.
+    """
+    from botocore.exceptions import ClientError
+
+    params = {"Bucket": R2_BUCKET, "Key": key}
+    if range_header:
+        params["Range"] = range_header
+    if if_none_match:
+        params["IfNoneMatch"] = if_none_match
+    try:
+        # Times the request up to the response headers; the body streams afterwards.
+        with track_r2("get_object"):
+            response = _get_client().get_object(**params)
+    except ClientError as e:
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        code = e.response.get("Error", {}).get("Code")
+        if status == 304 or code in ("304", "NotModified"):
+            etag = e.response.get("ResponseMetadata", {}).get("HTTPHeaders", {}).get("etag", if_none_match)
+            return 304, {"ETag": etag}, None
+        if status == 416 or code == "InvalidRange":
+            with track_r2("head_object"):
+                size = _get_client().head_object(Bucket=R2_BUCKET, Key=key)["ContentLength"]
+            return 416, {"Content-Range": f"bytes */{size}"}, None
+        raise
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(response["ContentLength"]),
+    }
+    if response.get("ETag"):
+        headers["ETag"] = response["ETag"]
+    if response.get("LastModified"):
+        headers["Last-Modified"] = format_datetime(response["LastModified"], usegmt=True)
+    status_code = 200
+    if response.get("ContentRange"):
+        headers["Content-Range"] = response["ContentRange"]
+        status_code = 206
+    return status_code, headers, _iter_body(response["Body"], chunk_size)
 
 
 def get_presigned_url(key: str, expires: int = 3600) -> str:
     """Return a pre-signed download URL valid for `expires` seconds."""
-    return _get_client().generate_presigned_url(
-        "get_object",
-        Params={"Bucket": R2_BUCKET, "Key": key},
-        ExpiresIn=expires,
-    )
+    with track_r2("presign"):
+        return _get_client().generate_presigned_url(
+            "get_object",
+            Params={"Bucket": R2_BUCKET, "Key": key},
+            ExpiresIn=expires,
+        )
+
+
+def object_exists(key: str) -> bool:
+    """Cheap HEAD check for an object in R2."""
+    from botocore.exceptions import ClientError
+
+    try:
+        with track_r2("head_object"):
+            _get_client().head_object(Bucket=R2_BUCKET, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
 
 
 def delete_object(key: str) -> None:
-    _get_client().delete_object(Bucket=R2_BUCKET, Key=key)
+    with track_r2("delete_object"):
+        _get_client().delete_object(Bucket=R2_BUCKET, Key=key)
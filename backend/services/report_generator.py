@@ -1,4 +1,6 @@
 """ESG Report Generator — builds a structured PDF from Neon PostgreSQL data."""
+import hashlib
+import json
 from io import BytesIO
 from datetime import datetime
 
@@ -14,7 +16,10 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from services.carbon_rollup import fetch_scope_totals
 from services.esg_analytics import compute_esg_score, compute_analytics_summary
+from services.periods import parse_period
+from services.metrics import track_pdf
 
 EMERALD = HexColor("#10B981")
 EMERALD_DARK = HexColor("#065F46")
@@ -25,6 +30,31 @@ MID_GRAY = HexColor("#E2E8F0")
 RED = HexColor("#EF4444")
 AMBER = HexColor("#F59E0B")
 
+# Bump whenever the layout or any computation in generate_pdf changes, so that
+# cached PDFs built by an older generator are never served.
+REPORT_GENERATOR_VERSION = "5"
+
+# Per-table change markers. Ledger tables are append-only through the API, so
+# (row count, newest created_at) changes whenever their content does; targets
+# and suppliers are also updated in place and carry an updated_at trigger.
+_FINGERPRINT_SQL = text("""
+    SELECT
+      (SELECT COUNT(*) || ':' || COALESCE(MAX(created_at)::text, '')
+         FROM carbon_footprint_details WHERE company_id = :cid) AS carbon,
+      (SELECT COUNT(*) || ':' || COALESCE(MAX(created_at)::text, '')
+         FROM energy_consumption WHERE company_id = :cid) AS energy,
+      (SELECT COUNT(*) || ':' || COALESCE(MAX(created_at)::text, '')
+         FROM waste_management_data WHERE company_id = :cid) AS waste,
+      (SELECT COUNT(*) || ':' || COALESCE(MAX(created_at)::text, '')
+         FROM water_usage_details WHERE company_id = :cid) AS water,
+      (SELECT COUNT(*) || ':' || COALESCE(MAX(created_at)::text, '')
+         FROM employee_engagement WHERE company_id = :cid) AS employees,
+      (SELECT COUNT(*) || ':' || COALESCE(GREATEST(MAX(created_at), MAX(updated_at))::text, '')
+         FROM esg_targets WHERE company_id = :cid) AS targets,
+      (SELECT COUNT(*) || ':' || COALESCE(GREATEST(MAX(created_at), MAX(updated_at))::text, '')
+         FROM supply_chain_metrics WHERE company_id = :cid) AS suppliers
+""")
+
 
 def _styles():
     base = getSampleStyleSheet()
@@ -82,25 +112,49 @@ def _data_table(headers: list, rows: list[list], zebra=True) -> Table:
     return t
 
 
+def report_fingerprint(company_id: str, db: Session, report_type: str = "full", period: str = "") -> str:
+    """Hash of everything generate_pdf's output depends on; equal hashes mean an identical report."""
+    markers = dict(db.execute(_FINGERPRINT_SQL, {"cid": company_id}).mappings().first())
+    payload = {
+        "company_id": str(company_id),
+        "report_type": report_type,
+        "period": period,
+        "version": REPORT_GENERATOR_VERSION,
+        "tables": markers,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
 def generate_pdf(company_id: str, db: Session, report_type: str = "full", period: str = "") -> tuple[bytes, str]:
     """Generate an ESG report PDF. Returns (pdf_bytes, filename)."""
+    with track_pdf(report_type):
+        return _build_pdf(company_id, db, report_type, period)
+
+
+def _build_pdf(company_id: str, db: Session, report_type: str, period: str) -> tuple[bytes, str]:
     s = _styles()
     now = datetime.now()
     filename = f"ESG_Report_{report_type}_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
 
-    summary = compute_analytics_summary(company_id, db)
+    date_range = parse_period(period)
+    summary = compute_analytics_summary(company_id, db, date_range)
     score = summary.esg_score
+    in_range, as_of = date_range.filter(), date_range.as_of()
 
     def q(sql, params=None):
-        return db.execute(text(sql), params or {"cid": company_id}).mappings().all()
+        return db.execute(text(sql), params or {"cid": company_id, **date_range.params()}).mappings().all()
 
-    carbon_q = q("SELECT scope, emissions_co2_tons, reporting_period FROM carbon_footprint_details WHERE company_id = :cid ORDER BY reporting_period DESC LIMIT 50")
-    energy_q = q("SELECT energy_type, consumption_kwh, reporting_period FROM energy_consumption WHERE company_id = :cid ORDER BY reporting_period DESC LIMIT 50")
-    waste_q = q("SELECT disposal_method, amount_kg, reporting_period FROM waste_management_data WHERE company_id = :cid ORDER BY reporting_period DESC LIMIT 50")
-    water_q = q("SELECT consumption_liters, reporting_period FROM water_usage_details WHERE company_id = :cid ORDER BY reporting_period DESC LIMIT 24")
-    employees_q = q("SELECT metric_name, value, unit, target_value FROM employee_engagement WHERE company_id = :cid")
+    energy_q = q(f"SELECT energy_type, consumption_kwh, reporting_period FROM energy_consumption WHERE company_id = :cid{in_range} ORDER BY reporting_period DESC LIMIT 50")
+    waste_q = q(f"SELECT disposal_method, amount_kg, reporting_period FROM waste_management_data WHERE company_id = :cid{in_range} ORDER BY reporting_period DESC LIMIT 50")
+    water_q = q(f"SELECT consumption_liters, reporting_period FROM water_usage_details WHERE company_id = :cid{in_range} ORDER BY reporting_period DESC LIMIT 24")
+    employees_q = q(f"SELECT DISTINCT ON (metric_name) metric_name, value, unit, target_value FROM employee_engagement WHERE company_id = :cid{as_of} ORDER BY metric_name, reporting_period DESC NULLS LAST")
     targets_q = q("SELECT metric_name AS name, category, current_value, target_value, target_date, unit FROM esg_targets WHERE company_id = :cid AND is_active = true ORDER BY target_date")
-    suppliers_q = q("SELECT supplier_name, esg_score, supplier_category AS category FROM supply_chain_metrics WHERE company_id = :cid ORDER BY esg_score DESC LIMIT 10")
+    suppliers_q = q("""
+        SELECT supplier_name, esg_score, supplier_category AS category,
+               CASE WHEN esg_score IS NULL THEN NULL WHEN esg_score >= 70 THEN 'low'
+                    WHEN esg_score >= 50 THEN 'medium' ELSE 'high' END AS risk_level
+        FROM supply_chain_metrics WHERE company_id = :cid ORDER BY esg_score DESC LIMIT 10
+    """)
 
     # ── Build PDF ───────────────────────────────────────────────────────────────
     buf = BytesIO()
@@ -132,7 +186,8 @@ def generate_pdf(company_id: str, db: Session, report_type: str = "full", period
     meta_rows = [[
         Paragraph(f"Report Type: {report_type.title()}", s["body"]),
         Paragraph(f"Generated: {now.strftime('%B %d, %Y')}", s["body"]),
-        Paragraph(f"Period: {period or 'All time'}", s["body"]),
+        Paragraph(f"Period: {period or 'All time'}"
+                  + (f" ({date_range.label})" if period and date_range.label != period else ""), s["body"]),
     ]]
     story.append(_metric_table(meta_rows))
     story.append(Spacer(1, 0.3 * inch))
@@ -176,10 +231,7 @@ def generate_pdf(company_id: str, db: Session, report_type: str = "full", period
 
     # Carbon by scope
     story.append(Paragraph("Carbon Emissions by Scope", s["h3"]))
-    scope_totals: dict[int, float] = {}
-    for r in carbon_q:
-        sc = r["scope"] or 1
-        scope_totals[sc] = scope_totals.get(sc, 0) + (r["emissions_co2_tons"] or 0)
+    scope_totals = fetch_scope_totals(db, company_id, date_range)
     carbon_headers = ["Scope", "Total Emissions (tCO₂e)", "% of Total"]
     total_c = sum(scope_totals.values()) or 1
     carbon_rows_data = [
@@ -0,0 +1,325 @@
+"""Report Jobs — background PDF generation with durable state in Neon PostgreSQL.
+
+`POST /api/reports/generate` only records a `report_jobs` row and hands its id to a
+bounded process pool. The worker process claims the job, builds the PDF, uploads it
+to R2 and records the finished report, so the request returns immediately and a
+client disconnect no longer loses the work. Jobs still `queued` or `running` when the
+server stops are re-dispatched by `resume_pending_jobs()` at startup, up to
+REPORT_JOB_MAX_ATTEMPTS builds per job.
+
+Finished PDFs are content-addressed by `report_fingerprint()`: they're stored in R2
+under `reports/by-fingerprint/<sha256>.pdf` (plus a local copy in REPORT_CACHE_DIR),
+and a request whose inputs hash to an existing object is answered without a rebuild.
+"""
+import multiprocessing
+import os
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from services import metrics
+from services.db import SessionLocal, engine
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+# A job interrupted this many times (e.g. by restarts mid-build) is failed, not retried.
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "3"))
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join("reports", "cache"))
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+# Jobs claimed before this were claimed by a previous process, whose workers are gone.
+_PROCESS_STARTED_AT = datetime.now(timezone.utc)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: the API process runs threads, which don't survive fork() safely.
+            _executor = ProcessPoolExecutor(
+                max_workers=REPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _discard_executor(broken: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next `_get_executor()` starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executor() -> None:
+    """Stop the pool without waiting; unfinished jobs stay queued in the database."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+# ── Metadata helpers ──────────────────────────────────────────────────────────
+
+def save_report_meta(db: Session, user_id: str, filename: str, r2_key: str, file_size: int) -> str:
+    row = db.execute(
+        text("""
+            INSERT INTO sustainability_reports (title, file_url, created_by, status, report_type)
+            VALUES (:title, :file_url, :created_by, 'published', 'generated')
+            RETURNING id
+        """),
+        {"title": filename, "file_url": r2_key, "created_by": user_id},
+    ).mappings().first()
+    db.commit()
+    return str(row["id"])
+
+
+def _mark_failed(db: Session, job_id: str, error: str) -> None:
+    db.execute(
+        text("""
+            UPDATE report_jobs
+            SET status = 'failed', error = :error, finished_at = NOW(), updated_at = NOW()
+            WHERE id = :id AND status IN ('queued', 'running')
+        """),
+        {"id": job_id, "error": error[:1000]},
+    )
+    db.commit()
+
+
+# ── Content-addressed cache ───────────────────────────────────────────────────
+
+def cache_key(fingerprint: str) -> str:
+    return f"reports/by-fingerprint/{fingerprint}.pdf"
+
+
+def _local_cache_path(fingerprint: str) -> str:
+    return os.path.join(REPORT_CACHE_DIR, f"{fingerprint}.pdf")
+
+
+def _write_local_cache(fingerprint: str, pdf_bytes: bytes) -> None:
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    path = _local_cache_path(fingerprint)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp_path, path)
+
+
+def find_cached_report(db: Session, fingerprint: str, report_type: str) -> dict | None:
+    """Return {filename, file_url, file_size} for an already-built PDF with this fingerprint."""
+    from services.r2_storage import object_exists, upload_pdf
+
+    row = db.execute(
+        text("""
+            SELECT filename, file_url, file_size FROM report_jobs
+            WHERE fingerprint = :fp AND status = 'done'
+            ORDER BY finished_at DESC
+            LIMIT 1
+        """),
+        {"fp": fingerprint},
+    ).mappings().first()
+    if row and object_exists(row["file_url"]):
+        return dict(row)
+
+    # Built on this instance but not (or no longer) in R2: re-upload the local copy.
+    local_path = _local_cache_path(fingerprint)
+    if os.path.isfile(local_path):
+        with open(local_path, "rb") as f:
+            pdf_bytes = f.read()
+        key = upload_pdf(pdf_bytes, cache_key(fingerprint))
+        filename = row["filename"] if row else f"ESG_Report_{report_type}_{fingerprint[:12]}.pdf"
+        return {"filename": filename, "file_url": key, "file_size": len(pdf_bytes)}
+    return None
+
+
+# ── Worker process ────────────────────────────────────────────────────────────
+
+def _run_job(job_id: str) -> dict:
+    """Worker-process entry point: claim, build, upload and record one report.
+
+    Returns the metrics recorded meanwhile, for the API process to merge.
+    """
+    metrics.instrument_engine(engine)
+    _process_job(job_id)
+    return metrics.drain()
+
+
+def _process_job(job_id: str) -> None:
+    from services.report_generator import generate_pdf, report_fingerprint
+    from services.r2_storage import upload_pdf
+
+    db = SessionLocal()
+    try:
+        job = db.execute(
+            text("""
+                UPDATE report_jobs
+                SET status = 'running', started_at = NOW(), updated_at = NOW(), attempts = attempts + 1
+                WHERE id = :id AND status = 'queued'
+                RETURNING company_id, created_by, report_type, period
+            """),
+            {"id": job_id},
+        ).mappings().first()
+        db.commit()
+        if job is None:
+            return  # already claimed by another worker, or cancelled
+
+        company_id, report_type, period = str(job["company_id"]), job["report_type"], job["period"] or ""
+        # Re-hash right before building: data may have changed since the job was queued.
+        fingerprint = report_fingerprint(company_id, db, report_type, period)
+        pdf_bytes, filename = generate_pdf(company_id, db, report_type, period)
+        r2_key = upload_pdf(pdf_bytes, cache_key(fingerprint))
+        _write_local_cache(fingerprint, pdf_bytes)
+        report_id = save_report_meta(db, job["created_by"], filename, r2_key, len(pdf_bytes))
+
+        db.execute(
+            text("""
+                UPDATE report_jobs
+                SET status = 'done', report_id = :report_id, file_url = :file_url, filename = :filename,
+                    file_size = :file_size, fingerprint = :fingerprint, finished_at = NOW(), updated_at = NOW()
+                WHERE id = :id
+            """),
+            {
+                "id": job_id, "report_id": report_id, "file_url": r2_key, "filename": filename,
+                "file_size": len(pdf_bytes), "fingerprint": fingerprint,
+            },
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        _mark_failed(db, job_id, f"{type(e).__name__}: {e}")
+    finally:
+        db.close()
+
+
+# ── API-process side ──────────────────────────────────────────────────────────
+
+def _on_done(job_id: str):
+    def callback(future: Future) -> None:
+        # _run_job records its own failures; this only catches a worker that died
+        # outright (BrokenProcessPool, OOM kill) and never reached its except block.
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is None:
+            metrics.merge(future.result())
+            return
+        db = SessionLocal()
+        try:
+            _mark_failed(db, job_id, f"Worker crashed: {type(exc).__name__}: {exc}")
+        finally:
+            db.close()
+    return callback
+
+
+def _dispatch(job_id: str) -> None:
+    executor = _get_executor()
+    try:
+        future = executor.submit(_run_job, job_id)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed) and took the pool down; every later submit
+        # would fail the same way, so replace the pool and retry once.
+        _discard_executor(executor)
+        future = _get_executor().submit(_run_job, job_id)
+    future.add_done_callback(_on_done(job_id))
+
+
+def _dispatch_or_fail(db: Session, job_id: str) -> bool:
+    """Dispatch a committed job; if no worker can take it, mark it failed so it doesn't
+    sit `queued` with nothing to run it. Returns whether it was dispatched."""
+    try:
+        _dispatch(job_id)
+        return True
+    except Exception as e:
+        _mark_failed(db, job_id, f"Could not start a worker: {type(e).__name__}: {e}")
+        return False
+
+
+def submit_report_job(db: Session, user_id: str, company_id: str, report_type: str, period: str) -> dict:
+    """Queue a report build, or complete it immediately if an identical PDF already exists."""
+    from services.report_generator import report_fingerprint
+
+    fingerprint = report_fingerprint(company_id, db, report_type, period)
+    cached = find_cached_report(db, fingerprint, report_type)
+    if cached:
+        report_id = save_report_meta(db, user_id, cached["filename"], cached["file_url"], cached["file_size"] or 0)
+        row = db.execute(
+            text("""
+                INSERT INTO report_jobs
+                    (company_id, created_by, report_type, period, status, fingerprint, cache_hit,
+                     report_id, file_url, filename, file_size, started_at, finished_at)
+                VALUES
+                    (:company_id, :created_by, :report_type, :period, 'done', :fingerprint, true,
+                     :report_id, :file_url, :filename, :file_size, NOW(), NOW())
+                RETURNING id, status, created_at
+            """),
+            {
+                "company_id": company_id, "created_by": user_id, "report_type": report_type, "period": period,
+                "fingerprint": fingerprint, "report_id": report_id, **cached,
+            },
+        ).mappings().first()
+        db.commit()
+        return {
+            "job_id": str(row["id"]), "status": row["status"], "created_at": str(row["created_at"]),
+            "fingerprint": fingerprint, "cache": "hit", "report_id": report_id,
+        }
+
+    row = db.execute(
+        text("""
+            INSERT INTO report_jobs (company_id, created_by, report_type, period, fingerprint)
+            VALUES (:company_id, :created_by, :report_type, :period, :fingerprint)
+            RETURNING id, status, created_at
+        """),
+        {"company_id": company_id, "created_by": user_id, "report_type": report_type, "period": period, "fingerprint": fingerprint},
+    ).mappings().first()
+    db.commit()
+    job_id = str(row["id"])
+    status = row["status"] if _dispatch_or_fail(db, job_id) else "failed"
+    return {
+        "job_id": job_id, "status": status, "created_at": str(row["created_at"]),
+        "fingerprint": fingerprint, "cache": "miss",
+    }
+
+
+def get_job(db: Session, job_id: str, user_id: str):
+    return db.execute(
+        text("""
+            SELECT id, status, report_type, period, report_id, file_url, filename, file_size, error,
+                   attempts, fingerprint, cache_hit, created_at, started_at, finished_at
+            FROM report_jobs
+            WHERE id = :id AND created_by = :uid
+        """),
+        {"id": job_id, "uid": user_id},
+    ).mappings().first()
+
+
+def resume_pending_jobs() -> int:
+    """Re-dispatch jobs left queued, or orphaned while running, by a previous process."""
+    db = SessionLocal()
+    try:
+        db.execute(
+            text("""
+                UPDATE report_jobs
+                SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'queued' END,
+                    error = CASE WHEN attempts >= :max_attempts
+                                 THEN 'Interrupted ' || attempts || ' times; not retried' ELSE error END,
+                    finished_at = CASE WHEN attempts >= :max_attempts THEN NOW() ELSE finished_at END,
+                    updated_at = NOW()
+                WHERE status = 'running' AND started_at < :process_started_at
+            """),
+            {"max_attempts": REPORT_JOB_MAX_ATTEMPTS, "process_started_at": _PROCESS_STARTED_AT},
+        )
+        db.commit()
+        job_ids = db.execute(
+            text("SELECT id FROM report_jobs WHERE status = 'queued' ORDER BY created_at"),
+        ).scalars().all()
+        return sum(_dispatch_or_fail(db, str(job_id)) for job_id in job_ids)
+    finally:
+        db.close()
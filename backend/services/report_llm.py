@@ -0,0 +1,204 @@
+"""Report LLM — concurrent, cached section generation for the legacy /report endpoint.
+
+Sections are generated concurrently (at most LLM_CONCURRENCY requests in flight per
+process, each bounded by LLM_TIMEOUT seconds) through a pluggable backend:
+"gemini" calls the async google-genai client, "stub" produces deterministic local
+text for offline runs. Responses are cached by a hash of (backend, model, prompt),
+where the prompt embeds the data, in memory and under LLM_CACHE_DIR, so regenerating
+a report from the same workbook makes no LLM calls.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Callable, Optional
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "3"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "90"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join("reports", "llm_cache"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+# Artificial latency for the stub backend, to exercise concurrency offline.
+LLM_STUB_DELAY = float(os.getenv("LLM_STUB_DELAY", "0"))
+
+
+class SectionTimeout(Exception):
+    def __init__(self, title: str):
+        super().__init__(f"Section '{title}' timed out after {LLM_TIMEOUT:g}s")
+        self.title = title
+
+
+# ── Backends ──────────────────────────────────────────────────────────────────
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self):
+        self._client = None
+
+    def available(self) -> bool:
+        return bool(os.getenv("GEMINI_API_KEY"))
+
+    async def generate(self, prompt: str, model: str) -> str:
+        if self._client is None:
+            from google import genai
+
+            self._client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        response = await self._client.aio.models.generate_content(model=model, contents=prompt)
+        return response.text or ""
+
+
+class StubBackend:
+    """Deterministic offline backend: no network, no key, same prompt → same text."""
+    name = "stub"
+
+    def available(self) -> bool:
+        return True
+
+    async def generate(self, prompt: str, model: str) -> str:
+        if LLM_STUB_DELAY:
+            await asyncio.sleep(LLM_STUB_DELAY)
+        first_line = prompt.splitlines()[0] if prompt else ""
+        instructions = prompt.rsplit("Instructions:\n", 1)[-1].strip()
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return (
+            f"{first_line}\n"
+            f"Placeholder text from the local stub backend (model {model}, prompt {digest}, {len(prompt)} chars).\n"
+            f"Brief: {instructions}"
+        )
+
+
+_BACKENDS: dict[str, Callable[[], object]] = {"gemini": GeminiBackend, "stub": StubBackend}
+_instances: dict[str, object] = {}
+
+
+def register_backend(name: str, factory: Callable[[], object]) -> None:
+    """Plug in another backend: `factory()` must return an object with
+    `name`, `available() -> bool` and `async generate(prompt, model) -> str`."""
+    _BACKENDS[name] = factory
+    _instances.pop(name, None)
+
+
+def get_backend(name: Optional[str] = None):
+    name = name or LLM_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Available: {', '.join(_BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
+
+
+# ── Response cache ────────────────────────────────────────────────────────────
+
+_memory: OrderedDict[str, str] = OrderedDict()
+_inflight: dict[str, asyncio.Future] = {}
+_semaphore: asyncio.Semaphore | None = None
+_stats = {"hits": 0, "misses": 0}
+
+
+def cache_key(backend_name: str, model: str, prompt: str) -> str:
+    return hashlib.sha256(json.dumps([backend_name, model, prompt]).encode()).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(LLM_CACHE_DIR, f"{key}.txt")
+
+
+def _cache_get(key: str) -> str | None:
+    text = _memory.get(key)
+    if text is not None:
+        _memory.move_to_end(key)
+        return text
+    if LLM_CACHE_DIR and os.path.isfile(_cache_path(key)):
+        with open(_cache_path(key), encoding="utf-8") as f:
+            text = f.read()
+        _cache_put(key, text, persist=False)
+    return text
+
+
+def _cache_put(key: str, text: str, persist: bool = True) -> None:
+    _memory[key] = text
+    _memory.move_to_end(key)
+    while len(_memory) > LLM_CACHE_SIZE:
+        _memory.popitem(last=False)
+    if persist and LLM_CACHE_DIR:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        path = _cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+def cache_stats() -> dict:
+    return {"size": len(_memory), "maxsize": LLM_CACHE_SIZE, **_stats}
+
+
+# ── Section generation ────────────────────────────────────────────────────────
+
+def build_prompt(title: str, instruction: str, data_json: str, report_text: str = "") -> str:
+    return (
+        f"Based on this ESG data, write the '{title}' section of a corporate ESG report.\n\n"
+        f"Source text:\n{report_text}\n\nData:\n{data_json}\n\nInstructions:\n{instruction}"
+    )
+
+
+async def _generate_once(backend, title: str, prompt: str, model: str) -> str:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    async with _semaphore:
+        try:
+            return await asyncio.wait_for(backend.generate(prompt, model), LLM_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise SectionTimeout(title)
+
+
+async def generate_section(backend, title: str, prompt: str, model: str) -> str:
+    key = cache_key(backend.name, model, prompt)
+    cached = _cache_get(key)
+    if cached is not None:
+        _stats["hits"] += 1
+        return cached
+    # An identical request already running (e.g. a double-clicked regenerate): share it.
+    if key in _inflight:
+        _stats["hits"] += 1
+        return await asyncio.shield(_inflight[key])
+
+    _stats["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        text = await _generate_once(backend, title, prompt, model)
+        _cache_put(key, text)
+        future.set_result(text)
+        return text
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved; waiters re-raise it themselves
+        raise
+    finally:
+        del _inflight[key]
+
+
+async def generate_sections(
+    sections: dict[str, str],
+    data_json: str,
+    report_text: str = "",
+    model: Optional[str] = None,
+    backend=None,
+) -> dict[str, str]:
+    """Generate every section concurrently; returns {title: text} in the input order."""
+    backend = backend or get_backend()
+    model = model or LLM_MODEL
+    titles = list(sections)
+    texts = await asyncio.gather(*(
+        generate_section(backend, title, build_prompt(title, sections[title], data_json, report_text), model)
+        for title in titles
+    ))
+    return dict(zip(titles, texts))
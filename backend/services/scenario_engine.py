@@ -0,0 +1,324 @@
+"""
+Scenario Engine — what-if sweeps over the carbon calculator.
+
+Each lever moves one calculator activity (or the electricity grid) away from a
+baseline: a lever value of 0.3 removes 30% of the baseline amount, optionally
+re-adding it to another activity (`shift_to`) for fuel switching. Scenarios are the
+full cartesian grid of lever values or Monte Carlo samples, evaluated in NumPy
+chunks of SCENARIO_CHUNK_SIZE rows, so memory per chunk is fixed and progress can
+be streamed between chunks.
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+
+from models.schemas import ScenarioLever, ScenarioRequest
+from services.carbon_engine import calculate_carbon
+from services.emission_factors import ELECTRICITY, get_registry
+
+SCENARIO_MAX = int(os.getenv("SCENARIO_MAX", "2000000"))
+SCENARIO_CHUNK_SIZE = int(os.getenv("SCENARIO_CHUNK_SIZE", "100000"))
+
+GRID_LEVER = "country_grid"
+ACTIVITIES = [
+    "natural_gas_kwh", "diesel_liters", "petrol_liters", "lpg_liters",
+    ELECTRICITY,
+    "flights_short_haul_km", "flights_long_haul_km", "hotel_nights", "waste_kg", "water_m3",
+]
+_SERIES = ("total_tco2e", "scope1_tco2e", "scope2_tco2e", "scope3_tco2e")
+
+
+# ── Plan ──────────────────────────────────────────────────────────────────────
+
+@dataclass
+class _Lever:
+    spec: ScenarioLever
+    name: str
+    column: Optional[int] = None        # activity index; None for the grid lever
+    shift: Optional[int] = None
+    points: Optional[np.ndarray] = None  # grid points (region indices for the grid lever)
+    weights: Optional[np.ndarray] = None
+
+    @property
+    def is_grid(self) -> bool:
+        return self.column is None
+
+
+class _Plan:
+    """Baseline amounts, factors and levers compiled into arrays once per request."""
+
+    def __init__(self, req: ScenarioRequest):
+        registry = get_registry()
+        factor = registry.resolver(req.baseline.factor_year)
+        self.base = np.array([getattr(req.baseline, a) for a in ACTIVITIES], dtype=np.float64)
+        self.factors = np.array(
+            [factor(a, req.baseline.country_grid) if a == ELECTRICITY else factor(a) for a in ACTIVITIES],
+            dtype=np.float64,
+        )
+        scopes = np.array([registry.get(a).scope for a in ACTIVITIES])
+        self.scope_idx = {s: np.flatnonzero(scopes == s) for s in (1, 2, 3)}
+        self.electricity = ACTIVITIES.index(ELECTRICITY)
+
+        self.regions: list[str] = [req.baseline.country_grid]
+        self.levers = [self._compile(lever) for lever in req.levers]
+        grid_levers = [j for j, lv in enumerate(self.levers) if lv.is_grid]
+        if len(grid_levers) > 1:
+            raise ValueError("Only one country_grid lever is allowed")
+        self.grid_col = grid_levers[0] if grid_levers else None
+        self.region_factors = np.array([factor(ELECTRICITY, r) for r in self.regions], dtype=np.float64)
+
+    def _compile(self, spec: ScenarioLever) -> _Lever:
+        if spec.activity == GRID_LEVER:
+            codes = spec.values or [f.region for f in get_registry().grids()]
+            if not all(isinstance(c, str) for c in codes):
+                raise ValueError("country_grid lever values must be grid codes")
+            for c in codes:
+                if c not in self.regions:
+                    self.regions.append(c)
+            lever = _Lever(spec, spec.name or GRID_LEVER,
+                           points=np.array([self.regions.index(c) for c in codes], dtype=np.float64))
+        else:
+            if spec.activity not in ACTIVITIES:
+                raise ValueError(f"Unknown lever activity '{spec.activity}'. Allowed: {', '.join(ACTIVITIES + [GRID_LEVER])}")
+            if spec.shift_to is not None and spec.shift_to not in ACTIVITIES:
+                raise ValueError(f"Unknown shift_to activity '{spec.shift_to}'")
+            if spec.values is not None:
+                if not all(isinstance(v, (int, float)) for v in spec.values):
+                    raise ValueError(f"Lever '{spec.activity}' values must be numbers")
+                points = np.array(spec.values, dtype=np.float64)
+            else:
+                low, high = _range(spec)
+                points = np.linspace(low, high, spec.steps)
+            name = spec.name or (f"{spec.activity}->{spec.shift_to}" if spec.shift_to else spec.activity)
+            lever = _Lever(spec, name, column=ACTIVITIES.index(spec.activity),
+                           shift=ACTIVITIES.index(spec.shift_to) if spec.shift_to else None, points=points)
+
+        if not len(lever.points):
+            raise ValueError(f"Lever '{lever.name}' has no values")
+        if spec.weights is not None:
+            if spec.values is None or len(spec.weights) != len(spec.values):
+                raise ValueError(f"Lever '{lever.name}' weights must match its values")
+            w = np.array(spec.weights, dtype=np.float64)
+            if (w < 0).any() or w.sum() <= 0:
+                raise ValueError(f"Lever '{lever.name}' weights must be non-negative and not all zero")
+            lever.weights = w / w.sum()
+        return lever
+
+    def evaluate(self, V: np.ndarray) -> dict[str, np.ndarray]:
+        """Emissions for an (S × levers) matrix of lever values; one row per scenario."""
+        n = V.shape[0]
+        amounts = np.repeat(self.base[None, :], n, axis=0)
+        for j, lever in enumerate(self.levers):
+            if lever.is_grid:
+                continue
+            # Every lever acts on the *baseline* amount, so levers on one activity add up.
+            removed = self.base[lever.column] * V[:, j]
+            amounts[:, lever.column] -= removed
+            if lever.shift is not None:
+                amounts[:, lever.shift] += removed * lever.spec.shift_ratio
+        np.maximum(amounts, 0.0, out=amounts)
+
+        emissions = amounts * self.factors
+        if self.grid_col is not None:
+            grid_factors = self.region_factors[V[:, self.grid_col].astype(np.intp)]
+            emissions[:, self.electricity] = amounts[:, self.electricity] * grid_factors
+
+        s1 = emissions[:, self.scope_idx[1]].sum(axis=1)
+        s2 = emissions[:, self.scope_idx[2]].sum(axis=1)
+        s3 = emissions[:, self.scope_idx[3]].sum(axis=1)
+        return {"total_tco2e": s1 + s2 + s3, "scope1_tco2e": s1, "scope2_tco2e": s2, "scope3_tco2e": s3}
+
+    def lever_value(self, lever: _Lever, v: float):
+        return self.regions[int(v)] if lever.is_grid else float(v)
+
+
+def _range(spec: ScenarioLever) -> tuple[float, float]:
+    if spec.low is not None and spec.high is not None:
+        if spec.low > spec.high:
+            raise ValueError(f"Lever '{spec.activity}': low must not exceed high")
+        return spec.low, spec.high
+    if spec.distribution == "normal" and spec.mean is not None and spec.sd is not None:
+        return spec.mean - 2 * spec.sd, spec.mean + 2 * spec.sd
+    raise ValueError(f"Lever '{spec.activity}' needs values, or low and high")
+
+
+# ── Scenario sources ──────────────────────────────────────────────────────────
+
+def _grid_chunks(plan: _Plan, chunk_size: int) -> Iterator[np.ndarray]:
+    shape = tuple(len(lv.points) for lv in plan.levers)
+    total = int(np.prod(shape, dtype=np.int64))
+    for start in range(0, total, chunk_size):
+        coords = np.unravel_index(np.arange(start, min(start + chunk_size, total)), shape)
+        yield np.column_stack([lv.points[c] for lv, c in zip(plan.levers, coords)])
+
+
+def _sample(lever: _Lever, rng: np.random.Generator, n: int) -> np.ndarray:
+    spec = lever.spec
+    if spec.values is not None or lever.is_grid:
+        return lever.points[rng.choice(len(lever.points), size=n, p=lever.weights)]
+    if spec.distribution == "normal":
+        if spec.mean is None or spec.sd is None:
+            low, high = _range(spec)  # no mean/sd: centre a ±2σ normal on [low, high]
+            x = rng.normal((low + high) / 2, (high - low) / 4, n)
+        else:
+            x = rng.normal(spec.mean, spec.sd, n)
+        if spec.low is not None or spec.high is not None:
+            x = np.clip(x, spec.low, spec.high)
+        return x
+    low, high = _range(spec)
+    if spec.distribution == "triangular":
+        mode = spec.mode if spec.mode is not None else (low + high) / 2
+        if low == high:
+            return np.full(n, low)
+        return rng.triangular(low, mode, high, n)
+    return rng.uniform(low, high, n)
+
+
+def _monte_carlo_chunks(plan: _Plan, samples: int, seed: Optional[int], chunk_size: int) -> Iterator[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    for start in range(0, samples, chunk_size):
+        n = min(chunk_size, samples - start)
+        yield np.column_stack([_sample(lv, rng, n) for lv in plan.levers])
+
+
+def scenario_count(req: ScenarioRequest) -> int:
+    if req.method == "monte_carlo":
+        return req.samples
+    count = 1
+    for lever in req.levers:
+        if lever.values is not None:
+            count *= len(lever.values)
+        elif lever.activity == GRID_LEVER:
+            count *= len(get_registry().grids())
+        else:
+            count *= lever.steps
+    return count
+
+
+# ── Results ───────────────────────────────────────────────────────────────────
+
+def _bands(values: np.ndarray, percentiles: list[float]) -> dict:
+    qs = np.percentile(values, percentiles)
+    return {f"p{p:g}": round(float(q), 4) for p, q in zip(percentiles, qs)}
+
+
+def _lever_rankings(plan: _Plan, baseline_total: float) -> list[dict]:
+    """One-lever-at-a-time abatement at each lever's most effective point, ranked."""
+    # All-zero row = baseline: no activity change, and region index 0 is the baseline grid.
+    neutral = np.zeros(len(plan.levers))
+    ranked = []
+    for j, lever in enumerate(plan.levers):
+        V = np.repeat(neutral[None, :], len(lever.points), axis=0)
+        V[:, j] = lever.points
+        totals = plan.evaluate(V)["total_tco2e"]
+        best = int(np.argmin(totals))
+        value = lever.points[best]
+        abatement = baseline_total - float(totals[best])
+        row = {
+            "lever": lever.name,
+            "activity": lever.spec.activity,
+            "best_value": plan.lever_value(lever, value),
+            "abatement_tco2e": round(abatement, 4),
+            "abatement_pct": round(abatement / baseline_total * 100, 2) if baseline_total else 0.0,
+        }
+        if not lever.is_grid:
+            row["abatement_per_unit_tco2e"] = round(abatement / value, 4) if value else 0.0
+        if lever.spec.cost_per_unit is not None:
+            cost = lever.spec.cost_per_unit * (1.0 if lever.is_grid else float(value))
+            row["cost"] = round(cost, 2)
+            row["cost_per_tco2e"] = round(cost / abatement, 2) if abatement > 0 else None
+        ranked.append(row)
+
+    # Marginal-abatement order: cheapest tonne first where costed, then largest abatement.
+    ranked.sort(key=lambda r: (
+        r.get("cost_per_tco2e") is None,
+        r.get("cost_per_tco2e") or 0.0,
+        -r["abatement_tco2e"],
+    ))
+    for i, row in enumerate(ranked, 1):
+        row["rank"] = i
+    return ranked
+
+
+def iter_scenarios(req: ScenarioRequest, chunk_size: int = SCENARIO_CHUNK_SIZE) -> Iterator[dict]:
+    """Evaluate every scenario chunk by chunk; yields progress events then a final `done` event.
+
+    The request is validated here, before the first chunk, so a bad lever raises
+    ValueError to the caller instead of failing mid-stream.
+    """
+    total = scenario_count(req)
+    if total > SCENARIO_MAX:
+        raise ValueError(f"{total} scenarios requested; the limit is {SCENARIO_MAX}")
+    return _sweep(req, _Plan(req), total, chunk_size)
+
+
+def _sweep(req: ScenarioRequest, plan: _Plan, total: int, chunk_size: int) -> Iterator[dict]:
+    started = time.perf_counter()
+
+    chunks = (
+        _monte_carlo_chunks(plan, req.samples, req.seed, chunk_size)
+        if req.method == "monte_carlo" else _grid_chunks(plan, chunk_size)
+    )
+    baseline_total = float(plan.evaluate(np.zeros((1, len(plan.levers))))["total_tco2e"][0])
+    series: dict[str, list[np.ndarray]] = {k: [] for k in _SERIES}
+    best_totals: list[np.ndarray] = []
+    best_rows: list[np.ndarray] = []
+    done = 0
+    running_sum, running_min, running_max = 0.0, np.inf, -np.inf
+
+    for V in chunks:
+        out = plan.evaluate(V)
+        for k in _SERIES:
+            series[k].append(out[k])
+        t = out["total_tco2e"]
+        if req.top:
+            k = min(req.top, len(t))
+            keep = np.argpartition(t, k - 1)[:k]
+            best_totals.append(t[keep])
+            best_rows.append(V[keep])
+        done += len(t)
+        running_sum += float(t.sum())
+        running_min, running_max = min(running_min, float(t.min())), max(running_max, float(t.max()))
+        yield {
+            "event": "progress", "processed": done, "total": total,
+            "mean_tco2e": round(running_sum / done, 4),
+            "min_tco2e": round(running_min, 4), "max_tco2e": round(running_max, 4),
+        }
+
+    merged = {k: np.concatenate(v) for k, v in series.items()}
+    bands = {k: _bands(v, req.percentiles) for k, v in merged.items()}
+    bands["abatement_tco2e"] = _bands(baseline_total - merged["total_tco2e"], req.percentiles)
+
+    best = []
+    if req.top:
+        totals, rows = np.concatenate(best_totals), np.vstack(best_rows)
+        for i in np.argsort(totals, kind="stable")[:req.top]:
+            best.append({
+                "total_tco2e": round(float(totals[i]), 4),
+                "abatement_tco2e": round(baseline_total - float(totals[i]), 4),
+                "levers": {lv.name: plan.lever_value(lv, rows[i, j]) for j, lv in enumerate(plan.levers)},
+            })
+
+    yield {
+        "event": "done",
+        "method": req.method,
+        "scenarios": done,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "baseline": calculate_carbon(req.baseline).model_dump(exclude={"breakdown"}),
+        "mean": {k: round(float(v.mean()), 4) for k, v in merged.items()},
+        "bands": bands,
+        "levers": _lever_rankings(plan, baseline_total),
+        "best": best,
+        "factor_version": get_registry().version,
+    }
+
+
+def run_scenarios(req: ScenarioRequest, chunk_size: int = SCENARIO_CHUNK_SIZE) -> dict:
+    """Run a sweep to completion and return only the final summary."""
+    result = None
+    for event in iter_scenarios(req, chunk_size):
+        result = event
+    return result
@@ -1,51 +1,60 @@
-import matplotlib.pyplot as plt
 import io
 
+from services.charts import render_chart, render_charts
+
 
 # --- Chart Generation Functions ---
-def create_line_chart(df, x_col, y_col, title, ylabel):
+# Thin DataFrame adapters over services/charts, which draws with the Figure/Agg
+# API (thread-safe) and memoizes by data hash. `fmt` may be "png", "svg" or "pdf".
+
+def line_chart_spec(df, x_col, y_col, title, ylabel):
+    return {"kind": "line", "x": df[x_col].tolist(), "y": df[y_col].tolist(),
+            "title": title, "xlabel": x_col, "ylabel": ylabel}
+
+
+def bar_chart_spec(df, x_col, y_cols, title):
+    return {"kind": "bar", "categories": df[x_col].tolist(),
+            "series": {col: df[col].tolist() for col in y_cols},
+            "title": title, "xlabel": x_col, "ylabel": "Percentage (%)", "legend_title": "Type"}
+
+
+def pie_chart_spec(labels, sizes, title):
+    return {"kind": "pie", "labels": list(labels), "sizes": [float(s) for s in sizes], "title": title}
+
+
+def create_line_chart(df, x_col, y_col, title, ylabel, fmt="png"):
     """Generates a line chart from a DataFrame."""
-    plt.figure(figsize=(6, 4))
-    plt.plot(df[x_col], df[y_col], marker='o')
-    plt.title(title)
-    plt.xlabel(x_col)
-    plt.ylabel(ylabel)
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close()
-    buf.seek(0)
-    return buf
-
-
-def create_bar_chart(df, x_col, y_cols, title):
+    return io.BytesIO(render_chart(line_chart_spec(df, x_col, y_col, title, ylabel), fmt))
+
+
+def create_bar_chart(df, x_col, y_cols, title, fmt="png"):
     """Generates a bar chart from a DataFrame."""
-    plt.figure(figsize=(6, 4))
-    df.set_index(x_col)[y_cols].plot(kind='bar', ax=plt.gca())
-    plt.title(title)
-    plt.xlabel(x_col)
-    plt.ylabel("Percentage (%)")
-    plt.xticks(rotation=0)
-    plt.legend(title="Type")
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close()
-    buf.seek(0)
-    return buf
-
-
-def create_pie_chart(labels, sizes, title):
+    return io.BytesIO(render_chart(bar_chart_spec(df, x_col, y_cols, title), fmt))
+
+
+def create_pie_chart(labels, sizes, title, fmt="png"):
     """Generates a pie chart."""
-    plt.figure(figsize=(6, 4))
-    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-    plt.title(title)
-    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close()
-    buf.seek(0)
-    return buf
\ No newline at end of file
+    return io.BytesIO(render_chart(pie_chart_spec(labels, sizes, title), fmt))
+
+
+def create_esg_charts(df, fmt="png", cancel=None):
+    """Standard ESG Metrics charts for a report, rendered concurrently. Returns [(title, BytesIO)].
+
+    `cancel` is an optional threading.Event; see services.charts.render_charts.
+    """
+    specs = []
+    if {"Year", "Carbon Emissions (tons CO2e)"} <= set(df.columns):
+        specs.append(line_chart_spec(df, "Year", "Carbon Emissions (tons CO2e)", "Carbon Emissions", "tons CO2e"))
+    if {"Year", "Water Usage (m3)"} <= set(df.columns):
+        specs.append(line_chart_spec(df, "Year", "Water Usage (m3)", "Water Usage", "m3"))
+    if {"Year", "Energy Renewable (%)", "Energy Non-Renewable (%)"} <= set(df.columns):
+        specs.append(bar_chart_spec(df, "Year", ["Energy Renewable (%)", "Energy Non-Renewable (%)"], "Energy Mix"))
+    if {"Waste Recycled (tons)", "Waste Unrecycled (tons)"} <= set(df.columns) and len(df):
+        latest = df.iloc[-1]
+        specs.append(pie_chart_spec(
+            ["Recycled", "Unrecycled"],
+            [latest["Waste Recycled (tons)"], latest["Waste Unrecycled (tons)"]],
+            "Waste (latest year)",
+        ))
+    images = render_charts(specs, fmt, cancel)
+    return [(spec["title"], io.BytesIO(img)) for spec, img in zip(specs, images)]
@@ -297,15 +297,43 @@ export interface ReportMetadata {
   display_name?: string; // A shortened filename for display purposes
 }
 
+/**
+ * Background report job status from /api/reports/jobs/{id}
+ */
+export interface ReportJob {
+  job_id: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  error?: string | null;
+  report_id?: string;
+  filename?: string;
+  download_url?: string;
+}
+
 /**
  * Generate a report from live database — no file upload needed.
+ * The backend queues a job; poll it until the PDF is ready, then download it.
  */
 export async function generateReportFromDB(
   reportType: 'full' | 'monthly' | 'annual' | 'custom' = 'full',
   period: string = '',
+  pollIntervalMs: number = 1500,
+  timeoutMs: number = 5 * 60 * 1000,
 ): Promise<Response> {
   const params = new URLSearchParams({ report_type: reportType, period })
-  return apiRequest<Response>(`/api/reports/generate?${params}`, 'POST')
+  const { job_id } = await apiRequest<ReportJob>(`/api/reports/generate?${params}`, 'POST')
+
+  const deadline = Date.now() + timeoutMs
+  while (Date.now() < deadline) {
+    const job = await apiRequest<ReportJob>(`/api/reports/jobs/${job_id}`, 'GET')
+    if (job.status === 'done' && job.download_url) {
+      return apiRequest<Response>(job.download_url, 'GET')
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Report generation failed')
+    }
+    await new Promise(resolve => setTimeout(resolve, pollIntervalMs))
+  }
+  throw new Error('Report generation timed out')
 }
 
 /**